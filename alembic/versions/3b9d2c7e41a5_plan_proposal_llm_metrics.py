@@ -0,0 +1,48 @@
+"""plan proposal llm metrics
+
+Revision ID: 3b9d2c7e41a5
+Revises: e6a59a9f38ca
+Create Date: 2026-10-17 09:12:40.518203
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2c7e41a5"
+down_revision: str | Sequence[str] | None = "e6a59a9f38ca"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INT_COLUMNS = (
+    "queue_wait_ms",
+    "generation_ms",
+    "prompt_eval_count",
+    "eval_count",
+    "total_duration_ms",
+    "load_duration_ms",
+    "prompt_eval_duration_ms",
+    "eval_duration_ms",
+)
+
+
+def upgrade() -> None:
+    op.add_column("plan_proposals", sa.Column("llm_model", sa.String(length=200), nullable=True))
+    for name in INT_COLUMNS:
+        op.add_column("plan_proposals", sa.Column(name, sa.Integer(), nullable=True))
+
+    op.create_index(
+        "ix_plan_proposals_model_finished", "plan_proposals", ["llm_model", "finished_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_plan_proposals_model_finished", table_name="plan_proposals")
+
+    for name in reversed(INT_COLUMNS):
+        op.drop_column("plan_proposals", name)
+    op.drop_column("plan_proposals", "llm_model")
@@ -0,0 +1,31 @@
+"""plan proposal compiled plan
+
+Revision ID: 5e2a8d4f1c63
+Revises: c47e0b9a3d18
+Create Date: 2026-10-17 19:26:51.640382
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e2a8d4f1c63"
+down_revision: str | Sequence[str] | None = "c47e0b9a3d18"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "plan_proposals",
+        sa.Column("compiled_plan", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("plan_proposals", "compiled_plan")
@@ -0,0 +1,29 @@
+"""plan proposal repair metrics
+
+Revision ID: 8f1c5a2d6b90
+Revises: 3b9d2c7e41a5
+Create Date: 2026-10-17 14:03:27.904115
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f1c5a2d6b90"
+down_revision: str | Sequence[str] | None = "3b9d2c7e41a5"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("plan_proposals", sa.Column("repair_attempts", sa.Integer(), nullable=True))
+    op.add_column("plan_proposals", sa.Column("repair_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("plan_proposals", "repair_tokens")
+    op.drop_column("plan_proposals", "repair_attempts")
@@ -0,0 +1,29 @@
+"""test run trace columns
+
+Revision ID: 9b3e6f1a2c47
+Revises: 5e2a8d4f1c63
+Create Date: 2026-10-17 22:04:12.518903
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b3e6f1a2c47"
+down_revision: str | Sequence[str] | None = "5e2a8d4f1c63"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("test_runs", sa.Column("trace_name", sa.String(length=500), nullable=True))
+    op.add_column("test_runs", sa.Column("trace_object_key", sa.String(length=1024), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("test_runs", "trace_object_key")
+    op.drop_column("test_runs", "trace_name")
@@ -0,0 +1,31 @@
+"""plan proposal speculative candidates
+
+Revision ID: c47e0b9a3d18
+Revises: 8f1c5a2d6b90
+Create Date: 2026-10-17 16:41:08.227361
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c47e0b9a3d18"
+down_revision: str | Sequence[str] | None = "8f1c5a2d6b90"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INT_COLUMNS = ("speculative_candidates", "winning_candidate", "speculative_saved_ms")
+
+
+def upgrade() -> None:
+    for name in INT_COLUMNS:
+        op.add_column("plan_proposals", sa.Column(name, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    for name in reversed(INT_COLUMNS):
+        op.drop_column("plan_proposals", name)
@@ -1,15 +1,16 @@
 from dataclasses import dataclass
 from pathlib import Path
 
-from app.artifacts.keys import screenshot_key, video_key
+from app.artifacts.keys import screenshot_key, trace_key, video_key
 from app.artifacts.storage import ArtifactStorage
-from app.workers.test_runner.artifacts import screenshot_path, video_path
+from app.workers.test_runner.artifacts import screenshot_path, trace_path, video_path
 
 
 @dataclass(frozen=True)
 class UploadedArtifacts:
     video_object_key: str | None = None
     screenshot_object_key: str | None = None
+    trace_object_key: str | None = None
 
 
 class RunArtifactsService:
@@ -41,9 +42,11 @@ class RunArtifactsService:
         run_id: int,
         video_name: str | None,
         screenshot_name: str | None,
+        trace_name: str | None = None,
     ) -> UploadedArtifacts:
         video_obj_key = None
         screenshot_obj_key = None
+        trace_obj_key = None
 
         # backend=local -> no-op
         if self._storage.is_local:
@@ -51,8 +54,12 @@ class RunArtifactsService:
                 video_obj_key = video_key(run_id, video_name)
             if screenshot_name:
                 screenshot_obj_key = screenshot_key(run_id, screenshot_name)
+            if trace_name:
+                trace_obj_key = trace_key(run_id, trace_name)
             return UploadedArtifacts(
-                video_object_key=video_obj_key, screenshot_object_key=screenshot_obj_key
+                video_object_key=video_obj_key,
+                screenshot_object_key=screenshot_obj_key,
+                trace_object_key=trace_obj_key,
             )
 
         # ---- remote storage upload ----
@@ -80,6 +87,20 @@ class RunArtifactsService:
                 if self._cleanup:
                     self._cleanup_local(local_file=local_img)
 
+        if trace_name:
+            local_trace = trace_path(self._local_root, run_id, trace_name)
+            if local_trace.exists():
+                trace_obj_key = trace_key(run_id, trace_name)
+                self._storage.put_file(
+                    object_key=trace_obj_key,
+                    file_path=local_trace,
+                    content_type="application/zip",
+                )
+                if self._cleanup:
+                    self._cleanup_local(local_file=local_trace)
+
         return UploadedArtifacts(
-            video_object_key=video_obj_key, screenshot_object_key=screenshot_obj_key
+            video_object_key=video_obj_key,
+            screenshot_object_key=screenshot_obj_key,
+            trace_object_key=trace_obj_key,
         )
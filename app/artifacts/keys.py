@@ -4,3 +4,7 @@ def video_key(run_id: int, video_name: str) -> str:
 
 def screenshot_key(run_id: int, image_name: str) -> str:
     return f"screenshots/{run_id}/{image_name}"
+
+
+def trace_key(run_id: int, trace_name: str) -> str:
+    return f"traces/{run_id}/{trace_name}"
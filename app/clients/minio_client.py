@@ -1,16 +1,28 @@
+import os
 from pathlib import Path
 
+import certifi
+import urllib3
 from minio import Minio
 
 from app.core.config import Settings
 
 
 def get_minio_client(settings: Settings) -> Minio:
+    # same defaults as Minio's own PoolManager, with configurable size and timeout
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=settings.minio_timeout_s, read=settings.minio_timeout_s),
+        maxsize=settings.minio_pool_maxsize,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+    )
     return Minio(
         endpoint=settings.minio_endpoint,
         access_key=settings.minio_access_key,
         secret_key=settings.minio_secret_key,
         secure=settings.minio_secure,
+        http_client=http_client,
     )
 
 
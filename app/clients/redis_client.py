@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Any
+
+import redis
+
+from app.core.config import Settings
+
+# message of the ConnectionError BlockingConnectionPool raises when no connection
+# is released within `timeout`; other ConnectionErrors are failures to connect
+POOL_EXHAUSTED_MESSAGE = "No connection available."
+
+
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """
+    BlockingConnectionPool that records checkout wait time and saturation.
+    Callers block up to `timeout` for a free connection instead of opening more
+    than `max_connections`.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)  # type: ignore[no-untyped-call]
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        # ids of connections handed out; the pool also releases connections that
+        # failed to connect, which never counted as in use
+        self._checked_out: set[int] = set()
+
+    def get_connection(self, *args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            conn = super().get_connection(*args, **kwargs)  # type: ignore[no-untyped-call]
+        except redis.ConnectionError as e:
+            if str(e) == POOL_EXHAUSTED_MESSAGE:
+                with self._stats_lock:
+                    self.checkout_timeouts += 1
+            raise
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._checked_out.add(id(conn))
+            self.checkouts += 1
+            self.in_use += 1
+            self.in_use_max = max(self.in_use_max, self.in_use)
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        return conn
+
+    def release(self, connection: Any) -> None:
+        with self._stats_lock:
+            if id(connection) in self._checked_out:
+                self._checked_out.discard(id(connection))
+                self.in_use -= 1
+        super().release(connection)  # type: ignore[no-untyped-call]
+
+    def stats(self) -> dict[str, float]:
+        with self._stats_lock:
+            return {
+                "max_connections": self.max_connections,
+                "in_use": self.in_use,
+                "in_use_max": self.in_use_max,
+                "saturation": round(self.in_use / self.max_connections, 3),
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3)
+                if self.checkouts
+                else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
+
+
+def build_redis_pool(settings: Settings) -> InstrumentedBlockingConnectionPool:
+    return InstrumentedBlockingConnectionPool.from_url(
+        settings.redis_url,
+        decode_responses=True,
+        max_connections=settings.redis_pool_max_connections,
+        timeout=settings.redis_pool_timeout_s,
+        health_check_interval=settings.redis_health_check_interval_s,
+        socket_keepalive=True,
+    )
@@ -3,6 +3,8 @@ from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.core.types import TraceMode, VideoMode
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -12,23 +14,142 @@ class Settings(BaseSettings):
     database_url: str = ""
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3.1:8b"
+
+    # comma-separated Ollama endpoints; when set, overrides ollama_base_url
+    ollama_base_urls: str = ""
+    llm_backend_ewma_alpha: float = 0.3
+    llm_backend_eject_after_failures: int = 3
+    llm_backend_eject_s: float = 30.0
+    llm_backend_probe_interval_s: float = 10.0
+    llm_backend_stats_log_s: float = 300.0
+
+    @property
+    def ollama_endpoints(self) -> list[str]:
+        urls = [u.strip() for u in self.ollama_base_urls.split(",") if u.strip()]
+        return urls or [self.ollama_base_url]
+
     num_predict: int = 800
     num_ctx: int = 8192
 
+    # how long Ollama keeps the model loaded after a request ("-1" forever, "0" unload at once)
+    ollama_keep_alive: str = "30m"
+    llm_warmup_enabled: bool = True
+    # keep-warm ping every interval (0 = off) inside [start_hour, end_hour) of llm_keep_warm_timezone
+    llm_keep_warm_interval_s: float = 600.0
+    llm_keep_warm_start_hour: int = 7
+    llm_keep_warm_end_hour: int = 20
+    llm_keep_warm_weekdays_only: bool = True
+    llm_keep_warm_timezone: str = "UTC"
+    # a generation whose model load took longer than this counts as a cold start
+    llm_cold_start_threshold_ms: float = 1000.0
+
+    # generations kept in flight by one LLM worker (async mode when > 1); match OLLAMA_NUM_PARALLEL
+    llm_concurrency: int = 1
+    llm_http_pool_size: int = 8
+
+    # stream tokens and abort at the first line the validator would reject
+    llm_streaming_enabled: bool = True
+    llm_stream_idle_timeout_s: float = 120.0
+
+    # rewrite up to llm_repair_max_lines unsupported lines instead of failing the proposal
+    llm_repair_enabled: bool = True
+    llm_repair_max_attempts: int = 2
+    llm_repair_max_lines: int = 3
+
+    # upper bound for a proposal's speculative candidates; candidate i > 0 gets seed i and
+    # temperature + i * step, the first valid plan wins and the others are cancelled
+    llm_speculative_max_candidates: int = 4
+    llm_speculative_temperature_step: float = 0.3
+
+    # generated plans keyed by sha256(normalized nl_text, model, PROMPT_VERSION, options)
+    llm_plan_cache_enabled: bool = True
+    llm_plan_cache_ttl_s: int = 30 * 24 * 3600
+    llm_plan_cache_lru_size: int = 1024
+
+    # reuse the plan of a near-duplicate revision text (cosine similarity over Ollama embeddings)
+    llm_semantic_reuse_enabled: bool = False
+    ollama_embed_model: str = "nomic-embed-text"
+    llm_semantic_threshold: float = 0.93
+    llm_semantic_index_size: int = 50_000
+    llm_semantic_backfill_limit: int = 500
+
     redis_url: str = "redis://localhost:6379/0"
+    # API process-wide pool; callers wait up to redis_pool_timeout_s for a free connection
+    redis_pool_max_connections: int = 50
+    redis_pool_timeout_s: float = 2.0
+    redis_health_check_interval_s: int = 30
+
     redis_llm_stream: str = "llm_jobs"
     redis_llm_group: str = "llm_workers"
-    redis_llm_consumer: str = "llm_worker_1"
+    redis_llm_consumer: str = "llm_worker"
+
+    llm_batch_size: int = 1
+    llm_batch_workers: int = 4
 
     redis_test_run_stream: str = "test_run_jobs"
     redis_test_group: str = "test_run_workers"
-    redis_test_consumer: str = "test_run_worker_1"
+    redis_test_consumer: str = "test_run_worker"
+
+    # consumer names are "<prefix>:<host>:<pid>:<start_ms>"; the settings above are the prefixes
+    redis_consumer_heartbeat_ttl_s: int = 60
+
+    redis_reclaim_enabled: bool = True
+    redis_reclaim_interval_s: float = 60.0
+    redis_reclaim_min_idle_ms: int = 30 * 60 * 1000
+    redis_max_deliveries: int = 5
+    redis_dead_letter_suffix: str = ":dead"
+
+    # trimming never drops entries that a group has pending or not yet delivered
+    redis_retention_mode: Literal["off", "maxlen", "minid"] = "off"
+    redis_retention_maxlen: int = 100_000
+    redis_retention_max_age_s: int = 7 * 24 * 3600
+    redis_retention_interval_s: float = 300.0
+    redis_retention_archive_dir: str | None = None
+    # dead-letter streams have no consumer group; entries older than this are trimmed
+    # (archived first when the archive dir is set), 0 keeps them forever
+    redis_dead_letter_max_age_s: int = 30 * 24 * 3600
+
+    # test runs are published to <stream> (interactive), <stream>:ci and <stream>:nightly
+    runner_lane_weight_interactive: int = 8
+    runner_lane_weight_ci: int = 3
+    runner_lane_weight_nightly: int = 1
+    runner_lane_max_wait_s: float = 60.0
+
+    runner_mode: Literal["sequential", "concurrent"] = "sequential"
+    runner_concurrency: int = 4
+
+    runner_browser_pool_enabled: bool = True
+    runner_browser_max_contexts: int = 100
+    runner_browsers_per_type: int = 1
+    runner_browser_max_rss_mb: int = 0
+    runner_pool_stats_log_every: int = 50
+
+    # defaults for runs whose run_params leave playwright_video* unset
+    runner_video_mode: VideoMode = "on_failure"
+    runner_video_sample_percent: int = 10
+    runner_video_width: int = 1280
+    runner_video_height: int = 720
+    runner_trace_mode: TraceMode = "off"
+
+    # rendered plans per (proposal, placeholder set); 0 disables
+    runner_plan_cache_size: int = 1024
+
+    # backpressure on run / proposal creation; limits apply to group lag and queued+running rows
+    admission_enabled: bool = False
+    admission_drain_window_s: int = 300
+    admission_retry_after_max_s: int = 3600
+    admission_max_test_run_lag: int = 1000
+    admission_max_active_test_runs: int = 2000
+    admission_max_plan_lag: int = 200
+    admission_max_active_plan_proposals: int = 500
 
     minio_endpoint: str = "localhost:9000"
     minio_access_key: str = "minioadmin"
     minio_secret_key: str = "minioadmin"
     minio_bucket: str = "test-artifacts"
     minio_secure: bool = False
+    minio_pool_maxsize: int = 20
+    minio_timeout_s: float = 30.0
 
     artifacts_root: str | None = None
 
@@ -0,0 +1,14 @@
+from typing import Literal
+
+# value sets shared by the API schemas, settings and the workers
+
+# test_run lane a run is queued on; interactive keeps the base stream
+RunPriority = Literal["interactive", "ci", "nightly"]
+
+# off: never record; on_failure: record, keep only failed runs; always: record and keep;
+# sampled: record and keep a stable sample_percent share of runs
+VideoMode = Literal["off", "on_failure", "always", "sampled"]
+
+# Playwright trace (DOM snapshots, network, console): far smaller than a video, and only
+# written out for failed runs
+TraceMode = Literal["off", "on_failure"]
@@ -1,12 +1,14 @@
 from collections.abc import Generator
 
-from fastapi import Depends
+import redis
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
 
-from app.artifacts.factory import build_artifact_storage
 from app.artifacts.storage import ArtifactStorage
-from app.core.config import settings
+from app.clients.redis_client import InstrumentedBlockingConnectionPool
 from app.db.session import SessionLocal
+from app.queue.admission import AdmissionController
+from app.queue.metrics import QueueMetricsCollector
 from app.queue.redis_queue import RedisPublisher
 from app.repositories.repositories import (
     PlanProposalRepository,
@@ -33,8 +35,26 @@ def get_uow(db: Session = Depends(get_db)) -> UnitOfWork:
     return UnitOfWork(db)
 
 
-def get_redis_publisher() -> RedisPublisher:
-    return RedisPublisher()
+def get_redis(request: Request) -> redis.Redis:
+    return request.app.state.redis  # type: ignore[no-any-return]
+
+
+def get_redis_pool(request: Request) -> InstrumentedBlockingConnectionPool:
+    return request.app.state.redis_pool  # type: ignore[no-any-return]
+
+
+def get_redis_publisher(request: Request) -> RedisPublisher:
+    return request.app.state.redis_publisher  # type: ignore[no-any-return]
+
+
+def get_queue_metrics_collector(r: redis.Redis = Depends(get_redis)) -> QueueMetricsCollector:
+    return QueueMetricsCollector.from_settings(r)
+
+
+def get_admission_controller(
+    collector: QueueMetricsCollector = Depends(get_queue_metrics_collector),
+) -> AdmissionController:
+    return AdmissionController.from_settings(collector)
 
 
 def get_test_case_repo(db: Session = Depends(get_db)) -> TestCaseRepository:
@@ -53,5 +73,5 @@ def get_test_run_repo(db: Session = Depends(get_db)) -> TestRunRepository:
     return TestRunRepository(db)
 
 
-def get_artifact_storage() -> ArtifactStorage:
-    return build_artifact_storage(settings)
+def get_artifact_storage(request: Request) -> ArtifactStorage:
+    return request.app.state.artifact_storage  # type: ignore[no-any-return]
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import httpx
+import requests
+from loguru import logger
+
+from app.core.config import settings
+from app.llm.dto import BackendStats
+
+
+def is_backend_failure(e: BaseException) -> bool:
+    """Transport errors and 5xx count against the endpoint; bad model output does not."""
+    if isinstance(e, requests.HTTPError):
+        return e.response is None or e.response.status_code >= 500
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, requests.ConnectionError | requests.Timeout | httpx.TransportError)
+
+
+def is_connect_error(e: BaseException) -> bool:
+    """Nothing reached the endpoint, so the request can be sent to another one."""
+    return isinstance(e, requests.ConnectionError | httpx.ConnectError | httpx.ConnectTimeout)
+
+
+class LLMBackendPool:
+    """
+    Routes each request to the healthy endpoint with the lowest expected wait,
+    (in_flight + 1) * EWMA latency. Endpoints without a latency sample go first
+    so every endpoint gets measured.
+
+    After eject_after consecutive failures an endpoint is skipped for eject_s;
+    BackendHealthChecker can bring it back earlier once it answers again. When
+    every endpoint is ejected, the one whose ejection ends first is used.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        *,
+        ewma_alpha: float = 0.3,
+        eject_after: int = 3,
+        eject_s: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._backends = {
+            url: BackendStats(url=url) for url in dict.fromkeys(u.rstrip("/") for u in urls)
+        }
+        if not self._backends:
+            raise ValueError("at least one LLM endpoint is required")
+        self._ewma_alpha = ewma_alpha
+        self._eject_after = eject_after
+        self._eject_s = eject_s
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "LLMBackendPool":
+        return cls(
+            settings.ollama_endpoints,
+            ewma_alpha=settings.llm_backend_ewma_alpha,
+            eject_after=settings.llm_backend_eject_after_failures,
+            eject_s=settings.llm_backend_eject_s,
+        )
+
+    def __len__(self) -> int:
+        return len(self._backends)
+
+    @property
+    def urls(self) -> list[str]:
+        return list(self._backends)
+
+    @staticmethod
+    def _cost(b: BackendStats) -> tuple[float, int, int]:
+        latency = b.ewma_ms if b.ewma_ms is not None else 0.0
+        return (b.in_flight + 1) * latency, b.in_flight, b.generations
+
+    def acquire(self, exclude: Iterable[str] = ()) -> str:
+        skip = set(exclude)
+        with self._lock:
+            now = self._clock()
+            candidates = [b for b in self._backends.values() if b.url not in skip]
+            if not candidates:
+                raise ValueError("every LLM endpoint is excluded")
+            healthy = [b for b in candidates if b.ejected_until <= now]
+            if healthy:
+                backend = min(healthy, key=self._cost)
+            else:
+                backend = min(candidates, key=lambda b: b.ejected_until)
+            backend.in_flight += 1
+            return backend.url
+
+    def release(self, url: str, elapsed_s: float, *, ok: bool | None) -> None:
+        """ok=None: the endpoint answered but the request did not complete (e.g. invalid plan)."""
+        with self._lock:
+            b = self._backends[url]
+            b.in_flight -= 1
+            if ok is False:
+                b.failures += 1
+                b.consecutive_failures += 1
+                if b.consecutive_failures >= self._eject_after:
+                    self._eject(b)
+                return
+
+            b.consecutive_failures = 0
+            if ok:
+                elapsed_ms = elapsed_s * 1000
+                b.generations += 1
+                b.busy_s += elapsed_s
+                if b.ewma_ms is None:
+                    b.ewma_ms = elapsed_ms
+                else:
+                    b.ewma_ms += self._ewma_alpha * (elapsed_ms - b.ewma_ms)
+
+    def _eject(self, b: BackendStats) -> None:
+        b.ejected_until = self._clock() + self._eject_s
+        b.ejections += 1
+        logger.warning(
+            "LLM backends: ejected {} for {}s after {} consecutive failures",
+            b.url,
+            self._eject_s,
+            b.consecutive_failures,
+        )
+
+    @contextmanager
+    def lease(self, exclude: Iterable[str] = ()) -> Iterator[str]:
+        url = self.acquire(exclude)
+        t0 = self._clock()
+        try:
+            yield url
+        except BaseException as e:
+            self.release(url, self._clock() - t0, ok=False if is_backend_failure(e) else None)
+            raise
+        else:
+            self.release(url, self._clock() - t0, ok=True)
+
+    def ejected(self) -> list[str]:
+        with self._lock:
+            now = self._clock()
+            return [b.url for b in self._backends.values() if b.ejected_until > now]
+
+    def reinstate(self, url: str) -> None:
+        with self._lock:
+            b = self._backends[url]
+            b.ejected_until = 0.0
+            b.consecutive_failures = 0
+        logger.info("LLM backends: {} is back", url)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            now = self._clock()
+            total = sum(b.generations for b in self._backends.values())
+            return [
+                b.as_dict(now=now, uptime_s=now - self._started, total_generations=total)
+                for b in self._backends.values()
+            ]
+
+
+class BackendHealthChecker:
+    """Probes ejected endpoints with GET /api/tags and periodically logs per-endpoint throughput."""
+
+    def __init__(
+        self,
+        pool: LLMBackendPool,
+        *,
+        interval_s: float,
+        stats_log_s: float,
+        timeout_s: float = 5.0,
+        session: requests.Session | None = None,
+    ) -> None:
+        self._pool = pool
+        self._interval_s = interval_s
+        self._stats_log_s = stats_log_s
+        self._timeout_s = timeout_s
+        self._session = session or requests.Session()
+        self._last_stats_log = time.monotonic()
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def probe(self, url: str) -> bool:
+        try:
+            r = self._session.get(f"{url}/api/tags", timeout=self._timeout_s)
+        except requests.RequestException:
+            return False
+        return r.ok
+
+    def check_once(self) -> list[str]:
+        """Returns the endpoints that were reinstated."""
+        back = [url for url in self._pool.ejected() if self.probe(url)]
+        for url in back:
+            self._pool.reinstate(url)
+        return back
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.check_once()
+                if (
+                    self._stats_log_s
+                    and time.monotonic() - self._last_stats_log >= self._stats_log_s
+                ):
+                    self._last_stats_log = time.monotonic()
+                    logger.info("LLM backends: {}", self._pool.stats())
+            except Exception as e:
+                logger.error("LLM backends: health check failed: {}", e)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="llm-backends-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
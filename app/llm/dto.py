@@ -0,0 +1,220 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True)
+class PlanMatch:
+    score: float
+    key: str
+    nl_text: str
+    plan: dict[str, Any]
+
+
+@dataclass
+class GenerationStats:
+    """queue wait = proposal created_at -> generation start; generation = LLM call only"""
+
+    generations: int = 0
+    failed: int = 0
+    in_flight: int = 0
+    in_flight_max: int = 0
+    queue_wait_ms_total: float = 0.0
+    queue_wait_ms_max: float = 0.0
+    generation_ms_total: float = 0.0
+    generation_ms_max: float = 0.0
+
+    def started(self, queue_wait_ms: float) -> None:
+        self.in_flight += 1
+        self.in_flight_max = max(self.in_flight_max, self.in_flight)
+        self.queue_wait_ms_total += queue_wait_ms
+        self.queue_wait_ms_max = max(self.queue_wait_ms_max, queue_wait_ms)
+
+    def finished(self, generation_ms: float, *, ok: bool) -> None:
+        self.in_flight -= 1
+        self.generations += 1
+        if not ok:
+            self.failed += 1
+        self.generation_ms_total += generation_ms
+        self.generation_ms_max = max(self.generation_ms_max, generation_ms)
+
+    def as_dict(self) -> dict[str, float]:
+        n = self.generations or 1
+        return {
+            "generations": self.generations,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "in_flight_max": self.in_flight_max,
+            "queue_wait_ms_avg": round(self.queue_wait_ms_total / n, 1),
+            "queue_wait_ms_max": round(self.queue_wait_ms_max, 1),
+            "generation_ms_avg": round(self.generation_ms_total / n, 1),
+            "generation_ms_max": round(self.generation_ms_max, 1),
+        }
+
+
+@dataclass
+class BackendStats:
+    """Live state of one Ollama endpoint; ewma_ms is None until its first successful generation."""
+
+    url: str
+    in_flight: int = 0
+    ewma_ms: float | None = None
+    generations: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    busy_s: float = 0.0
+
+    def as_dict(self, *, now: float, uptime_s: float, total_generations: int) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.ejected_until <= now,
+            "in_flight": self.in_flight,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "generations": self.generations,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "generations_per_min": round(self.generations / uptime_s * 60, 2) if uptime_s else 0.0,
+            "busy_s": round(self.busy_s, 1),
+            "share": round(self.generations / total_generations, 3) if total_generations else 0.0,
+        }
+
+
+@dataclass(frozen=True)
+class InvalidLine:
+    """A plan line that matches no allowed pattern; index is 0-based within its section."""
+
+    section: str
+    index: int
+    line: str
+
+    def describe(self) -> str:
+        kind = "step" if self.section == "steps" else "assertion"
+        return f"unsupported {kind} #{self.index + 1}: {self.line}"
+
+
+@dataclass(frozen=True)
+class GenerationResult:
+    """Raw model text plus Ollama's timings and token counts; None when the final chunk was not read."""
+
+    text: str
+    load_ms: float | None = None
+    first_token_ms: float | None = None
+    prompt_eval_count: int | None = None
+    eval_count: int | None = None
+    total_ms: float | None = None
+    prompt_eval_ms: float | None = None
+    eval_ms: float | None = None
+    model: str | None = None
+    repair: bool = False
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class ColdWarmLatency:
+    """
+    Generation latency split by whether Ollama had to load the model first
+    (load_duration, or time to first token when that is unknown, over the threshold).
+    """
+
+    threshold_ms: float
+    window: int = 500
+    cold: deque[float] = field(init=False)
+    warm: deque[float] = field(init=False)
+    cold_total: int = 0
+    warm_total: int = 0
+
+    def __post_init__(self) -> None:
+        self.cold = deque(maxlen=self.window)
+        self.warm = deque(maxlen=self.window)
+
+    def is_cold(self, result: GenerationResult) -> bool:
+        load_ms = result.load_ms if result.load_ms is not None else result.first_token_ms
+        return load_ms is not None and load_ms >= self.threshold_ms
+
+    def record(self, elapsed_ms: float, result: GenerationResult) -> bool:
+        cold = self.is_cold(result)
+        if cold:
+            self.cold.append(elapsed_ms)
+            self.cold_total += 1
+        else:
+            self.warm.append(elapsed_ms)
+            self.warm_total += 1
+        return cold
+
+    @property
+    def generations(self) -> int:
+        return self.cold_total + self.warm_total
+
+    def warm_p50_ms(self) -> float | None:
+        return _percentile(list(self.warm), 0.5) if self.warm else None
+
+    def as_dict(self) -> dict[str, float]:
+        cold, warm = list(self.cold), list(self.warm)
+        return {
+            "cold": self.cold_total,
+            "warm": self.warm_total,
+            "cold_p50_ms": round(_percentile(cold, 0.5), 1),
+            "cold_p99_ms": round(_percentile(cold, 0.99), 1),
+            "warm_p50_ms": round(_percentile(warm, 0.5), 1),
+            "warm_p99_ms": round(_percentile(warm, 0.99), 1),
+            "all_p99_ms": round(_percentile(cold + warm, 0.99), 1),
+        }
+
+
+@dataclass
+class SpeculationOutcome:
+    """
+    Filled by the LLM client when a proposal races several candidate generations.
+    saved_ms is an estimate: the warm p50 of a single generation minus the winner's time.
+    """
+
+    candidates: int
+    winner: int | None = None
+    winner_ms: float | None = None
+    saved_ms: float | None = None
+
+
+@dataclass
+class TokenStats:
+    """
+    prompt_eval_count only covers prompt tokens the server had to evaluate, so it
+    drops when the system prompt prefix is served from the KV cache.
+    """
+
+    prompt_version: int
+    generations: int = 0
+    malformed: int = 0
+    counted: int = 0
+    prompt_eval_total: int = 0
+    eval_total: int = 0
+
+    def record(self, result: GenerationResult) -> None:
+        self.generations += 1
+        if result.prompt_eval_count is None or result.eval_count is None:
+            return
+        self.counted += 1
+        self.prompt_eval_total += result.prompt_eval_count
+        self.eval_total += result.eval_count
+
+    def record_malformed(self) -> None:
+        self.malformed += 1
+
+    def as_dict(self) -> dict[str, float]:
+        n = self.counted or 1
+        attempts = self.generations + self.malformed
+        return {
+            "prompt_version": self.prompt_version,
+            "generations": self.generations,
+            "malformed": self.malformed,
+            "malformed_rate": round(self.malformed / attempts, 3) if attempts else 0.0,
+            "prompt_eval_avg": round(self.prompt_eval_total / n, 1),
+            "eval_avg": round(self.eval_total / n, 1),
+        }
@@ -1,35 +1,47 @@
 import json
-import re
 from typing import Any
 
+from app.llm.dto import InvalidLine
+from app.plan.compiler import compile_assertion, compile_assertions, compile_step, compile_steps
+from app.plan.dto import OpCode
+
+# shared with IncrementalPlanParser, so streamed and buffered output is held to the same limits
+MAX_STEPS = 60
+MAX_ASSERTIONS = 40
+MAX_LINE_LEN = 500
+
 
 class PlanValidationError(ValueError):
     pass
 
 
-# --- Allowed patterns (JS-like strings from LLM) ---
-RE_GOTO = re.compile(r"^await page\.goto\('(?P<url>[^']+)'\)$")
-RE_FILL = re.compile(r"^await page\.fill\('(?P<sel>[^']+)',\s*'(?P<val>.*)'\)$")
-RE_CLICK = re.compile(r"^await page\.click\('(?P<sel>[^']+)'\)$")
-RE_WAIT_SEL = re.compile(r"^await page\.waitForSelector\('(?P<sel>[^']+)'\)$")
-RE_WAIT_URL_STR = re.compile(r"^await page\.waitForURL\('(?P<url>[^']+)'\)$")
-RE_WAIT_URL_RE = re.compile(r"^await page\.waitForURL\(/(?P<pat>.+)/\)$")
+class PlanLineError(PlanValidationError):
+    """
+    The plan is well-formed but some lines match no allowed pattern. Carries the
+    parsed plan and every offending line so they can be repaired in place.
+    """
+
+    def __init__(self, plan: dict[str, list[str]], invalid: list[InvalidLine]) -> None:
+        self.plan = plan
+        self.invalid = invalid
+        more = f" (+{len(invalid) - 1} more)" if len(invalid) > 1 else ""
+        super().__init__(invalid[0].describe() + more)
+
 
-RE_EXPECT_URL_STR = re.compile(r"^await expect\(page\)\.toHaveURL\('(?P<url>[^']+)'\)$")
-RE_EXPECT_URL_RE = re.compile(r"^await expect\(page\)\.toHaveURL\(/(?P<pat>.+)/\)$")
-RE_EXPECT_VISIBLE = re.compile(
-    r"^await expect\(page\.locator\('(?P<sel>[^']+)'\)\)\.toBeVisible\(\)$"
-)
-RE_EXPECT_CONTAINS = re.compile(
-    r"^await expect\(page\.locator\('(?P<sel>[^']+)'\)\)\.toContainText\('(?P<text>.*)'\)$"
-)
+def is_allowed_step(line: str) -> bool:
+    return compile_step(line) is not None
 
-ALLOWED_STEP_RES = [RE_GOTO, RE_FILL, RE_CLICK, RE_WAIT_SEL, RE_WAIT_URL_STR, RE_WAIT_URL_RE]
-ALLOWED_ASSERT_RES = [RE_EXPECT_URL_STR, RE_EXPECT_URL_RE, RE_EXPECT_VISIBLE, RE_EXPECT_CONTAINS]
+
+def is_allowed_assertion(line: str) -> bool:
+    return compile_assertion(line) is not None
 
 
 def validate_plan_payload(
-    raw: Any, *, max_steps: int = 60, max_assertions: int = 40
+    raw: Any,
+    *,
+    max_steps: int = MAX_STEPS,
+    max_assertions: int = MAX_ASSERTIONS,
+    max_line_len: int = MAX_LINE_LEN,
 ) -> dict[str, Any]:
     if raw is None:
         raise PlanValidationError("plan_payload is null")
@@ -60,21 +72,24 @@ def validate_plan_payload(
         raise PlanValidationError(f"too many steps: {len(steps)} > {max_steps}")
     if len(assertions) > max_assertions:
         raise PlanValidationError(f"too many assertions: {len(assertions)} > {max_assertions}")
-
-    # validate each line
-    def _match_any(string: str, res: list[re.Pattern[str]]) -> bool:
-        return any(r.match(string.strip()) for r in res)
-
-    for i, s in enumerate(steps, 1):
-        if not _match_any(s, ALLOWED_STEP_RES):
-            raise PlanValidationError(f"unsupported step #{i}: {s}")
-
-    for i, a in enumerate(assertions, 1):
-        if not _match_any(a, ALLOWED_ASSERT_RES):
-            raise PlanValidationError(f"unsupported assertion #{i}: {a}")
+    if any(len(x) > max_line_len for x in (*steps, *assertions)):
+        raise PlanValidationError(f"line longer than {max_line_len} characters")
+
+    # compile each line once, collecting all bad ones so a repair can fix them in one call
+    step_ops = compile_steps(steps)
+    assert_ops = compile_assertions(assertions)
+    invalid = [InvalidLine("steps", i, s) for i, s in enumerate(steps) if step_ops[i] is None]
+    invalid += [
+        InvalidLine("assertions", i, a) for i, a in enumerate(assertions) if assert_ops[i] is None
+    ]
+    if invalid:
+        raise PlanLineError({"steps": list(steps), "assertions": list(assertions)}, invalid)
 
     # simple semantics: must have goto
-    if not any(RE_GOTO.match(s.strip()) for s in steps):
+    if not any(op is not None and op.op is OpCode.goto for op in step_ops):
         raise PlanValidationError("steps must include at least one page.goto(...)")
 
-    return {"steps": [s.strip() for s in steps], "assertions": [a.strip() for a in assertions]}
+    return {
+        "steps": [op.source for op in step_ops if op is not None],
+        "assertions": [op.source for op in assert_ops if op is not None],
+    }
@@ -1,12 +1,35 @@
+import asyncio
 import json
 import re
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
 from typing import Any, Protocol
 
+import httpx
 import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
 
 from app.core.config import settings
-from app.llm.llm_output_validator import validate_plan_payload
-from app.llm.utils import get_llm_request_payload
+from app.llm.backend_pool import LLMBackendPool, is_connect_error
+from app.llm.dto import (
+    ColdWarmLatency,
+    GenerationResult,
+    InvalidLine,
+    SpeculationOutcome,
+    TokenStats,
+)
+from app.llm.llm_output_validator import PlanValidationError, validate_plan_payload
+from app.llm.stream_parser import IncrementalPlanParser
+from app.llm.utils import (
+    PROMPT_VERSION,
+    get_llm_repair_payload,
+    get_llm_request_payload,
+    get_warmup_payload,
+)
 
 
 def _extract_json_object(text: str) -> str:
@@ -29,33 +52,562 @@ class LLMClient(Protocol):
     def generate_plan_json(self, nl_text: str) -> dict[str, Any]: ...
 
 
+class AsyncLLMClient(Protocol):
+    async def agenerate_plan_json(self, nl_text: str) -> dict[str, Any]: ...
+
+
+class KeyedLLMClient(LLMClient, AsyncLLMClient, Protocol):
+    """LLM client that exposes what its output depends on, for cache keys."""
+
+    @property
+    def model(self) -> str: ...
+
+    def generation_options(self) -> dict[str, Any]: ...
+
+
+class RepairableLLMClient(KeyedLLMClient, Protocol):
+    """LLM client that can rewrite single plan lines the validator rejected."""
+
+    def repair_lines(self, nl_text: str, invalid: list[InvalidLine]) -> list[str]: ...
+
+    async def arepair_lines(self, nl_text: str, invalid: list[InvalidLine]) -> list[str]: ...
+
+
+class Embedder(Protocol):
+    def embed(self, text: str) -> list[float]: ...
+
+
+_session: requests.Session | None = None
+_backend_pool: LLMBackendPool | None = None
+_latency: ColdWarmLatency | None = None
+_tokens: TokenStats | None = None
+_captured: ContextVar[list[GenerationResult] | None] = ContextVar(
+    "llm_captured_generations", default=None
+)
+_speculation: ContextVar[SpeculationOutcome | None] = ContextVar("llm_speculation", default=None)
+
+
+def shared_session() -> requests.Session:
+    """One keep-alive connection pool per process for the sync client."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.llm_http_pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def shared_backend_pool() -> LLMBackendPool:
+    """Endpoints from settings; shared so routing state survives per-message clients."""
+    global _backend_pool
+    if _backend_pool is None:
+        _backend_pool = LLMBackendPool.from_settings()
+    return _backend_pool
+
+
+def shared_latency_stats() -> ColdWarmLatency:
+    global _latency
+    if _latency is None:
+        _latency = ColdWarmLatency(threshold_ms=settings.llm_cold_start_threshold_ms)
+    return _latency
+
+
+@contextmanager
+def capture_generations() -> Iterator[list[GenerationResult]]:
+    """
+    Collects the Ollama calls made in this context (thread or asyncio task), so a
+    worker can store their token counts and timings on the proposal. Plans served
+    from the cache or by semantic reuse leave the list empty.
+    """
+    results: list[GenerationResult] = []
+    token = _captured.set(results)
+    try:
+        yield results
+    finally:
+        _captured.reset(token)
+
+
+@contextmanager
+def speculate(candidates: int) -> Iterator[SpeculationOutcome]:
+    """
+    Makes OllamaClient race `candidates` generations for plans requested in this
+    context; the outcome says which one won. candidates=1 is a regular generation.
+    """
+    outcome = SpeculationOutcome(candidates=candidates)
+    token = _speculation.set(outcome if candidates > 1 else None)
+    try:
+        yield outcome
+    finally:
+        _speculation.reset(token)
+
+
+def shared_token_stats() -> TokenStats:
+    global _tokens
+    if _tokens is None:
+        _tokens = TokenStats(prompt_version=PROMPT_VERSION)
+    return _tokens
+
+
+def _ns_to_ms(value: Any) -> float | None:
+    return value / 1e6 if isinstance(value, int | float) else None
+
+
+def build_async_http_client() -> httpx.AsyncClient:
+    """Keep-alive pool sized to the number of generations kept in flight."""
+    size = max(settings.llm_concurrency, settings.llm_http_pool_size)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+        timeout=httpx.Timeout(600, connect=10, read=settings.llm_stream_idle_timeout_s),
+    )
+
+
+_STATS_TAIL_LINES = 8
+
+
+class _PlanStream:
+    """Shared by the sync and async streaming paths: one instance per generation."""
+
+    def __init__(self, max_invalid_lines: int = 0) -> None:
+        self.parser = IncrementalPlanParser(max_invalid_lines=max_invalid_lines)
+        self._started = time.perf_counter()
+        self.first_token_ms: float | None = None
+        self.final: dict[str, Any] = {}
+        self._tail_lines = 0
+
+    def on_line(self, line: str | bytes) -> bool:
+        """Returns True once reading can stop."""
+        if not line:
+            return False
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(f"ollama_error: {chunk['error']}")
+
+        if chunk.get("done"):
+            self.final = chunk
+        if self.parser.done:
+            # the plan is complete; only wait a little for the final chunk with the token counts
+            self._tail_lines += 1
+            return bool(chunk.get("done")) or self._tail_lines >= _STATS_TAIL_LINES
+
+        if self.first_token_ms is None and chunk.get("response"):
+            self.first_token_ms = (time.perf_counter() - self._started) * 1000
+
+        try:
+            self.parser.feed(chunk.get("response", ""))
+        except PlanValidationError as e:
+            logger.warning(
+                f"LLM stream aborted after {time.perf_counter() - self._started:.1f}s: {e}"
+            )
+            raise
+
+        if chunk.get("done"):
+            if chunk.get("done_reason") == "length":
+                raise RuntimeError(
+                    f"ollama_error: truncated output (done_reason=length). Increase num_predict. Partial: {self.parser.text[:200]!r}"
+                )
+            return True
+        if time.perf_counter() - self._started > 600:
+            raise RuntimeError("ollama_error: generation exceeded 600s")
+        return False
+
+    def result(self) -> GenerationResult:
+        return _generation_result(self.parser.text.strip(), self.final, self.first_token_ms)
+
+
+def _generation_result(
+    text: str, final: dict[str, Any], first_token_ms: float | None = None
+) -> GenerationResult:
+    return GenerationResult(
+        text=text,
+        load_ms=_ns_to_ms(final.get("load_duration")),
+        first_token_ms=first_token_ms,
+        prompt_eval_count=final.get("prompt_eval_count"),
+        eval_count=final.get("eval_count"),
+        total_ms=_ns_to_ms(final.get("total_duration")),
+        prompt_eval_ms=_ns_to_ms(final.get("prompt_eval_duration")),
+        eval_ms=_ns_to_ms(final.get("eval_duration")),
+    )
+
+
+def _parse_plan(raw: str) -> dict[str, Any]:
+    try:
+        plan_json = json.loads(raw)
+    except json.JSONDecodeError:
+        json_text = _extract_json_object(raw)
+        plan_json = json.loads(json_text)
+
+    return validate_plan_payload(plan_json)
+
+
+def _parse_repair(raw: str, expected: int) -> list[str]:
+    try:
+        lines = json.loads(raw).get("lines")
+    except (json.JSONDecodeError, AttributeError) as e:
+        raise PlanValidationError(f"repair output is not a JSON object: {raw[:200]!r}") from e
+    if not isinstance(lines, list) or not all(isinstance(x, str) for x in lines):
+        raise PlanValidationError("repair output: lines must be list[str]")
+    if len(lines) != expected:
+        raise PlanValidationError(f"repair output: expected {expected} lines, got {len(lines)}")
+    return lines
+
+
 class OllamaClient:
-    def __init__(self, base_url: str | None = None, model: str | None = None):
-        self._base_url = (base_url or settings.ollama_base_url).rstrip("/")
+    """
+    Sync calls go through a shared requests.Session; the async methods need an
+    httpx.AsyncClient (see build_async_http_client) shared by all in-flight generations.
+    Each call goes to the endpoint the backend pool picks; a connection refused by
+    one endpoint is retried once on another.
+    With max_invalid_lines the stream is only aborted once more lines than that are
+    unsupported; fewer end up in a PlanLineError for RepairingLLMClient to repair.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        *,
+        session: requests.Session | None = None,
+        async_http: httpx.AsyncClient | None = None,
+        backends: LLMBackendPool | None = None,
+        latency: ColdWarmLatency | None = None,
+        tokens: TokenStats | None = None,
+        max_invalid_lines: int = 0,
+    ):
+        if backends is None:
+            backends = LLMBackendPool([base_url]) if base_url else shared_backend_pool()
+        self._backends = backends
         self._model = model or settings.ollama_model
+        self._session = session or shared_session()
+        self._async_http = async_http
+        self._latency = latency or shared_latency_stats()
+        self._tokens = tokens or shared_token_stats()
+        self._max_invalid_lines = max_invalid_lines
 
-    def generate_plan_json(self, nl_text: str) -> dict[str, Any]:
-        payload = get_llm_request_payload(
-            nl_text, self._model, settings.num_predict, settings.num_ctx
+    def _may_retry(self, e: Exception, tried: list[str]) -> bool:
+        return is_connect_error(e) and len(tried) < min(len(self._backends), 2)
+
+    def _call(self, fn: Callable[[str], Any]) -> Any:
+        tried: list[str] = []
+        while True:
+            base_url = ""
+            try:
+                with self._backends.lease(exclude=tried) as base_url:
+                    return fn(base_url)
+            except Exception as e:
+                tried.append(base_url)
+                if not self._may_retry(e, tried):
+                    raise
+                logger.warning(
+                    "Ollama: {} unreachable ({}), retrying on another endpoint", base_url, e
+                )
+
+    async def _acall(self, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        tried: list[str] = []
+        while True:
+            base_url = ""
+            try:
+                with self._backends.lease(exclude=tried) as base_url:
+                    return await fn(base_url)
+            except Exception as e:
+                tried.append(base_url)
+                if not self._may_retry(e, tried):
+                    raise
+                logger.warning(
+                    "Ollama: {} unreachable ({}), retrying on another endpoint", base_url, e
+                )
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def generation_options(self) -> dict[str, Any]:
+        return dict(
+            get_llm_request_payload("", self._model, settings.num_predict, settings.num_ctx)[
+                "options"
+            ]
+        )
+
+    def _payload(self, nl_text: str) -> dict[str, Any]:
+        return get_llm_request_payload(
+            nl_text,
+            self._model,
+            settings.num_predict,
+            settings.num_ctx,
+            keep_alive=settings.ollama_keep_alive,
         )
 
-        r = requests.post(f"{self._base_url}/api/generate", json=payload, timeout=600)
+    def _candidate_payloads(self, nl_text: str, n: int) -> list[dict[str, Any]]:
+        """Candidate 0 is the regular request; the others differ in seed and temperature."""
+        base = self._payload(nl_text)
+        payloads = [base]
+        for i in range(1, n):
+            options = dict(base["options"])
+            options["seed"] = i
+            options["temperature"] = round(
+                min(1.0, options["temperature"] + i * settings.llm_speculative_temperature_step), 2
+            )
+            payloads.append({**base, "options": options})
+        return payloads
+
+    def _with_async_http(self, http: httpx.AsyncClient) -> "OllamaClient":
+        return OllamaClient(
+            model=self._model,
+            session=self._session,
+            async_http=http,
+            backends=self._backends,
+            latency=self._latency,
+            tokens=self._tokens,
+            max_invalid_lines=self._max_invalid_lines,
+        )
+
+    def warm_up(self) -> dict[str, float]:
+        """
+        Loads the model on every endpoint so the first proposal does not pay for it.
+        Goes around the backend pool: a load is not a generation and must not move the EWMA.
+        Returns the wall time per endpoint that answered, in ms.
+        """
+        payload = get_warmup_payload(self._model, keep_alive=settings.ollama_keep_alive)
+        loaded: dict[str, float] = {}
+        for base_url in self._backends.urls:
+            started = time.perf_counter()
+            try:
+                r = self._session.post(f"{base_url}/api/generate", json=payload, timeout=600)
+                r.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning(f"Ollama: warm-up of {self._model} on {base_url} failed: {e}")
+                continue
+            loaded[base_url] = (time.perf_counter() - started) * 1000
+            load_ms = _ns_to_ms(r.json().get("load_duration"))
+            logger.info(
+                f"Ollama: {self._model} warm on {base_url} in {loaded[base_url]:.0f} ms"
+                f" (model load {load_ms or 0:.0f} ms)"
+            )
+        return loaded
+
+    def _capture(self, result: GenerationResult) -> None:
+        captured = _captured.get()
+        if captured is not None:
+            captured.append(replace(result, model=self._model))
+
+    def _record(self, started: float, result: GenerationResult) -> None:
+        self._tokens.record(result)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if self._latency.record(elapsed_ms, result):
+            load_ms = result.load_ms if result.load_ms is not None else result.first_token_ms
+            logger.warning(
+                f"Ollama: cold start, model load {load_ms:.0f} ms of {elapsed_ms:.0f} ms generation"
+            )
+        if self._latency.generations % 100 == 0:
+            logger.info(f"Ollama: cold/warm latency {self._latency.as_dict()}")
+            logger.info(f"Ollama: tokens {self._tokens.as_dict()}")
+
+    def _embed(self, base_url: str, text: str) -> list[float]:
+        r = self._session.post(
+            f"{base_url}/api/embed",
+            json={"model": settings.ollama_embed_model, "input": text},
+            timeout=60,
+        )
         r.raise_for_status()
+        return r.json()["embeddings"][0]  # type: ignore[no-any-return]
 
-        data = r.json()
+    def embed(self, text: str) -> list[float]:
+        return self._call(lambda base_url: self._embed(base_url, text))  # type: ignore[no-any-return]
+
+    @staticmethod
+    def _response_text(data: dict[str, Any]) -> str:
         if data.get("done_reason") == "length":
             raise RuntimeError(
                 f"ollama_error: truncated output (done_reason=length). Increase num_predict. Partial: {data.get('response', '')[:200]!r}"
             )
 
-        raw = (data.get("response") or "").strip()
+        return (data.get("response") or "").strip()
+
+    @classmethod
+    def _blocking_result(cls, data: dict[str, Any]) -> GenerationResult:
+        return _generation_result(cls._response_text(data), data)
 
+    def _generate_blocking(self, base_url: str, payload: dict[str, Any]) -> GenerationResult:
+        r = self._session.post(f"{base_url}/api/generate", json=payload, timeout=600)
+        r.raise_for_status()
+        return self._blocking_result(r.json())
+
+    def _generate_streaming(self, base_url: str, payload: dict[str, Any]) -> GenerationResult:
+        """
+        Feeds tokens to IncrementalPlanParser as they arrive. Leaving the `with`
+        block closes the connection, which makes Ollama stop generating, so an
+        invalid line costs the tokens up to that line and not num_predict.
+        """
+        stream = _PlanStream(self._max_invalid_lines)
+        with self._session.post(
+            f"{base_url}/api/generate",
+            json={**payload, "stream": True},
+            stream=True,
+            timeout=(10, settings.llm_stream_idle_timeout_s),
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if stream.on_line(line):
+                    break
+
+        return stream.result()
+
+    def generate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        outcome = _speculation.get()
+        if outcome is not None:
+            return self._speculate_blocking(nl_text, outcome)
+        payload = self._payload(nl_text)
+
+        generate = (
+            self._generate_streaming if settings.llm_streaming_enabled else self._generate_blocking
+        )
+        started = time.perf_counter()
         try:
-            plan_json = json.loads(raw)
-        except json.JSONDecodeError:
-            json_text = _extract_json_object(raw)
-            plan_json = json.loads(json_text)
+            result: GenerationResult = self._call(lambda base_url: generate(base_url, payload))
+            self._capture(result)
+            plan = _parse_plan(result.text)
+        except ValueError:
+            # invalid JSON, no JSON object at all, or a plan the validator rejects
+            self._tokens.record_malformed()
+            raise
+        self._record(started, result)
+        return plan
 
-        valid_plan = validate_plan_payload(plan_json)
+    def _require_async_http(self) -> httpx.AsyncClient:
+        if self._async_http is None:
+            raise RuntimeError("OllamaClient was created without an async http client")
+        return self._async_http
 
-        return valid_plan
+    async def _agenerate_blocking(self, base_url: str, payload: dict[str, Any]) -> GenerationResult:
+        r = await self._require_async_http().post(
+            f"{base_url}/api/generate", json=payload, timeout=600
+        )
+        r.raise_for_status()
+        return self._blocking_result(r.json())
+
+    async def _agenerate(self, base_url: str, payload: dict[str, Any]) -> GenerationResult:
+        http = self._require_async_http()
+        url = f"{base_url}/api/generate"
+
+        if not settings.llm_streaming_enabled:
+            return await self._agenerate_blocking(base_url, payload)
+
+        stream = _PlanStream(self._max_invalid_lines)
+        async with http.stream("POST", url, json={**payload, "stream": True}) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if stream.on_line(line):
+                    break
+
+        return stream.result()
+
+    async def agenerate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        self._require_async_http()
+        outcome = _speculation.get()
+        if outcome is not None:
+            return await self._aspeculate(nl_text, outcome)
+        payload = self._payload(nl_text)
+        started = time.perf_counter()
+        try:
+            result: GenerationResult = await self._acall(
+                lambda base_url: self._agenerate(base_url, payload)
+            )
+            self._capture(result)
+            plan = _parse_plan(result.text)
+        except ValueError:
+            # invalid JSON, no JSON object at all, or a plan the validator rejects
+            self._tokens.record_malformed()
+            raise
+        self._record(started, result)
+        return plan
+
+    async def _arace(
+        self, nl_text: str, outcome: SpeculationOutcome
+    ) -> tuple[GenerationResult, dict[str, Any]]:
+        """
+        Starts every candidate at once and returns the first plan that validates.
+        Cancelling the others closes their streams, which stops them on the Ollama side.
+        If all of them fail, candidate 0's error is raised, as a single generation would.
+        """
+        baseline_ms = self._latency.warm_p50_ms()
+        started = time.perf_counter()
+
+        async def candidate(payload: dict[str, Any]) -> tuple[GenerationResult, dict[str, Any]]:
+            result: GenerationResult = await self._acall(
+                lambda base_url: self._agenerate(base_url, payload)
+            )
+            self._capture(result)
+            try:
+                return result, _parse_plan(result.text)
+            except ValueError:
+                self._tokens.record_malformed()
+                raise
+
+        tasks = [
+            asyncio.create_task(candidate(payload))
+            for payload in self._candidate_payloads(nl_text, outcome.candidates)
+        ]
+        pending = set(tasks)
+        errors: dict[int, BaseException] = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.index):
+                    error = task.exception()
+                    if error is not None:
+                        errors[tasks.index(task)] = error
+                        continue
+                    outcome.winner = tasks.index(task)
+                    outcome.winner_ms = (time.perf_counter() - started) * 1000
+                    if baseline_ms is not None:
+                        outcome.saved_ms = max(0.0, baseline_ms - outcome.winner_ms)
+                    logger.info(
+                        f"Ollama: candidate {outcome.winner}/{outcome.candidates} won"
+                        f" in {outcome.winner_ms:.0f} ms, {len(errors)} failed before it"
+                    )
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        raise errors[min(errors)]
+
+    async def _aspeculate(self, nl_text: str, outcome: SpeculationOutcome) -> dict[str, Any]:
+        started = time.perf_counter()
+        result, plan = await self._arace(nl_text, outcome)
+        self._record(started, result)
+        return plan
+
+    def _speculate_blocking(self, nl_text: str, outcome: SpeculationOutcome) -> dict[str, Any]:
+        """The sync worker races candidates on a short-lived event loop and http client."""
+
+        async def run() -> dict[str, Any]:
+            async with build_async_http_client() as http:
+                return await self._with_async_http(http)._aspeculate(nl_text, outcome)
+
+        return asyncio.run(run())
+
+    def _repair_payload(self, nl_text: str, invalid: list[InvalidLine]) -> dict[str, Any]:
+        return get_llm_repair_payload(
+            nl_text, invalid, self._model, settings.num_ctx, keep_alive=settings.ollama_keep_alive
+        )
+
+    def _repaired(self, result: GenerationResult, expected: int) -> list[str]:
+        self._capture(replace(result, repair=True))
+        return _parse_repair(result.text, expected)
+
+    def repair_lines(self, nl_text: str, invalid: list[InvalidLine]) -> list[str]:
+        """One short blocking call that returns a replacement for each invalid line, in order."""
+        payload = self._repair_payload(nl_text, invalid)
+        result: GenerationResult = self._call(
+            lambda base_url: self._generate_blocking(base_url, payload)
+        )
+        return self._repaired(result, len(invalid))
+
+    async def arepair_lines(self, nl_text: str, invalid: list[InvalidLine]) -> list[str]:
+        payload = self._repair_payload(nl_text, invalid)
+        result: GenerationResult = await self._acall(
+            lambda base_url: self._agenerate_blocking(base_url, payload)
+        )
+        return self._repaired(result, len(invalid))
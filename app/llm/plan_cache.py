@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+import redis
+from loguru import logger
+
+from app.llm.llm_output_validator import PlanValidationError, validate_plan_payload
+from app.llm.ollama_client import KeyedLLMClient
+from app.llm.utils import PROMPT_VERSION
+
+
+def normalize_nl_text(nl_text: str) -> str:
+    """NFC + collapsed whitespace; case is kept because values and selectors are case-sensitive."""
+    return " ".join(unicodedata.normalize("NFC", nl_text).split())
+
+
+def plan_cache_key(nl_text: str, *, model: str, options: dict[str, Any]) -> str:
+    material = json.dumps(
+        {
+            "nl_text": normalize_nl_text(nl_text),
+            "model": model,
+            "prompt_version": PROMPT_VERSION,
+            "options": options,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    In-process LRU in front of an optional Redis store with TTL.
+    Redis is shared by all LLM workers; the LRU saves the round trip for hot keys.
+    Cache errors are logged and treated as misses; entries that are not a JSON
+    object are deleted.
+    """
+
+    def __init__(
+        self,
+        r: redis.Redis | None,
+        *,
+        ttl_s: int,
+        lru_size: int,
+        key_prefix: str = "plan_cache",
+    ) -> None:
+        self._r = r
+        self._ttl_s = ttl_s
+        self._lru_size = lru_size
+        self._key_prefix = key_prefix
+
+        self._lru: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self._key_prefix}:{key}"
+
+    def _remember(self, key: str, plan: dict[str, Any]) -> None:
+        if self._lru_size <= 0:
+            return
+        with self._lock:
+            self._lru[key] = plan
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            plan = self._lru.get(key)
+            if plan is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return plan
+
+        raw: Any = None
+        if self._r is not None:
+            try:
+                raw = self._r.get(self._redis_key(key))
+            except redis.RedisError as e:
+                logger.warning(f"Plan cache: redis get failed: {e}")
+
+        plan = None
+        if raw is not None:
+            try:
+                plan = json.loads(raw)
+            except ValueError as e:
+                logger.warning(f"Plan cache: dropping unreadable entry key={key[:12]}: {e}")
+                self.delete(key)
+            else:
+                if not isinstance(plan, dict):
+                    logger.warning(f"Plan cache: dropping non-object entry key={key[:12]}")
+                    self.delete(key)
+                    plan = None
+
+        if plan is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self._remember(key, plan)
+        with self._lock:
+            self.hits += 1
+        return plan
+
+    def set(self, key: str, plan: dict[str, Any]) -> None:
+        self._remember(key, plan)
+        if self._r is not None:
+            try:
+                self._r.set(self._redis_key(key), json.dumps(plan), ex=self._ttl_s)
+            except redis.RedisError as e:
+                logger.warning(f"Plan cache: redis set failed: {e}")
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._lru.pop(key, None)
+        if self._r is not None:
+            try:
+                self._r.delete(self._redis_key(key))
+            except redis.RedisError as e:
+                logger.warning(f"Plan cache: redis delete failed: {e}")
+
+
+class CachingLLMClient:
+    """LLM client that answers from PlanCache and only calls the model on a miss."""
+
+    def __init__(self, client: KeyedLLMClient, cache: PlanCache) -> None:
+        self._client = client
+        self._cache = cache
+
+    @property
+    def model(self) -> str:
+        return self._client.model
+
+    def generation_options(self) -> dict[str, Any]:
+        return self._client.generation_options()
+
+    def _lookup(self, nl_text: str) -> tuple[str, dict[str, Any] | None]:
+        key = plan_cache_key(
+            nl_text, model=self._client.model, options=self._client.generation_options()
+        )
+        cached = self._cache.get(key)
+        if cached is None:
+            return key, None
+        try:
+            plan = validate_plan_payload(cached)
+            logger.info(f"Plan cache: hit key={key[:12]}")
+            return key, plan
+        except PlanValidationError as e:
+            # validator rules changed since the entry was stored
+            logger.warning(f"Plan cache: dropping stale entry key={key[:12]}: {e}")
+            self._cache.delete(key)
+            return key, None
+
+    def generate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        key, plan = self._lookup(nl_text)
+        if plan is not None:
+            return plan
+
+        plan = self._client.generate_plan_json(nl_text)
+        self._cache.set(key, plan)
+        return plan
+
+    async def agenerate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        key, plan = await asyncio.to_thread(self._lookup, nl_text)
+        if plan is not None:
+            return plan
+
+        plan = await self._client.agenerate_plan_json(nl_text)
+        await asyncio.to_thread(self._cache.set, key, plan)
+        return plan
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import redis
+from loguru import logger
+from sqlalchemy import RowMapping
+
+from app.llm.dto import PlanMatch
+from app.llm.llm_output_validator import PlanValidationError, validate_plan_payload
+from app.llm.ollama_client import Embedder, KeyedLLMClient
+from app.llm.plan_cache import normalize_nl_text
+
+
+def text_key(nl_text: str) -> str:
+    return hashlib.sha256(normalize_nl_text(nl_text).encode("utf-8")).hexdigest()
+
+
+def _unit(vector: Iterable[float]) -> np.ndarray | None:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else None
+
+
+class PlanEmbeddingIndex:
+    """
+    Unit-normalized embeddings in one contiguous float32 matrix, so a query is a
+    single matrix-vector product (cosine similarity) plus argmax. Capacity doubles
+    as plans are added; rows for an already indexed text are overwritten in place.
+    """
+
+    def __init__(self, initial_capacity: int = 1024) -> None:
+        self._capacity = initial_capacity
+        self._matrix: np.ndarray | None = None
+        self._size = 0
+        self._rows: dict[str, int] = {}
+        self._entries: list[tuple[str, str, dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: str, vector: Iterable[float], nl_text: str, plan: dict[str, Any]) -> None:
+        v = _unit(vector)
+        if v is None:
+            return
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self._capacity, v.shape[0]), dtype=np.float32)
+            if v.shape[0] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"embedding dimension {v.shape[0]} != index dimension {self._matrix.shape[1]}"
+                )
+
+            row = self._rows.get(key)
+            if row is None:
+                if self._size == self._matrix.shape[0]:
+                    grown = np.zeros((self._matrix.shape[0] * 2, v.shape[0]), dtype=np.float32)
+                    grown[: self._size] = self._matrix[: self._size]
+                    self._matrix = grown
+                row = self._size
+                self._size += 1
+                self._rows[key] = row
+                self._entries.append((key, nl_text, plan))
+            else:
+                self._entries[row] = (key, nl_text, plan)
+            self._matrix[row] = v
+
+    def search(self, vector: Iterable[float]) -> PlanMatch | None:
+        q = _unit(vector)
+        if q is None:
+            return None
+        with self._lock:
+            if self._matrix is None or not self._size or q.shape[0] != self._matrix.shape[1]:
+                return None
+            scores = self._matrix[: self._size] @ q
+            best = int(np.argmax(scores))
+            key, nl_text, plan = self._entries[best]
+            return PlanMatch(score=float(scores[best]), key=key, nl_text=nl_text, plan=plan)
+
+
+class EmbeddingStore:
+    """Embeddings per text key in one Redis hash per embedding model, as raw float32 bytes."""
+
+    def __init__(self, r: redis.Redis, *, model: str) -> None:
+        self._r = r
+        self._hash = f"plan_embeddings:{model}"
+
+    def get_many(self, keys: list[str]) -> list[np.ndarray | None]:
+        if not keys:
+            return []
+        raw: Any = self._r.hmget(self._hash, keys)
+        return [np.frombuffer(b, dtype=np.float32) if b else None for b in raw]
+
+    def set(self, key: str, vector: Iterable[float]) -> None:
+        self._r.hset(self._hash, key, np.asarray(vector, dtype=np.float32).tobytes())
+
+
+def build_plan_index(
+    rows: list[RowMapping],
+    *,
+    embedder: Embedder,
+    store: EmbeddingStore | None,
+    backfill_limit: int,
+) -> PlanEmbeddingIndex:
+    """
+    Indexes past successful plans. Embeddings come from the store; at most
+    backfill_limit missing ones are computed now, the rest are skipped until
+    those texts are generated again.
+    """
+    index = PlanEmbeddingIndex(initial_capacity=max(1024, len(rows)))
+    keys = [text_key(row["nl_text"]) for row in rows]
+    stored = store.get_many(keys) if store else [None] * len(rows)
+
+    backfilled = 0
+    for row, key, vector in zip(rows, keys, stored, strict=True):
+        if vector is None:
+            if backfilled >= backfill_limit:
+                continue
+            try:
+                vector = np.asarray(embedder.embed(normalize_nl_text(row["nl_text"])))
+            except Exception as e:
+                logger.warning(f"Plan index: embedding failed for proposal id={row['id']}: {e}")
+                continue
+            backfilled += 1
+            if store:
+                store.set(key, vector)
+        index.add(key, vector, row["nl_text"], row["result_payload"])
+
+    logger.info(f"Plan index: {len(index)} plans indexed, {backfilled} embeddings backfilled")
+    return index
+
+
+class SemanticReuseLLMClient:
+    """
+    Offers the plan of the most similar past revision text when the cosine
+    similarity is at least `threshold`; the plan is re-validated before reuse.
+    Otherwise generates, and indexes the new plan.
+    """
+
+    def __init__(
+        self,
+        client: KeyedLLMClient,
+        *,
+        embedder: Embedder,
+        index: PlanEmbeddingIndex,
+        threshold: float,
+        store: EmbeddingStore | None = None,
+    ) -> None:
+        self._client = client
+        self._embedder = embedder
+        self._index = index
+        self._threshold = threshold
+        self._store = store
+
+    @property
+    def model(self) -> str:
+        return self._client.model
+
+    def generation_options(self) -> dict[str, Any]:
+        return self._client.generation_options()
+
+    def _lookup(self, nl_text: str) -> tuple[list[float] | None, dict[str, Any] | None]:
+        try:
+            vector = self._embedder.embed(normalize_nl_text(nl_text))
+        except Exception as e:
+            logger.warning(f"Plan index: embedding failed, generating: {e}")
+            return None, None
+
+        match = self._index.search(vector)
+        if match and match.score >= self._threshold:
+            try:
+                plan = validate_plan_payload(match.plan)
+                logger.info(
+                    f"Plan index: reusing plan score={match.score:.3f} "
+                    f"for text similar to {match.nl_text[:80]!r}"
+                )
+                return vector, plan
+            except PlanValidationError as e:
+                logger.warning(f"Plan index: candidate rejected score={match.score:.3f}: {e}")
+        return vector, None
+
+    def _remember(self, nl_text: str, vector: list[float] | None, plan: dict[str, Any]) -> None:
+        if vector is None:
+            return
+        key = text_key(nl_text)
+        self._index.add(key, vector, nl_text, plan)
+        if self._store:
+            try:
+                self._store.set(key, vector)
+            except redis.RedisError as e:
+                logger.warning(f"Plan index: storing embedding failed: {e}")
+
+    def generate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        vector, plan = self._lookup(nl_text)
+        if plan is not None:
+            return plan
+
+        plan = self._client.generate_plan_json(nl_text)
+        self._remember(nl_text, vector, plan)
+        return plan
+
+    async def agenerate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        vector, plan = await asyncio.to_thread(self._lookup, nl_text)
+        if plan is not None:
+            return plan
+
+        plan = await self._client.agenerate_plan_json(nl_text)
+        await asyncio.to_thread(self._remember, nl_text, vector, plan)
+        return plan
@@ -0,0 +1,109 @@
+from collections.abc import Iterator
+from typing import Any
+
+from loguru import logger
+
+from app.llm.dto import InvalidLine
+from app.llm.llm_output_validator import (
+    PlanLineError,
+    PlanValidationError,
+    validate_plan_payload,
+)
+from app.llm.ollama_client import RepairableLLMClient
+
+
+def splice_lines(
+    plan: dict[str, list[str]], invalid: list[InvalidLine], replacements: list[str]
+) -> dict[str, list[str]]:
+    patched = {section: list(lines) for section, lines in plan.items()}
+    for item, line in zip(invalid, replacements, strict=True):
+        patched[item.section][item.index] = line.strip()
+    return patched
+
+
+class _RepairAttempts:
+    """
+    Attempt bookkeeping shared by the sync and async repair loops. Iterating yields
+    the error to repair next; every new PlanLineError is checked against max_lines
+    again, so a repair that turns up more bad lines stops the loop.
+    """
+
+    def __init__(self, error: PlanLineError, *, max_attempts: int, max_lines: int) -> None:
+        self.error = error
+        self.attempt = 0
+        self._max_attempts = max_attempts
+        self._max_lines = max_lines
+
+    def __iter__(self) -> Iterator[PlanLineError]:
+        while self.attempt < self._max_attempts and len(self.error.invalid) <= self._max_lines:
+            self.attempt += 1
+            logger.warning(f"LLM repair: attempt {self.attempt} for {self.error}")
+            yield self.error
+
+    def failed(self, e: PlanValidationError) -> None:
+        if isinstance(e, PlanLineError):
+            self.error = e
+        else:
+            # malformed repair output or a spliced plan failing another check
+            logger.warning(f"LLM repair: attempt {self.attempt} failed: {e}")
+
+
+class RepairingLLMClient:
+    """
+    LLM client that answers a plan with a few unsupported lines by asking the model
+    to rewrite only those lines, instead of failing the proposal. Bounded by
+    max_attempts repair calls; more than max_lines bad lines are not worth
+    repairing and the error is raised as is.
+    """
+
+    def __init__(
+        self, client: RepairableLLMClient, *, max_attempts: int = 2, max_lines: int = 3
+    ) -> None:
+        self._client = client
+        self._max_attempts = max_attempts
+        self._max_lines = max_lines
+
+    @property
+    def model(self) -> str:
+        return self._client.model
+
+    def generation_options(self) -> dict[str, Any]:
+        return self._client.generation_options()
+
+    def _attempts(self, error: PlanLineError) -> _RepairAttempts:
+        return _RepairAttempts(error, max_attempts=self._max_attempts, max_lines=self._max_lines)
+
+    def _splice(
+        self, error: PlanLineError, replacements: list[str], attempt: int
+    ) -> dict[str, Any]:
+        plan = validate_plan_payload(splice_lines(error.plan, error.invalid, replacements))
+        logger.info(f"LLM repair: fixed {len(error.invalid)} line(s) in {attempt} attempt(s)")
+        return plan
+
+    def generate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        try:
+            return self._client.generate_plan_json(nl_text)
+        except PlanLineError as e:
+            attempts = self._attempts(e)
+
+        for error in attempts:
+            try:
+                replacements = self._client.repair_lines(nl_text, error.invalid)
+                return self._splice(error, replacements, attempts.attempt)
+            except PlanValidationError as e:
+                attempts.failed(e)
+        raise attempts.error
+
+    async def agenerate_plan_json(self, nl_text: str) -> dict[str, Any]:
+        try:
+            return await self._client.agenerate_plan_json(nl_text)
+        except PlanLineError as e:
+            attempts = self._attempts(e)
+
+        for error in attempts:
+            try:
+                replacements = await self._client.arepair_lines(nl_text, error.invalid)
+                return self._splice(error, replacements, attempts.attempt)
+            except PlanValidationError as e:
+                attempts.failed(e)
+        raise attempts.error
@@ -0,0 +1,129 @@
+import json
+
+from app.llm.llm_output_validator import (
+    MAX_ASSERTIONS,
+    MAX_LINE_LEN,
+    MAX_STEPS,
+    PlanValidationError,
+    is_allowed_assertion,
+    is_allowed_step,
+)
+
+_ALLOWED_KEYS = {"steps", "assertions"}
+
+# longest JSON escape (\uXXXX) per decoded character
+_MAX_ESCAPED_CHAR_LEN = 6
+
+
+class IncrementalPlanParser:
+    """
+    Follows the plan JSON character by character as tokens arrive and raises
+    PlanValidationError as soon as the output can no longer become a valid plan:
+    an unknown key, a completed step/assertion that matches no allowed pattern,
+    too many lines, a line longer than max_line_len, or text outside the object.
+    The limits default to validate_plan_payload's, which still checks the final payload.
+    Up to max_invalid_lines unsupported lines are let through when the caller can
+    repair them afterwards.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_steps: int = MAX_STEPS,
+        max_assertions: int = MAX_ASSERTIONS,
+        max_line_len: int = MAX_LINE_LEN,
+        max_invalid_lines: int = 0,
+    ) -> None:
+        self._limits = {"steps": max_steps, "assertions": max_assertions}
+        self._max_line_len = max_line_len
+        self._max_invalid_lines = max_invalid_lines
+        self.invalid_lines = 0
+
+        self._text: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf: list[str] = []
+        self._expect_key = False
+        self._key: str | None = None
+        self._counts = {"steps": 0, "assertions": 0}
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+    def feed(self, chunk: str) -> None:
+        for ch in chunk:
+            if self.done:
+                if not ch.isspace():
+                    raise PlanValidationError("unexpected output after the plan object")
+                continue
+            self._text.append(ch)
+            self._feed_char(ch)
+
+    def _feed_char(self, ch: str) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                value = json.loads('"' + "".join(self._buf) + '"')
+                self._buf.clear()
+                if len(value) > self._max_line_len:
+                    raise PlanValidationError(f"line longer than {self._max_line_len} characters")
+                self._on_string(value)
+                return
+            self._buf.append(ch)
+            # the line is still open: abort once even fully escaped text is too long
+            if len(self._buf) > self._max_line_len * _MAX_ESCAPED_CHAR_LEN:
+                raise PlanValidationError(f"line longer than {self._max_line_len} characters")
+            return
+
+        if ch.isspace():
+            return
+        if self._depth == 0 and ch != "{":
+            raise PlanValidationError(f"unexpected {ch!r} before the plan object")
+
+        if ch == '"':
+            if self._depth == 1 and not self._expect_key:
+                raise PlanValidationError(f"{self._key} must be list[str]")
+            self._in_string = True
+        elif ch in "{[":
+            if self._depth == 0:
+                self._expect_key = True
+            elif self._depth > 1 or ch == "{" or self._expect_key:
+                raise PlanValidationError(f"{self._key} must be list[str]")
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self.done = True
+        elif ch == "," and self._depth == 1:
+            self._expect_key = True
+        elif ch not in ":,":
+            raise PlanValidationError(f"unexpected {ch!r} in the plan")
+
+    def _on_string(self, value: str) -> None:
+        if self._depth == 1:
+            if value not in _ALLOWED_KEYS:
+                raise PlanValidationError(f"unexpected keys in plan_payload: {[value]}")
+            self._key = value
+            self._expect_key = False
+            return
+
+        assert self._key is not None
+        self._counts[self._key] += 1
+        n = self._counts[self._key]
+        if n > self._limits[self._key]:
+            raise PlanValidationError(f"too many {self._key}: > {self._limits[self._key]}")
+
+        allowed = is_allowed_step if self._key == "steps" else is_allowed_assertion
+        if allowed(value):
+            return
+        self.invalid_lines += 1
+        if self.invalid_lines > self._max_invalid_lines:
+            kind = "step" if self._key == "steps" else "assertion"
+            raise PlanValidationError(f"unsupported {kind} #{n}: {value}")
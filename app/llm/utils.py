@@ -1,74 +1,125 @@
 from typing import Any
 
+from app.llm.dto import InvalidLine
+
+# bump whenever SYSTEM_PROMPT, get_promt() or the request options change: it is part of the plan cache key
+PROMPT_VERSION = 2
+
+# structured output: Ollama constrains decoding to this shape instead of just "some JSON"
+PLAN_JSON_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "steps": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+        "assertions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["steps", "assertions"],
+    "additionalProperties": False,
+}
+
+# Byte-identical across requests, and sent as `system` ahead of the per-revision prompt,
+# so the server can reuse the KV cache for it and only evaluate the NL_TEST_CASE tokens.
+SYSTEM_PROMPT = (
+    "You are a Playwright test generator.\n"
+    "Target language: Python Playwright (async).\n"
+    "Return ONLY a single JSON object. No markdown. No explanations. No extra text.\n\n"
+    "JSON schema (MUST match exactly; no extra keys):\n"
+    "{"
+    '"steps": ["..."],'
+    '"assertions": ["..."]'
+    "}\n\n"
+    "STRICT OUTPUT RULES:\n"
+    "- Output MUST be valid JSON and MUST start with '{' and end with '}'.\n"
+    "- Use double quotes for JSON keys/strings. (JSON standard)\n"
+    "- The values inside steps/assertions are Playwright statements and MUST use single quotes ' for their string literals.\n"
+    "- Do NOT include comments, trailing commas, markdown fences, or any other keys.\n\n"
+    "PLAYWRIGHT STATEMENT RULES:\n"
+    "- EVERY statement MUST start with 'await '.\n"
+    "- Use ONLY the commands listed below. No variations.\n"
+    "- Do NOT output any Python code outside these statements.\n\n"
+    "SELECTOR POLICY (IMPORTANT):\n"
+    "- If a selector is explicitly provided in NL_TEST_CASE, use it as-is.\n"
+    '- If a selector is clearly implied as an id/name/data-testid (e.g. "id=login" or "data-testid=submit"), '
+    "use CSS selectors: '#id', '[name=\"...\"]', or '[data-testid=\"...\"]'.\n"
+    "- Otherwise, DO NOT invent selectors. Use a placeholder selector in the form '<selector:meaningful_name>'.\n"
+    "  Example: await page.click('<selector:submit_button>')\n"
+    "- For placeholder values (credentials/secrets), use '<login>', '<password>', '<email>', etc.\n\n"
+    "BASE_URL RULES:\n"
+    "- page.goto() and URL assertions MUST use ONLY relative paths like '/login' or '/dashboard'.\n"
+    "- Never output 'http://' or 'https://'.\n"
+    "- waitForURL / toHaveURL may use either a relative path string or a regex.\n"
+    "- Regex URLs MUST be written as /pattern/ (single leading/trailing slash). Never use //pattern//.\n\n"
+    "ALLOWED STEPS (ONLY these):\n"
+    "- await page.goto('<url>')\n"
+    "- await page.fill('<selector>', '<value>')\n"
+    "- await page.click('<selector>')\n"
+    "- await page.waitForSelector('<selector>')\n"
+    "- await page.waitForURL('<url>')\n"
+    "- await page.waitForURL(/<regex>/)\n\n"
+    "ALLOWED ASSERTIONS (ONLY these):\n"
+    "- await expect(page).toHaveURL('<url>')\n"
+    "- await expect(page).toHaveURL(/<regex>/)\n"
+    "- await expect(page.locator('<selector>')).toBeVisible()\n"
+    "- await expect(page.locator('<selector>')).toContainText('<text>')\n\n"
+    "FORBIDDEN:\n"
+    "- page.url()\n"
+    "- isVisible(), isHidden(), isEnabled(), boolean checks\n"
+    "- waitForTimeout(), sleep(), timeouts\n"
+    "- evaluate(), eval(), $$eval()\n"
+    "- locator().click(), locator().fill()\n"
+    "- Any JavaScript code or Python code outside the allowed commands\n\n"
+    "PLAN REQUIREMENTS:\n"
+    "- steps MUST contain at least one 'await page.goto(...)'.\n"
+    "- assertions MUST validate the final state of the page (final URL and/or visible content).\n"
+    "- Prefer deterministic waits: waitForSelector / waitForURL.\n"
+    "- Keep steps minimal (avoid redundant waits/clicks).\n"
+)
+
 
 def get_promt(nl_text: str) -> str:
+    return f"NL_TEST_CASE:\n{nl_text}\n"
+
+
+def get_repair_promt(nl_text: str, invalid: list[InvalidLine]) -> str:
+    listed = "\n".join(f"{n}. {item.describe()}" for n, item in enumerate(invalid, 1))
     return (
-        "You are a Playwright test generator.\n"
-        "Target language: Python Playwright (async).\n"
-        "Return ONLY a single JSON object. No markdown. No explanations. No extra text.\n\n"
-        "JSON schema (MUST match exactly; no extra keys):\n"
-        "{"
-        '"steps": ["..."],'
-        '"assertions": ["..."]'
-        "}\n\n"
-        "STRICT OUTPUT RULES:\n"
-        "- Output MUST be valid JSON and MUST start with '{' and end with '}'.\n"
-        "- Use double quotes for JSON keys/strings. (JSON standard)\n"
-        "- The values inside steps/assertions are Playwright statements and MUST use single quotes ' for their string literals.\n"
-        "- Do NOT include comments, trailing commas, markdown fences, or any other keys.\n\n"
-        "PLAYWRIGHT STATEMENT RULES:\n"
-        "- EVERY statement MUST start with 'await '.\n"
-        "- Use ONLY the commands listed below. No variations.\n"
-        "- Do NOT output any Python code outside these statements.\n\n"
-        "SELECTOR POLICY (IMPORTANT):\n"
-        "- If a selector is explicitly provided in NL_TEST_CASE, use it as-is.\n"
-        '- If a selector is clearly implied as an id/name/data-testid (e.g. "id=login" or "data-testid=submit"), '
-        "use CSS selectors: '#id', '[name=\"...\"]', or '[data-testid=\"...\"]'.\n"
-        "- Otherwise, DO NOT invent selectors. Use a placeholder selector in the form '<selector:meaningful_name>'.\n"
-        "  Example: await page.click('<selector:submit_button>')\n"
-        "- For placeholder values (credentials/secrets), use '<login>', '<password>', '<email>', etc.\n\n"
-        "BASE_URL RULES:\n"
-        "- page.goto() and URL assertions MUST use ONLY relative paths like '/login' or '/dashboard'.\n"
-        "- Never output 'http://' or 'https://'.\n"
-        "- waitForURL / toHaveURL may use either a relative path string or a regex.\n"
-        "- Regex URLs MUST be written as /pattern/ (single leading/trailing slash). Never use //pattern//.\n\n"
-        "ALLOWED STEPS (ONLY these):\n"
-        "- await page.goto('<url>')\n"
-        "- await page.fill('<selector>', '<value>')\n"
-        "- await page.click('<selector>')\n"
-        "- await page.waitForSelector('<selector>')\n"
-        "- await page.waitForURL('<url>')\n"
-        "- await page.waitForURL(/<regex>/)\n\n"
-        "ALLOWED ASSERTIONS (ONLY these):\n"
-        "- await expect(page).toHaveURL('<url>')\n"
-        "- await expect(page).toHaveURL(/<regex>/)\n"
-        "- await expect(page.locator('<selector>')).toBeVisible()\n"
-        "- await expect(page.locator('<selector>')).toContainText('<text>')\n\n"
-        "FORBIDDEN:\n"
-        "- page.url()\n"
-        "- isVisible(), isHidden(), isEnabled(), boolean checks\n"
-        "- waitForTimeout(), sleep(), timeouts\n"
-        "- evaluate(), eval(), $$eval()\n"
-        "- locator().click(), locator().fill()\n"
-        "- Any JavaScript code or Python code outside the allowed commands\n\n"
-        "PLAN REQUIREMENTS:\n"
-        "- steps MUST contain at least one 'await page.goto(...)'.\n"
-        "- assertions MUST validate the final state of the page (final URL and/or visible content).\n"
-        "- Prefer deterministic waits: waitForSelector / waitForURL.\n"
-        "- Keep steps minimal (avoid redundant waits/clicks).\n\n"
-        "NL_TEST_CASE:\n"
-        f"{nl_text}\n"
+        f"NL_TEST_CASE:\n{nl_text}\n\n"
+        "These lines of the plan you generated use commands that are not allowed:\n"
+        f"{listed}\n\n"
+        "Rewrite each of them as ONE allowed statement doing the same thing. "
+        f'Return {{"lines": [...]}} with exactly {len(invalid)} replacement(s), in the order listed.\n'
     )
 
 
+def repair_json_schema(n_lines: int) -> dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            "lines": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": n_lines,
+                "maxItems": n_lines,
+            }
+        },
+        "required": ["lines"],
+        "additionalProperties": False,
+    }
+
+
+def _keep_alive_value(keep_alive: str) -> str | int:
+    # Ollama parses strings as Go durations ("30m"); bare numbers must be sent as seconds
+    return int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+
+
 def get_llm_request_payload(
-    nl_text: str, model: str, num_predict: int, num_ctx: int
+    nl_text: str, model: str, num_predict: int, num_ctx: int, keep_alive: str | None = None
 ) -> dict[str, Any]:
-    return {
+    payload: dict[str, Any] = {
         "model": model,
+        "system": SYSTEM_PROMPT,
         "prompt": get_promt(nl_text),
         "stream": False,
-        "format": "json",
+        "format": PLAN_JSON_SCHEMA,
         "options": {
             "num_ctx": num_ctx,
             "num_predict": num_predict,
@@ -79,3 +130,31 @@ def get_llm_request_payload(
             "stop": ["\n\n\n", "```"],
         },
     }
+    # not part of PROMPT_VERSION: keep_alive only decides how long Ollama keeps the model loaded
+    if keep_alive is not None:
+        payload["keep_alive"] = _keep_alive_value(keep_alive)
+    return payload
+
+
+def get_warmup_payload(model: str, keep_alive: str | None = None) -> dict[str, Any]:
+    """An empty prompt makes Ollama load the model without generating anything."""
+    payload: dict[str, Any] = {"model": model, "prompt": "", "stream": False}
+    if keep_alive is not None:
+        payload["keep_alive"] = _keep_alive_value(keep_alive)
+    return payload
+
+
+def get_llm_repair_payload(
+    nl_text: str,
+    invalid: list[InvalidLine],
+    model: str,
+    num_ctx: int,
+    keep_alive: str | None = None,
+) -> dict[str, Any]:
+    """Same system prompt as the plan request, so the repair call reuses its KV cache."""
+    payload = get_llm_request_payload(nl_text, model, 0, num_ctx, keep_alive=keep_alive)
+    payload["prompt"] = get_repair_promt(nl_text, invalid)
+    payload["format"] = repair_json_schema(len(invalid))
+    # a replacement line is well under 100 tokens
+    payload["options"]["num_predict"] = 32 + 100 * len(invalid)
+    return payload
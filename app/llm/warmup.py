@@ -0,0 +1,90 @@
+import threading
+from collections.abc import Callable
+from datetime import UTC, datetime
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+def in_business_hours(
+    now: datetime, *, start_hour: int, end_hour: int, weekdays_only: bool
+) -> bool:
+    """[start_hour, end_hour) in now's timezone; end_hour < start_hour wraps past midnight."""
+    if weekdays_only and now.weekday() >= 5:
+        return False
+    if start_hour <= end_hour:
+        return start_hour <= now.hour < end_hour
+    return now.hour >= start_hour or now.hour < end_hour
+
+
+class ModelKeepWarm:
+    """
+    Re-sends the warm-up request every interval_s during business hours, so the
+    model is still loaded when the first proposal of the morning (or after lunch)
+    arrives. Outside those hours Ollama is allowed to unload it after keep_alive.
+    """
+
+    def __init__(
+        self,
+        warm_up: Callable[[], object],
+        *,
+        interval_s: float,
+        start_hour: int,
+        end_hour: int,
+        weekdays_only: bool,
+        tz: str = "UTC",
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ) -> None:
+        self._warm_up = warm_up
+        self._interval_s = interval_s
+        self._start_hour = start_hour
+        self._end_hour = end_hour
+        self._weekdays_only = weekdays_only
+        self._tz = ZoneInfo(tz)
+        self._clock = clock
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @classmethod
+    def from_settings(cls, warm_up: Callable[[], object]) -> "ModelKeepWarm":
+        return cls(
+            warm_up,
+            interval_s=settings.llm_keep_warm_interval_s,
+            start_hour=settings.llm_keep_warm_start_hour,
+            end_hour=settings.llm_keep_warm_end_hour,
+            weekdays_only=settings.llm_keep_warm_weekdays_only,
+            tz=settings.llm_keep_warm_timezone,
+        )
+
+    def is_active(self) -> bool:
+        return in_business_hours(
+            self._clock().astimezone(self._tz),
+            start_hour=self._start_hour,
+            end_hour=self._end_hour,
+            weekdays_only=self._weekdays_only,
+        )
+
+    def ping_once(self) -> bool:
+        if not self.is_active():
+            return False
+        self._warm_up()
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.ping_once()
+            except Exception as e:
+                logger.error("LLM keep-warm: ping failed: {}", e)
+
+    def start(self) -> None:
+        if self._interval_s <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="llm-keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
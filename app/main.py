@@ -1,11 +1,21 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import redis
 from fastapi import FastAPI
 from fastapi.requests import Request
 from loguru import logger
 from pydantic import ValidationError
 from starlette.responses import JSONResponse
 
+from app.artifacts.factory import build_artifact_storage
+from app.clients.redis_client import build_redis_pool
+from app.core.config import settings
 from app.core.logging import setup_logger
+from app.queue.redis_queue import RedisPublisher
+from app.routers.llm_stats import router as LlmStatsRouter
 from app.routers.plan_proposals import router as PlanProposalsRouter
+from app.routers.queue_metrics import router as QueueMetricsRouter
 from app.routers.test_case_revisions import router as TestCasesRevisionsRouter
 from app.routers.test_cases import router as TestCasesRouter
 from app.routers.test_run_artifacts import router as TestRunArtifactsRouter
@@ -13,7 +23,23 @@ from app.routers.test_runs import router as TestRunsRouter
 
 setup_logger()
 
-app = FastAPI(title="Autotest MVP API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Process-wide clients shared by all requests; see app.dependencies."""
+    pool = build_redis_pool(settings)
+    app.state.redis_pool = pool
+    app.state.redis = redis.Redis(connection_pool=pool)
+    app.state.redis_publisher = RedisPublisher(client=app.state.redis)
+    app.state.artifact_storage = build_artifact_storage(settings)
+    try:
+        yield
+    finally:
+        logger.info("Redis pool stats on shutdown {}", pool.stats())
+        pool.disconnect()
+
+
+app = FastAPI(title="Autotest MVP API", lifespan=lifespan)
 
 logger.info("api_startup")
 
@@ -46,3 +72,5 @@ app.include_router(TestCasesRevisionsRouter)
 app.include_router(PlanProposalsRouter)
 app.include_router(TestRunsRouter)
 app.include_router(TestRunArtifactsRouter)
+app.include_router(QueueMetricsRouter)
+app.include_router(LlmStatsRouter)
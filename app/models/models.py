@@ -104,6 +104,8 @@ class PlanProposal(Base):
 
     request_payload: Mapped[dict[str, Any] | None] = mapped_column(JSONB, nullable=True)
     result_payload: Mapped[dict[str, Any] | None] = mapped_column(JSONB, nullable=True)
+    # result_payload compiled to opcodes (app.plan.compiler), placeholders left in; runs load it
+    compiled_plan: Mapped[dict[str, Any] | None] = mapped_column(JSONB, nullable=True)
 
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_by: Mapped[str | None] = mapped_column(String(200), nullable=True)
@@ -114,6 +116,24 @@ class PlanProposal(Base):
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
+    # LLM accounting, filled by the LLM worker; durations in ms, token counts as reported by Ollama
+    llm_model: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    queue_wait_ms: Mapped[int | None] = mapped_column(nullable=True)
+    generation_ms: Mapped[int | None] = mapped_column(nullable=True)
+    prompt_eval_count: Mapped[int | None] = mapped_column(nullable=True)
+    eval_count: Mapped[int | None] = mapped_column(nullable=True)
+    total_duration_ms: Mapped[int | None] = mapped_column(nullable=True)
+    load_duration_ms: Mapped[int | None] = mapped_column(nullable=True)
+    prompt_eval_duration_ms: Mapped[int | None] = mapped_column(nullable=True)
+    eval_duration_ms: Mapped[int | None] = mapped_column(nullable=True)
+    # repair calls for plans with a few unsupported lines; their tokens are also in the totals above
+    repair_attempts: Mapped[int | None] = mapped_column(nullable=True)
+    repair_tokens: Mapped[int | None] = mapped_column(nullable=True)
+    # speculative generation: candidates raced, index of the first valid one, estimated ms saved
+    speculative_candidates: Mapped[int | None] = mapped_column(nullable=True)
+    winning_candidate: Mapped[int | None] = mapped_column(nullable=True)
+    speculative_saved_ms: Mapped[int | None] = mapped_column(nullable=True)
+
     test_case_revision: Mapped["TestCaseRevision"] = relationship(back_populates="plan_proposals")
 
     test_runs: Mapped[list["TestRun"]] = relationship(
@@ -128,6 +148,7 @@ class PlanProposal(Base):
             "ix_plan_proposals_rev_status_created", "test_case_revision_id", "status", "created_at"
         ),
         Index("ix_plan_proposals_ready_created", "is_ready_for_test", "created_at"),
+        Index("ix_plan_proposals_model_finished", "llm_model", "finished_at"),
     )
 
 
@@ -170,6 +191,10 @@ class TestRun(Base):
     video_object_key: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     screenshot_object_key: Mapped[str | None] = mapped_column(String(1024), nullable=True)
 
+    # Playwright trace zip, kept for failed runs when run_params.playwright_trace is on_failure
+    trace_name: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    trace_object_key: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+
     created_by: Mapped[str | None] = mapped_column(String(200), nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
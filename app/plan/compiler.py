@@ -0,0 +1,138 @@
+import re
+from collections.abc import Iterable
+from typing import Any
+
+from app.plan.dto import ASSERT_OPS, STEP_OPS, CompiledPlan, OpCode, PlanOp
+
+# bump when the opcodes, their args or the stored layout change: older stored plans are recompiled
+COMPILED_PLAN_VERSION = 1
+
+# --- Allowed patterns (JS-like strings from LLM) ---
+RE_GOTO = re.compile(r"^await page\.goto\('(?P<url>[^']+)'\)$")
+RE_FILL = re.compile(r"^await page\.fill\('(?P<sel>[^']+)',\s*'(?P<val>.*)'\)$")
+RE_CLICK = re.compile(r"^await page\.click\('(?P<sel>[^']+)'\)$")
+RE_WAIT_SEL = re.compile(r"^await page\.waitForSelector\('(?P<sel>[^']+)'\)$")
+RE_WAIT_URL_STR = re.compile(r"^await page\.waitForURL\('(?P<url>[^']+)'\)$")
+RE_WAIT_URL_RE = re.compile(r"^await page\.waitForURL\(/(?P<pat>.+)/\)$")
+
+RE_EXPECT_URL_STR = re.compile(r"^await expect\(page\)\.toHaveURL\('(?P<url>[^']+)'\)$")
+RE_EXPECT_URL_RE = re.compile(r"^await expect\(page\)\.toHaveURL\(/(?P<pat>.+)/\)$")
+RE_EXPECT_VISIBLE = re.compile(
+    r"^await expect\(page\.locator\('(?P<sel>[^']+)'\)\)\.toBeVisible\(\)$"
+)
+RE_EXPECT_CONTAINS = re.compile(
+    r"^await expect\(page\.locator\('(?P<sel>[^']+)'\)\)\.toContainText\('(?P<text>.*)'\)$"
+)
+
+# Every pattern starts with a fixed call head, so a dict lookup on that head leaves
+# at most two patterns to try instead of all of them in turn. The head is the line up
+# to its first "(", or up to the second one for expect(...).
+_DISPATCH: dict[str, tuple[tuple[re.Pattern[str], OpCode], ...]] = {
+    "await page.goto": ((RE_GOTO, OpCode.goto),),
+    "await page.fill": ((RE_FILL, OpCode.fill),),
+    "await page.click": ((RE_CLICK, OpCode.click),),
+    "await page.waitForSelector": ((RE_WAIT_SEL, OpCode.wait_selector),),
+    "await page.waitForURL": (
+        (RE_WAIT_URL_STR, OpCode.wait_url),
+        (RE_WAIT_URL_RE, OpCode.wait_url_regex),
+    ),
+    "await expect(page).toHaveURL": (
+        (RE_EXPECT_URL_STR, OpCode.expect_url),
+        (RE_EXPECT_URL_RE, OpCode.expect_url_regex),
+    ),
+    "await expect(page.locator": (
+        (RE_EXPECT_VISIBLE, OpCode.expect_visible),
+        (RE_EXPECT_CONTAINS, OpCode.expect_text),
+    ),
+}
+_EXPECT_HEAD = "await expect"
+
+# anything a run may substitute: <login>, <selector:submit_button>, ...
+PLACEHOLDER_TOKEN_RE = re.compile(r"<[^<>'\s]+>")
+
+
+def compile_line(line: str) -> PlanOp | None:
+    """Step or assertion line -> PlanOp; None when it matches no allowed pattern."""
+    s = line.strip()
+    # the head only picks the patterns to try, they still decide; a line without "(" gets no match
+    i = s.find("(")
+    head = s[:i]
+    if head == _EXPECT_HEAD:
+        head = s[: s.find("(", i + 1)]
+    for pattern, op in _DISPATCH.get(head, ()):
+        m = pattern.match(s)
+        if m:
+            tokens = tuple(dict.fromkeys(PLACEHOLDER_TOKEN_RE.findall(s))) if "<" in s else ()
+            return PlanOp(op, m.groups(), s, tokens)
+    return None
+
+
+def compile_step(line: str) -> PlanOp | None:
+    op = compile_line(line)
+    return op if op is not None and op.op in STEP_OPS else None
+
+
+def compile_assertion(line: str) -> PlanOp | None:
+    op = compile_line(line)
+    return op if op is not None and op.op in ASSERT_OPS else None
+
+
+def compile_steps(lines: Iterable[str]) -> list[PlanOp | None]:
+    return [compile_step(line) for line in lines]
+
+
+def compile_assertions(lines: Iterable[str]) -> list[PlanOp | None]:
+    return [compile_assertion(line) for line in lines]
+
+
+class PlanCompileError(ValueError):
+    pass
+
+
+def _checked(kind: str, lines: list[str], ops: list[PlanOp | None]) -> tuple[PlanOp, ...]:
+    for i, (line, op) in enumerate(zip(lines, ops, strict=True), start=1):
+        if op is None:
+            raise PlanCompileError(f"Unsupported {kind} #{i}: {line}")
+    return tuple(op for op in ops if op is not None)
+
+
+def compile_plan(steps: list[str], assertions: list[str]) -> CompiledPlan:
+    """Every line must compile; raises PlanCompileError naming the first that does not."""
+    return CompiledPlan(
+        steps=_checked("step", steps, compile_steps(steps)),
+        assertions=_checked("assertion", assertions, compile_assertions(assertions)),
+    )
+
+
+def _dump_op(op: PlanOp) -> dict[str, Any]:
+    return {
+        "op": op.op.value,
+        "args": list(op.args),
+        "source": op.source,
+        "placeholders": list(op.placeholders),
+    }
+
+
+def _load_op(data: dict[str, Any]) -> PlanOp:
+    return PlanOp(
+        OpCode(data["op"]), tuple(data["args"]), data["source"], tuple(data["placeholders"])
+    )
+
+
+def dump_compiled_plan(plan: CompiledPlan) -> dict[str, Any]:
+    """JSON form stored on plan_proposals.compiled_plan."""
+    return {
+        "version": COMPILED_PLAN_VERSION,
+        "steps": [_dump_op(op) for op in plan.steps],
+        "assertions": [_dump_op(op) for op in plan.assertions],
+    }
+
+
+def load_compiled_plan(data: Any) -> CompiledPlan | None:
+    """None when nothing is stored or it was written by another COMPILED_PLAN_VERSION."""
+    if not isinstance(data, dict) or data.get("version") != COMPILED_PLAN_VERSION:
+        return None
+    return CompiledPlan(
+        steps=tuple(_load_op(op) for op in data["steps"]),
+        assertions=tuple(_load_op(op) for op in data["assertions"]),
+    )
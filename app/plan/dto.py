@@ -0,0 +1,56 @@
+import enum
+from dataclasses import dataclass
+from typing import NamedTuple
+
+
+class OpCode(enum.StrEnum):
+    goto = "goto"
+    fill = "fill"
+    click = "click"
+    wait_selector = "wait_selector"
+    wait_url = "wait_url"
+    wait_url_regex = "wait_url_regex"
+
+    expect_url = "expect_url"
+    expect_url_regex = "expect_url_regex"
+    expect_visible = "expect_visible"
+    expect_text = "expect_text"
+
+
+STEP_OPS = frozenset(
+    {
+        OpCode.goto,
+        OpCode.fill,
+        OpCode.click,
+        OpCode.wait_selector,
+        OpCode.wait_url,
+        OpCode.wait_url_regex,
+    }
+)
+ASSERT_OPS = frozenset(
+    {OpCode.expect_url, OpCode.expect_url_regex, OpCode.expect_visible, OpCode.expect_text}
+)
+
+
+class PlanOp(NamedTuple):
+    """
+    One compiled plan line. args by opcode: url for goto/wait_url/expect_url,
+    pattern for the *_regex ones, (selector, value) for fill, (selector, text)
+    for expect_text, selector for the rest. source is the stripped line and
+    placeholders the <...> tokens in it, so rendering only touches those ops.
+    A NamedTuple rather than a dataclass: one is built per line on every compile.
+    """
+
+    op: OpCode
+    args: tuple[str, ...]
+    source: str
+    placeholders: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledPlan:
+    steps: tuple[PlanOp, ...]
+    assertions: tuple[PlanOp, ...]
+
+    def has_goto(self) -> bool:
+        return any(op.op is OpCode.goto for op in self.steps)
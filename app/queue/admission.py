@@ -0,0 +1,126 @@
+import math
+from datetime import datetime, timedelta
+from typing import Protocol
+
+import redis
+from loguru import logger
+
+from app.core.config import settings
+from app.queue.dto import AdmissionLimits, AdmissionRejection
+from app.queue.lanes import test_run_streams
+from app.queue.metrics import QueueMetricsCollector
+from app.utils import utcnow
+
+
+class BacklogSource(Protocol):
+    def count_active(self) -> int: ...
+
+    def count_finished_since(self, since: datetime) -> int: ...
+
+
+class AdmissionController:
+    """
+    Rejects new jobs while a queue is over its limits.
+
+    A queue is over its limit when the consumer group lag (summed over its lanes) or the number of queued/running rows
+    exceeds the configured maximum. Retry-After is the time the workers need to drain the excess
+    at the rate they finished jobs during the last drain window. If nothing finished in that
+    window the workers are treated as unavailable and the answer is 503 instead of 429.
+    """
+
+    def __init__(
+        self,
+        collector: QueueMetricsCollector,
+        *,
+        enabled: bool,
+        drain_window_s: int,
+        retry_after_max_s: int,
+        test_runs: AdmissionLimits,
+        plan_proposals: AdmissionLimits,
+    ) -> None:
+        self._collector = collector
+        self._enabled = enabled
+        self._drain_window_s = drain_window_s
+        self._retry_after_max_s = retry_after_max_s
+        self._test_runs = test_runs
+        self._plan_proposals = plan_proposals
+
+    @classmethod
+    def from_settings(cls, collector: QueueMetricsCollector) -> "AdmissionController":
+        return cls(
+            collector,
+            enabled=settings.admission_enabled,
+            drain_window_s=settings.admission_drain_window_s,
+            retry_after_max_s=settings.admission_retry_after_max_s,
+            test_runs=AdmissionLimits(
+                streams=tuple(test_run_streams()),
+                group=settings.redis_test_group,
+                max_lag=settings.admission_max_test_run_lag,
+                max_active=settings.admission_max_active_test_runs,
+            ),
+            plan_proposals=AdmissionLimits(
+                streams=(settings.redis_llm_stream,),
+                group=settings.redis_llm_group,
+                max_lag=settings.admission_max_plan_lag,
+                max_active=settings.admission_max_active_plan_proposals,
+            ),
+        )
+
+    def check_test_run(self, repo: BacklogSource) -> AdmissionRejection | None:
+        return self._check("test_run", self._test_runs, repo)
+
+    def check_plan_proposal(self, repo: BacklogSource) -> AdmissionRejection | None:
+        return self._check("plan_proposal", self._plan_proposals, repo)
+
+    def _lag(self, limits: AdmissionLimits) -> int | None:
+        """Total lag over the streams; lanes without a reported lag are skipped."""
+        try:
+            lags = [self._collector.group_lag(stream, limits.group) for stream in limits.streams]
+        except redis.RedisError as e:
+            # fail open: publishing will surface a real outage
+            logger.warning(f"Admission lag probe failed for {limits.streams}: {e}")
+            return None
+        known = [lag for lag in lags if lag is not None]
+        return sum(known) if known else None
+
+    def _check(
+        self, kind: str, limits: AdmissionLimits, repo: BacklogSource
+    ) -> AdmissionRejection | None:
+        if not self._enabled:
+            return None
+
+        lag = self._lag(limits)
+        active = repo.count_active()
+
+        excess = max(
+            (lag - limits.max_lag) if lag is not None else 0,
+            active - limits.max_active,
+        )
+        if excess <= 0:
+            return None
+
+        since = utcnow() - timedelta(seconds=self._drain_window_s)
+        finished = repo.count_finished_since(since)
+
+        if finished == 0:
+            logger.warning(
+                f"Admission rejected {kind}: lag={lag} active={active}, no drain in "
+                f"{self._drain_window_s}s"
+            )
+            return AdmissionRejection(
+                status_code=503,
+                retry_after_s=min(self._drain_window_s, self._retry_after_max_s),
+                detail=f"{kind} queue is not draining, try again later",
+            )
+
+        drain_per_s = finished / self._drain_window_s
+        retry_after_s = min(max(1, math.ceil((excess + 1) / drain_per_s)), self._retry_after_max_s)
+        logger.info(
+            f"Admission rejected {kind}: lag={lag} active={active} "
+            f"drain={drain_per_s:.2f}/s retry_after={retry_after_s}s"
+        )
+        return AdmissionRejection(
+            status_code=429,
+            retry_after_s=retry_after_s,
+            detail=f"{kind} queue is full, retry in {retry_after_s}s",
+        )
@@ -0,0 +1,84 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class LaneWaitStats:
+    """queue wait = delivery time - entry id timestamp"""
+
+    messages: int = 0
+    wait_ms_total: float = 0.0
+    wait_ms_max: float = 0.0
+    wait_ms_last: float = 0.0
+
+    def record(self, wait_ms: float) -> None:
+        self.messages += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        self.wait_ms_last = wait_ms
+
+    @property
+    def wait_ms_avg(self) -> float:
+        return self.wait_ms_total / self.messages if self.messages else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "messages": self.messages,
+            "wait_ms_avg": round(self.wait_ms_avg, 1),
+            "wait_ms_max": round(self.wait_ms_max, 1),
+            "wait_ms_last": round(self.wait_ms_last, 1),
+        }
+
+
+@dataclass
+class ConsumerStats:
+    batches: int = 0
+    messages: int = 0
+    failed: int = 0
+    busy_s: float = 0.0
+    last_batch_ms: float = 0.0
+    max_batch_ms: float = 0.0
+    lanes: dict[str, LaneWaitStats] = field(default_factory=dict)
+
+    def record_wait(self, lane: str, wait_ms: float) -> None:
+        self.lanes.setdefault(lane, LaneWaitStats()).record(wait_ms)
+
+    def record_batch(self, *, size: int, failed: int, elapsed_s: float) -> None:
+        self.batches += 1
+        self.messages += size
+        self.failed += failed
+        self.busy_s += elapsed_s
+        self.last_batch_ms = elapsed_s * 1000
+        self.max_batch_ms = max(self.max_batch_ms, self.last_batch_ms)
+
+    @property
+    def throughput(self) -> float:
+        """messages per second of handler wall time"""
+        return self.messages / self.busy_s if self.busy_s else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "failed": self.failed,
+            "throughput_per_s": round(self.throughput, 2),
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "max_batch_ms": round(self.max_batch_ms, 1),
+        }
+
+    def lanes_as_dict(self) -> dict[str, dict[str, float]]:
+        return {lane: stats.as_dict() for lane, stats in self.lanes.items()}
+
+
+@dataclass(frozen=True)
+class AdmissionLimits:
+    streams: tuple[str, ...]
+    group: str
+    max_lag: int
+    max_active: int
+
+
+@dataclass(frozen=True)
+class AdmissionRejection:
+    status_code: int
+    retry_after_s: int
+    detail: str
@@ -0,0 +1,86 @@
+import time
+from collections.abc import Callable
+
+from app.core.config import settings
+from app.core.types import RunPriority
+
+RUN_PRIORITIES: tuple[RunPriority, ...] = ("interactive", "ci", "nightly")
+
+
+def test_run_stream(priority: RunPriority) -> str:
+    """interactive keeps the base stream so existing producers and consumers stay compatible"""
+    base = settings.redis_test_run_stream
+    return base if priority == "interactive" else f"{base}:{priority}"
+
+
+def test_run_streams() -> list[str]:
+    return [test_run_stream(p) for p in RUN_PRIORITIES]
+
+
+def test_run_lane_weights() -> dict[str, int]:
+    return {
+        test_run_stream("interactive"): settings.runner_lane_weight_interactive,
+        test_run_stream("ci"): settings.runner_lane_weight_ci,
+        test_run_stream("nightly"): settings.runner_lane_weight_nightly,
+    }
+
+
+class WeightedLaneScheduler:
+    """
+    Smooth weighted round robin over lanes that have work.
+
+    order() returns the lanes in the order they should be polled. A lane that
+    was polled empty drops out of the rotation and loses its credit until it is
+    served again, so neither an idle lane nor the lane that ran alone meanwhile
+    carries a backlog of credit or debt into the next busy period. A lane not served for max_wait_s while it
+    still had work is polled first regardless of weight.
+    """
+
+    def __init__(
+        self,
+        weights: dict[str, int],
+        *,
+        max_wait_s: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if not weights or any(w <= 0 for w in weights.values()):
+            raise ValueError("lane weights must be positive")
+        self._weights = dict(weights)
+        self._max_wait_s = max_wait_s
+        self._clock = clock
+
+        now = clock()
+        self._credit = dict.fromkeys(weights, 0)
+        self._last_served = dict.fromkeys(weights, now)
+        self._idle: set[str] = set()
+
+    @property
+    def lanes(self) -> list[str]:
+        return list(self._weights)
+
+    def order(self) -> list[str]:
+        now = self._clock()
+        starved = sorted(
+            (lane for lane in self._weights if now - self._last_served[lane] >= self._max_wait_s),
+            key=lambda lane: self._last_served[lane],
+        )
+        rest = sorted(
+            (lane for lane in self._weights if lane not in starved),
+            key=lambda lane: self._credit[lane] + self._weights[lane],
+            reverse=True,
+        )
+        return starved + rest
+
+    def served(self, lane: str) -> None:
+        self._idle.discard(lane)
+        busy = [name for name in self._weights if name not in self._idle]
+        for name in busy:
+            self._credit[name] += self._weights[name]
+        self._credit[lane] -= sum(self._weights[name] for name in busy)
+        self._last_served[lane] = self._clock()
+
+    def idle(self, lane: str) -> None:
+        self._idle.add(lane)
+        self._credit[lane] = 0
+        # nothing was waiting, so the lane is not starving
+        self._last_served[lane] = self._clock()
@@ -0,0 +1,164 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import redis
+
+from app.core.config import settings
+from app.queue.lanes import test_run_streams
+
+
+@dataclass(frozen=True)
+class ConsumerMetrics:
+    name: str
+    pending: int
+    idle_ms: int
+
+
+@dataclass(frozen=True)
+class StreamMetrics:
+    stream: str
+    group: str
+    length: int
+    lag: int | None
+    pending: int
+    oldest_pending_age_ms: int | None
+    consumers: list[ConsumerMetrics] = field(default_factory=list)
+
+
+def _id_age_ms(stream_id: str, now_ms: int) -> int:
+    return max(0, now_ms - int(stream_id.split("-", 1)[0]))
+
+
+class QueueMetricsCollector:
+    """Group lag / pending / consumer idle numbers from XINFO GROUPS, XINFO CONSUMERS and XPENDING."""
+
+    def __init__(self, r: redis.Redis, targets: list[tuple[str, str]]) -> None:
+        self._r = r
+        self._targets = targets
+
+    @classmethod
+    def from_settings(cls, r: redis.Redis) -> "QueueMetricsCollector":
+        return cls(
+            r,
+            [
+                (settings.redis_llm_stream, settings.redis_llm_group),
+                *((stream, settings.redis_test_group) for stream in test_run_streams()),
+            ],
+        )
+
+    def collect(self) -> list[StreamMetrics]:
+        now_ms = int(time.time() * 1000)
+        return [self._collect_one(stream, group, now_ms) for stream, group in self._targets]
+
+    def group_lag(self, stream: str, group: str) -> int | None:
+        """
+        Entries not yet delivered to the group, or None when the server does not report lag.
+        A missing stream counts as empty; a missing group lags by the whole stream.
+        """
+        try:
+            groups: Any = self._r.xinfo_groups(stream)
+        except redis.ResponseError:
+            return 0
+        info = next((g for g in groups if g["name"] == group), None)
+        if info is None:
+            return int(self._r.xlen(stream))  # type: ignore[arg-type]
+        lag = info.get("lag")
+        return int(lag) if lag is not None else None
+
+    def _collect_one(self, stream: str, group: str, now_ms: int) -> StreamMetrics:
+        try:
+            length = int(self._r.xlen(stream))  # type: ignore[arg-type]
+            groups: Any = self._r.xinfo_groups(stream)
+        except redis.ResponseError:
+            # stream does not exist yet
+            return StreamMetrics(
+                stream=stream, group=group, length=0, lag=0, pending=0, oldest_pending_age_ms=None
+            )
+
+        info = next((g for g in groups if g["name"] == group), None)
+        if info is None:
+            return StreamMetrics(
+                stream=stream,
+                group=group,
+                length=length,
+                lag=length,
+                pending=0,
+                oldest_pending_age_ms=None,
+            )
+
+        summary: Any = self._r.xpending(stream, group)
+        oldest = summary.get("min")
+        consumers: Any = self._r.xinfo_consumers(stream, group)
+
+        lag = info.get("lag")
+        return StreamMetrics(
+            stream=stream,
+            group=group,
+            length=length,
+            lag=int(lag) if lag is not None else None,
+            pending=int(summary.get("pending") or 0),
+            oldest_pending_age_ms=_id_age_ms(oldest, now_ms) if oldest else None,
+            consumers=[
+                ConsumerMetrics(name=c["name"], pending=int(c["pending"]), idle_ms=int(c["idle"]))
+                for c in consumers
+            ],
+        )
+
+
+def render_prometheus(metrics: list[StreamMetrics]) -> str:
+    lines = [
+        "# HELP autotest_queue_length Entries in the stream.",
+        "# TYPE autotest_queue_length gauge",
+        "# HELP autotest_queue_lag Entries not yet delivered to the group.",
+        "# TYPE autotest_queue_lag gauge",
+        "# HELP autotest_queue_pending Delivered but not acknowledged entries.",
+        "# TYPE autotest_queue_pending gauge",
+        "# HELP autotest_queue_oldest_pending_age_seconds Age of the oldest pending entry.",
+        "# TYPE autotest_queue_oldest_pending_age_seconds gauge",
+        "# HELP autotest_queue_consumer_pending Pending entries owned by the consumer.",
+        "# TYPE autotest_queue_consumer_pending gauge",
+        "# HELP autotest_queue_consumer_idle_seconds Time since the consumer last read.",
+        "# TYPE autotest_queue_consumer_idle_seconds gauge",
+    ]
+    for m in metrics:
+        labels = f'stream="{m.stream}",group="{m.group}"'
+        lines.append(f"autotest_queue_length{{{labels}}} {m.length}")
+        if m.lag is not None:
+            lines.append(f"autotest_queue_lag{{{labels}}} {m.lag}")
+        lines.append(f"autotest_queue_pending{{{labels}}} {m.pending}")
+        oldest_s = (m.oldest_pending_age_ms or 0) / 1000
+        lines.append(f"autotest_queue_oldest_pending_age_seconds{{{labels}}} {oldest_s}")
+        for c in m.consumers:
+            c_labels = f'{labels},consumer="{c.name}"'
+            lines.append(f"autotest_queue_consumer_pending{{{c_labels}}} {c.pending}")
+            lines.append(f"autotest_queue_consumer_idle_seconds{{{c_labels}}} {c.idle_ms / 1000}")
+    return "\n".join(lines) + "\n"
+
+
+def render_pool_prometheus(pool: str, stats: dict[str, float]) -> str:
+    lines = [
+        "# HELP autotest_redis_pool_connections Pool size limit and connections checked out.",
+        "# TYPE autotest_redis_pool_connections gauge",
+        "# HELP autotest_redis_pool_saturation Checked out connections / pool size.",
+        "# TYPE autotest_redis_pool_saturation gauge",
+        "# HELP autotest_redis_pool_checkouts_total Connection checkouts.",
+        "# TYPE autotest_redis_pool_checkouts_total counter",
+        "# HELP autotest_redis_pool_checkout_timeouts_total Checkouts that found no free connection.",
+        "# TYPE autotest_redis_pool_checkout_timeouts_total counter",
+        "# HELP autotest_redis_pool_checkout_wait_seconds Average and maximum checkout wait.",
+        "# TYPE autotest_redis_pool_checkout_wait_seconds gauge",
+    ]
+    labels = f'pool="{pool}"'
+    lines += [
+        f'autotest_redis_pool_connections{{{labels},state="max"}} {stats["max_connections"]}',
+        f'autotest_redis_pool_connections{{{labels},state="in_use"}} {stats["in_use"]}',
+        f"autotest_redis_pool_saturation{{{labels}}} {stats['saturation']}",
+        f"autotest_redis_pool_checkouts_total{{{labels}}} {stats['checkouts']}",
+        f"autotest_redis_pool_checkout_timeouts_total{{{labels}}} {stats['checkout_timeouts']}",
+        f'autotest_redis_pool_checkout_wait_seconds{{{labels},stat="avg"}} '
+        f"{stats['wait_ms_avg'] / 1000}",
+        f'autotest_redis_pool_checkout_wait_seconds{{{labels},stat="max"}} '
+        f"{stats['wait_ms_max'] / 1000}",
+    ]
+    return "\n".join(lines) + "\n"
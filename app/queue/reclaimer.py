@@ -0,0 +1,137 @@
+import time
+from collections.abc import Callable, Collection
+from typing import Any
+
+import redis
+from loguru import logger
+
+StreamMessage = tuple[str, dict[str, str]]
+
+
+class StreamReclaimer:
+    """
+    Takes over pending entries that have been idle longer than min_idle_ms (dead
+    consumer, or a handler that raised and never acked). The owning consumer calls
+    reclaim() from its read loop, at most every interval_s, asking for no more
+    entries than it has free slots, and handles what comes back like a fresh read:
+    nothing is buffered here, so a process that dies strands at most one read's
+    worth. Entries delivered more than max_deliveries times are moved to the
+    dead-letter stream and acked.
+    """
+
+    def __init__(
+        self,
+        r: redis.Redis,
+        *,
+        stream: str,
+        group: str,
+        consumer: str,
+        dead_letter_stream: str,
+        min_idle_ms: int,
+        max_deliveries: int,
+        interval_s: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._r = r
+        self._stream = stream
+        self._group = group
+        self._consumer = consumer
+        self._dead_letter_stream = dead_letter_stream
+        self._min_idle_ms = min_idle_ms
+        self._max_deliveries = max_deliveries
+        self._interval_s = interval_s
+        self._clock = clock
+        self._next_at = 0.0
+
+    def due(self) -> bool:
+        return self._clock() >= self._next_at
+
+    def reclaim(self, count: int, *, skip: Collection[str] = ()) -> list[StreamMessage]:
+        """
+        Claims up to count idle entries; ids in skip (still being handled by this
+        consumer) are left alone, so a slow handler does not get its entry twice.
+        """
+        self._next_at = self._clock() + self._interval_s
+        if count <= 0:
+            return []
+
+        pending: Any = self._r.xpending_range(
+            self._stream,
+            self._group,
+            min="-",
+            max="+",
+            count=count + len(skip),
+            idle=self._min_idle_ms,
+        )
+        # XCLAIM below is one more delivery
+        deliveries = {
+            p["message_id"]: int(p["times_delivered"]) + 1
+            for p in pending
+            if p["message_id"] not in skip
+        }
+        ids = list(deliveries)[:count]
+        if not ids:
+            return []
+
+        # min_idle_time again: an entry another replica claimed meanwhile is not idle and stays there
+        resp: Any = self._r.xclaim(
+            self._stream,
+            self._group,
+            self._consumer,
+            min_idle_time=self._min_idle_ms,
+            message_ids=ids,
+        )
+        claimed = [(msg_id, fields) for msg_id, fields in resp if fields is not None]
+        self._ack_deleted(ids, {msg_id for msg_id, _ in claimed})
+
+        if claimed:
+            logger.warning(
+                "Redis reclaimer: claimed {} stale entries from {}", len(claimed), self._stream
+            )
+        return self._route_poison(claimed, deliveries)
+
+    def _ack_deleted(self, ids: list[str], claimed: set[str]) -> None:
+        """Acks requested ids that are gone from the stream (Redis < 7 keeps them pending)."""
+        missing = [msg_id for msg_id in ids if msg_id not in claimed]
+        if not missing:
+            return
+        pipe = self._r.pipeline(transaction=False)
+        for msg_id in missing:
+            pipe.xrange(self._stream, min=msg_id, max=msg_id)
+        deleted = [
+            msg_id for msg_id, entries in zip(missing, pipe.execute(), strict=True) if not entries
+        ]
+        if deleted:
+            self._r.xack(self._stream, self._group, *deleted)  # type: ignore[no-untyped-call]
+
+    def _route_poison(
+        self, claimed: list[StreamMessage], deliveries: dict[str, int]
+    ) -> list[StreamMessage]:
+        retry: list[StreamMessage] = []
+        pipe = self._r.pipeline(transaction=False)
+        dead = 0
+        for msg_id, fields in claimed:
+            times_delivered = deliveries[msg_id]
+            if times_delivered <= self._max_deliveries:
+                retry.append((msg_id, fields))
+                continue
+
+            dead += 1
+            entry: dict[Any, Any] = {
+                **fields,
+                "source_stream": self._stream,
+                "source_id": msg_id,
+                "times_delivered": str(times_delivered),
+                "dead_at_ms": str(int(time.time() * 1000)),
+            }
+            pipe.xadd(self._dead_letter_stream, entry)
+            pipe.xack(self._stream, self._group, msg_id)
+            logger.error(
+                "Redis reclaimer: msg_id={} delivered {} times, moved to {}",
+                msg_id,
+                times_delivered,
+                self._dead_letter_stream,
+            )
+        if dead:
+            pipe.execute()
+        return retry
@@ -1,14 +1,32 @@
+import asyncio
 import json
 import time
-from collections.abc import Callable
-from typing import Literal
+from collections.abc import Awaitable, Callable, Collection
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Literal
 
 import redis
+import redis.asyncio as aioredis
+from loguru import logger
 
 from app.core.config import settings
+from app.queue.dto import ConsumerStats
+from app.queue.lanes import WeightedLaneScheduler, test_run_lane_weights, test_run_streams
+from app.queue.reclaimer import StreamReclaimer
+from app.queue.registry import ConsumerRegistry, make_consumer_name
+from app.queue.retention import StreamArchiver, StreamTrimmer
 
 WorkerType = Literal["llm", "test_runner"]
 
+# (stream, msg_id, fields)
+Delivery = tuple[str, str, dict[str, str]]
+
+LANE_STATS_LOG_EVERY = 100
+
+
+def _entry_age_ms(msg_id: str) -> float:
+    return max(0.0, time.time() * 1000 - int(msg_id.split("-", 1)[0]))
+
 
 class RedisConsumer:
     def __init__(self, worker_type: WorkerType, redis_url: str | None = None):
@@ -17,17 +35,72 @@ class RedisConsumer:
 
         self._worker_type: WorkerType = worker_type
 
+        self.scheduler: WeightedLaneScheduler | None = None
         if worker_type == "llm":
-            self._stream = settings.redis_llm_stream
+            self._streams = [settings.redis_llm_stream]
             self._group = settings.redis_llm_group
-            self._consumer = settings.redis_llm_consumer
+            self._consumer = make_consumer_name(settings.redis_llm_consumer)
         elif worker_type == "test_runner":
-            self._stream = settings.redis_test_run_stream
+            self._streams = test_run_streams()
             self._group = settings.redis_test_group
-            self._consumer = settings.redis_test_consumer
+            self._consumer = make_consumer_name(settings.redis_test_consumer)
+            self.scheduler = WeightedLaneScheduler(
+                test_run_lane_weights(), max_wait_s=settings.runner_lane_max_wait_s
+            )
         else:
             raise ValueError(f"Unknown worker_type: {worker_type}")
 
+        self.stats = ConsumerStats()
+        self.reclaimers = {
+            stream: StreamReclaimer(
+                self._r,
+                stream=stream,
+                group=self._group,
+                consumer=self._consumer,
+                dead_letter_stream=f"{stream}{settings.redis_dead_letter_suffix}",
+                min_idle_ms=settings.redis_reclaim_min_idle_ms,
+                max_deliveries=settings.redis_max_deliveries,
+                interval_s=settings.redis_reclaim_interval_s,
+            )
+            for stream in self._streams
+        }
+        self.registry = ConsumerRegistry(
+            self._r,
+            streams=self._streams,
+            group=self._group,
+            consumer=self._consumer,
+            heartbeat_ttl_s=settings.redis_consumer_heartbeat_ttl_s,
+        )
+        archiver = (
+            StreamArchiver(settings.redis_retention_archive_dir)
+            if settings.redis_retention_archive_dir
+            else None
+        )
+        self.trimmers = {
+            stream: StreamTrimmer(
+                self._r,
+                stream=stream,
+                mode=settings.redis_retention_mode,
+                maxlen=settings.redis_retention_maxlen,
+                max_age_s=settings.redis_retention_max_age_s,
+                interval_s=settings.redis_retention_interval_s,
+                archiver=archiver,
+            )
+            for stream in self._streams
+        }
+        for stream in self._streams:
+            dead_letter_stream = f"{stream}{settings.redis_dead_letter_suffix}"
+            self.trimmers[dead_letter_stream] = StreamTrimmer(
+                self._r,
+                stream=dead_letter_stream,
+                mode="minid" if settings.redis_dead_letter_max_age_s > 0 else "off",
+                maxlen=0,
+                max_age_s=settings.redis_dead_letter_max_age_s,
+                interval_s=settings.redis_retention_interval_s,
+                archiver=archiver,
+                guard_groups=False,
+            )
+
         self._ensure_group()
 
     @classmethod
@@ -39,12 +112,146 @@ class RedisConsumer:
         return cls(worker_type="test_runner", redis_url=redis_url)
 
     def _ensure_group(self) -> None:
-        try:
-            self._r.xgroup_create(self._stream, self._group, id="0", mkstream=True)
-        except redis.ResponseError as e:
-            # group already exists
-            if "BUSYGROUP" not in str(e):
-                raise
+        for stream in self._streams:
+            try:
+                self._r.xgroup_create(stream, self._group, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                # group already exists
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    @property
+    def consumer_name(self) -> str:
+        return self._consumer
+
+    @property
+    def streams(self) -> list[str]:
+        return list(self._streams)
+
+    def _start_background(self) -> None:
+        self.registry.start()
+        for trimmer in self.trimmers.values():
+            trimmer.start()
+
+    def close(self) -> None:
+        for trimmer in self.trimmers.values():
+            trimmer.stop()
+        self.registry.stop()
+
+    def _poll_order(self) -> list[str]:
+        return self.scheduler.order() if self.scheduler else self._streams
+
+    def _reclaim(self, count: int, handling: Collection[tuple[str, str]] = ()) -> list[Delivery]:
+        """Stale entries, at most count, for lanes whose reclaim interval has passed."""
+        if not settings.redis_reclaim_enabled:
+            return []
+        for stream in self._poll_order():
+            reclaimer = self.reclaimers[stream]
+            if not reclaimer.due():
+                continue
+            skip = {msg_id for s, msg_id in handling if s == stream}
+            try:
+                reclaimed = reclaimer.reclaim(count, skip=skip)
+            except redis.RedisError as e:
+                logger.error("Redis reclaimer: reclaim failed for {}: {}", stream, e)
+                continue
+            if reclaimed:
+                return [(stream, msg_id, fields) for msg_id, fields in reclaimed]
+        return []
+
+    def _delivered(self, resp: Any) -> list[Delivery]:
+        """Flattens an XREADGROUP reply and accounts the lanes it was served from."""
+        deliveries: list[Delivery] = []
+        for stream, messages in resp or []:
+            if self.scheduler:
+                self.scheduler.served(stream)
+            for msg_id, fields in messages:
+                self.stats.record_wait(stream, _entry_age_ms(msg_id))
+                deliveries.append((stream, msg_id, fields))
+
+        if len(self._streams) > 1 and deliveries:
+            total = sum(lane.messages for lane in self.stats.lanes.values())
+            if total // LANE_STATS_LOG_EVERY != (total - len(deliveries)) // LANE_STATS_LOG_EVERY:
+                logger.info("Redis consumer: lane wait stats {}", self.stats.lanes_as_dict())
+        return deliveries
+
+    def _read(self, *, count: int, block_ms: int) -> list[Delivery]:
+        reclaimed = self._reclaim(count)
+        if reclaimed:
+            return reclaimed
+
+        if self.scheduler:
+            # non-blocking poll in scheduler order: only the chosen lane gets entries claimed
+            for stream in self.scheduler.order():
+                resp = self._r.xreadgroup(
+                    groupname=self._group,
+                    consumername=self._consumer,
+                    streams={stream: ">"},
+                    count=count,
+                )
+                if resp:
+                    return self._delivered(resp)
+                self.scheduler.idle(stream)
+            count = 1
+
+        resp = self._r.xreadgroup(
+            groupname=self._group,
+            consumername=self._consumer,
+            streams=dict.fromkeys(self._streams, ">"),
+            count=count,
+            block=block_ms,
+        )
+        return self._delivered(resp)
+
+    async def _read_async(
+        self,
+        r: aioredis.Redis,
+        *,
+        count: int,
+        block_ms: int,
+        handling: Collection[tuple[str, str]] = (),
+    ) -> list[Delivery]:
+        reclaimed = await asyncio.to_thread(self._reclaim, count, handling)
+        if reclaimed:
+            return reclaimed
+
+        if self.scheduler:
+            for stream in self.scheduler.order():
+                resp = await r.xreadgroup(
+                    groupname=self._group,
+                    consumername=self._consumer,
+                    streams={stream: ">"},
+                    count=count,
+                )
+                if resp:
+                    return self._delivered(resp)
+                self.scheduler.idle(stream)
+            count = 1
+
+        resp = await r.xreadgroup(
+            groupname=self._group,
+            consumername=self._consumer,
+            streams=dict.fromkeys(self._streams, ">"),
+            count=count,
+            block=block_ms,
+        )
+        return self._delivered(resp)
+
+    def _ack(self, deliveries: list[tuple[str, str]]) -> None:
+        """One XACK per stream, sent in a single round trip."""
+        by_stream: dict[str, list[str]] = {}
+        for stream, msg_id in deliveries:
+            by_stream.setdefault(stream, []).append(msg_id)
+        if not by_stream:
+            return
+        if len(by_stream) == 1:
+            [(stream, msg_ids)] = by_stream.items()
+            self._r.xack(stream, self._group, *msg_ids)  # type: ignore[no-untyped-call]
+            return
+        pipe = self._r.pipeline(transaction=False)
+        for stream, msg_ids in by_stream.items():
+            pipe.xack(stream, self._group, *msg_ids)
+        pipe.execute()
 
     def consume(
         self,
@@ -57,25 +264,140 @@ class RedisConsumer:
         """
         handler(body: bytes) -> None
         """
-        while True:
-            resp = self._r.xreadgroup(
-                groupname=self._group,
-                consumername=self._consumer,
-                streams={self._stream: ">"},
-                count=count,
-                block=block_ms,
-            )
-            if not resp:
-                continue
+        self._start_background()
+        try:
+            while True:
+                for stream, msg_id, fields in self._read(count=count, block_ms=block_ms):
+                    try:
+                        body = json.dumps(fields).encode("utf-8")
+                        handler(body)
+                        self._ack([(stream, msg_id)])
+                    except Exception:
+                        time.sleep(on_error_sleep_s)
+        finally:
+            self.close()
 
-            _, messages = resp[0]  # type: ignore[index]
-            for msg_id, fields in messages:
-                try:
-                    body = json.dumps(fields).encode("utf-8")
-                    handler(body)
-                    self._r.xack(self._stream, self._group, msg_id)  # type: ignore[no-untyped-call]
-                except Exception:
-                    time.sleep(on_error_sleep_s)
+    def consume_batch(
+        self,
+        handler: Callable[[bytes], None],
+        *,
+        count: int = 16,
+        max_workers: int = 4,
+        block_ms: int = 5000,
+        on_error_sleep_s: float = 1.0,
+    ) -> None:
+        """
+        Hands every XREADGROUP batch to a bounded thread pool and acks the
+        successful messages with a single XACK once the whole batch is done.
+        handler must be thread-safe.
+        """
+        self._start_background()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=f"{self._worker_type}_consumer"
+            ) as pool:
+                while True:
+                    messages = self._read(count=count, block_ms=block_ms)
+                    if messages and self._process_batch(pool, handler, messages):
+                        time.sleep(on_error_sleep_s)
+        finally:
+            self.close()
+
+    def _process_batch(
+        self,
+        pool: ThreadPoolExecutor,
+        handler: Callable[[bytes], None],
+        messages: list[Delivery],
+    ) -> int:
+        started = time.perf_counter()
+        futures = {
+            pool.submit(handler, json.dumps(fields).encode("utf-8")): (stream, msg_id)
+            for stream, msg_id, fields in messages
+        }
+
+        done_ids: list[tuple[str, str]] = []
+        failed = 0
+        for fut in as_completed(futures):
+            exc = fut.exception()
+            if exc is None:
+                done_ids.append(futures[fut])
+            else:
+                failed += 1
+                logger.error("Redis consumer: handler failed msg={}: {}", futures[fut], exc)
+
+        self._ack(done_ids)
+
+        elapsed_s = time.perf_counter() - started
+        self.stats.record_batch(size=len(messages), failed=failed, elapsed_s=elapsed_s)
+        logger.info(
+            "Redis consumer: batch size={} failed={} latency_ms={:.0f} stats={}",
+            len(messages),
+            failed,
+            elapsed_s * 1000,
+            self.stats.as_dict(),
+        )
+        return failed
+
+    async def consume_async(
+        self,
+        handler: Callable[[bytes], Awaitable[None]],
+        *,
+        concurrency: int,
+        block_ms: int = 5000,
+        on_error_sleep_s: float = 1.0,
+    ) -> None:
+        """
+        Runs up to `concurrency` handlers at once on the current event loop.
+        Messages are only read from the stream when a slot is free, so nothing
+        sits claimed in this consumer's pending list while waiting for a slot.
+        """
+        r = aioredis.Redis.from_url(self._redis_url, decode_responses=True)
+        slots = asyncio.Semaphore(concurrency)
+        in_flight: set[asyncio.Task[None]] = set()
+        # entries being handled right now; the reclaimer must not hand them out again
+        handling: set[tuple[str, str]] = set()
+        active = 0
+
+        async def _handle(stream: str, msg_id: str, fields: dict[str, str]) -> None:
+            nonlocal active
+            try:
+                body = json.dumps(fields).encode("utf-8")
+                await handler(body)
+                await r.xack(stream, self._group, msg_id)
+            except Exception:
+                logger.exception("Redis consumer: handler failed msg_id={}", msg_id)
+                await asyncio.sleep(on_error_sleep_s)
+            finally:
+                handling.discard((stream, msg_id))
+                active -= 1
+                slots.release()
+
+        self._start_background()
+        try:
+            while True:
+                await slots.acquire()
+                messages = await self._read_async(
+                    r, count=concurrency - active, block_ms=block_ms, handling=frozenset(handling)
+                )
+                if not messages:
+                    slots.release()
+                    continue
+
+                # one slot is already held; the rest are free by construction
+                for _ in messages[1:]:
+                    await slots.acquire()
+
+                for stream, msg_id, fields in messages:
+                    active += 1
+                    handling.add((stream, msg_id))
+                    task = asyncio.create_task(_handle(stream, msg_id, fields))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+            await r.aclose()
+            await asyncio.to_thread(self.close)
 
     def consume_llm(
         self,
@@ -4,11 +4,12 @@ from typing import Any
 import redis
 
 from app.core.config import settings
+from app.queue.lanes import RUN_PRIORITIES, test_run_stream
 
 
 class RedisPublisher:
-    def __init__(self, redis_url: str | None = None):
-        self._r = redis.Redis.from_url(
+    def __init__(self, redis_url: str | None = None, *, client: redis.Redis | None = None):
+        self._r = client or redis.Redis.from_url(
             redis_url or settings.redis_url,
             decode_responses=True,
         )
@@ -27,13 +28,17 @@ class RedisPublisher:
 
     def publish_test_run(self, message: dict[Any, Any]) -> Any:
         """
-        message: {"run_id": int, "placeholders": dict}
+        message: {"run_id": int, "placeholders": dict, "priority": "interactive"|"ci"|"nightly"}
         """
         if "run_id" not in message:
             raise ValueError("run_id is required")
 
+        priority = message.get("priority", "interactive")
+        if priority not in RUN_PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+
         return self._r.xadd(
-            settings.redis_test_run_stream,
+            test_run_stream(priority),
             {
                 "run_id": str(message["run_id"]),
                 "placeholders": json.dumps(message.get("placeholders", {}), ensure_ascii=False),
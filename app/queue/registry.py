@@ -0,0 +1,112 @@
+import os
+import socket
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+import redis
+from loguru import logger
+
+
+def make_consumer_name(prefix: str) -> str:
+    """<prefix>:<host>:<pid>:<start_ms> - unique per worker process"""
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}:{int(time.time() * 1000)}"
+
+
+class ConsumerRegistry:
+    """
+    Keeps a heartbeat key alive for this consumer and removes consumers of the
+    group whose heartbeat expired, once they no longer own pending entries
+    (StreamReclaimer moves those to live consumers first).
+
+    One registry covers every stream (lane) the consumer reads: a single thread
+    and a single heartbeat key per consumer, pruning stream by stream.
+    """
+
+    def __init__(
+        self,
+        r: redis.Redis,
+        *,
+        streams: Sequence[str],
+        group: str,
+        consumer: str,
+        heartbeat_ttl_s: int,
+    ) -> None:
+        self._r = r
+        self._streams = list(streams)
+        self._group = group
+        self._consumer = consumer
+        self._ttl_s = heartbeat_ttl_s
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _heartbeat_key(self, consumer: str) -> str:
+        return f"{self._group}:heartbeat:{consumer}"
+
+    def heartbeat(self) -> None:
+        self._r.set(self._heartbeat_key(self._consumer), str(int(time.time())), ex=self._ttl_s)
+
+    def prune_dead_consumers(self) -> dict[str, list[str]]:
+        """Removed consumer names by stream."""
+        candidates: list[tuple[str, str]] = []
+        for stream in self._streams:
+            consumers: Any = self._r.xinfo_consumers(stream, self._group)
+            candidates.extend(
+                (stream, c["name"])
+                for c in consumers
+                if c["name"] != self._consumer
+                and int(c["pending"]) == 0
+                and int(c["idle"]) > self._ttl_s * 1000
+            )
+        if not candidates:
+            return {}
+
+        pipe = self._r.pipeline(transaction=False)
+        for _, name in candidates:
+            pipe.exists(self._heartbeat_key(name))
+        alive = pipe.execute()
+
+        removed: dict[str, list[str]] = {}
+        for (stream, name), is_alive in zip(candidates, alive, strict=True):
+            if is_alive:
+                continue
+            self._r.xgroup_delconsumer(stream, self._group, name)
+            removed.setdefault(stream, []).append(name)
+
+        if removed:
+            logger.info("Redis registry: removed dead consumers {} from {}", removed, self._group)
+        return removed
+
+    def _run(self) -> None:
+        interval_s = max(1.0, self._ttl_s / 3)
+        while not self._stop.wait(interval_s):
+            try:
+                self.heartbeat()
+                self.prune_dead_consumers()
+            except Exception as e:
+                logger.error("Redis registry: housekeeping failed for {}: {}", self._consumer, e)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.heartbeat()
+        self._thread = threading.Thread(
+            target=self._run, name=f"registry:{self._consumer}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Deregister on clean shutdown; leaves pending entries to the reclaimer."""
+        self._stop.set()
+        try:
+            self._r.delete(self._heartbeat_key(self._consumer))
+            for stream in self._streams:
+                pending: Any = self._r.xpending_range(
+                    stream, self._group, min="-", max="+", count=1, consumername=self._consumer
+                )
+                if not pending:
+                    self._r.xgroup_delconsumer(stream, self._group, self._consumer)
+        except Exception as e:
+            logger.warning("Redis registry: deregister failed for {}: {}", self._consumer, e)
@@ -0,0 +1,188 @@
+import gzip
+import json
+import threading
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Literal
+
+import redis
+from loguru import logger
+
+from app.queue.reclaimer import StreamMessage
+
+RetentionMode = Literal["off", "maxlen", "minid"]
+
+StreamId = tuple[int, int]
+
+
+def _parse_id(stream_id: str) -> StreamId:
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _format_id(stream_id: StreamId) -> str:
+    return f"{stream_id[0]}-{stream_id[1]}"
+
+
+class StreamArchiver:
+    """Appends entries to <root>/<stream>/<YYYY-MM-DD>.ndjson.gz, dated by entry id (UTC)."""
+
+    def __init__(self, root_dir: str | Path) -> None:
+        self._root = Path(root_dir)
+
+    def write(self, stream: str, entries: list[StreamMessage]) -> None:
+        by_day: dict[str, list[StreamMessage]] = {}
+        for entry in entries:
+            ms, _ = _parse_id(entry[0])
+            day = datetime.fromtimestamp(ms / 1000, tz=UTC).strftime("%Y-%m-%d")
+            by_day.setdefault(day, []).append(entry)
+
+        stream_dir = self._root / stream.replace(":", "_")
+        stream_dir.mkdir(parents=True, exist_ok=True)
+        for day, day_entries in by_day.items():
+            # every call appends a new gzip member; readers see one concatenated stream
+            with gzip.open(stream_dir / f"{day}.ndjson.gz", "at", encoding="utf-8") as f:
+                for msg_id, fields in day_entries:
+                    f.write(json.dumps({"id": msg_id, "fields": fields}, ensure_ascii=False))
+                    f.write("\n")
+
+
+class StreamTrimmer:
+    """
+    Trims entries every consumer group has acknowledged.
+
+    The retention target (last maxlen entries, or entries newer than max_age_s) is
+    converted to a MINID and capped at the safe floor: the oldest pending entry of
+    any group, or the first entry a group has not been delivered yet. Without an
+    archiver XTRIM MINID ~ lets Redis drop whole radix tree nodes; with one, the
+    entries below the floor are archived first and trimmed exactly.
+
+    Streams nobody reads through a group (dead-letter streams) pass guard_groups=False
+    and are trimmed by the retention target alone.
+    """
+
+    def __init__(
+        self,
+        r: redis.Redis,
+        *,
+        stream: str,
+        mode: RetentionMode,
+        maxlen: int,
+        max_age_s: int,
+        interval_s: float,
+        archiver: StreamArchiver | None = None,
+        batch_size: int = 500,
+        guard_groups: bool = True,
+    ) -> None:
+        self._r = r
+        self._stream = stream
+        self._mode = mode
+        self._maxlen = maxlen
+        self._max_age_s = max_age_s
+        self._interval_s = interval_s
+        self._archiver = archiver
+        self._batch_size = batch_size
+        self._guard_groups = guard_groups
+
+        self._lock_key = f"{stream}:retention:lock"
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def safe_floor(self) -> StreamId | None:
+        """Smallest id that must be kept, or None when no group reads the stream."""
+        try:
+            groups: Any = self._r.xinfo_groups(self._stream)
+        except redis.ResponseError:
+            return None
+        if not groups:
+            return None
+
+        floor: StreamId | None = None
+        for g in groups:
+            last_ms, last_seq = _parse_id(g["last-delivered-id"])
+            keep = (last_ms, last_seq + 1)
+            if int(g["pending"]):
+                summary: Any = self._r.xpending(self._stream, g["name"])
+                if summary.get("min"):
+                    keep = min(keep, _parse_id(summary["min"]))
+            floor = keep if floor is None else min(floor, keep)
+        return floor
+
+    def retention_floor(self, below: StreamId | None = None) -> StreamId | None:
+        """
+        Smallest id the retention policy wants to keep, or None when nothing is over it.
+        In maxlen mode only the entries over maxlen are read from the head, and none at or
+        above `below` (the safe floor), which caps the result anyway.
+        """
+        if self._mode == "minid":
+            return int(time.time() * 1000) - self._max_age_s * 1000, 0
+        if self._mode == "maxlen":
+            excess = int(self._r.xlen(self._stream)) - self._maxlen  # type: ignore[arg-type]
+            if excess <= 0:
+                return None
+            upper = f"({_format_id(below)}" if below is not None else "+"
+            oldest: Any = self._r.xrange(self._stream, min="-", max=upper, count=excess)
+            if len(oldest) < excess:
+                # the safe floor stops the trim before the maxlen cutoff
+                return below
+            last_ms, last_seq = _parse_id(oldest[-1][0])
+            return last_ms, last_seq + 1
+        return None
+
+    def trim_once(self) -> int:
+        safe: StreamId | None = None
+        if self._guard_groups:
+            safe = self.safe_floor()
+            if safe is None:
+                return 0
+        target = self.retention_floor(below=safe)
+        if target is None:
+            return 0
+        if safe is not None:
+            target = min(target, safe)
+        minid = _format_id(target)
+
+        if self._archiver is None:
+            trimmed = int(self._r.xtrim(self._stream, minid=minid, approximate=True))
+        else:
+            self._archive_below(minid)
+            trimmed = int(self._r.xtrim(self._stream, minid=minid, approximate=False))
+
+        if trimmed:
+            logger.info("Redis retention: trimmed {} entries from {}", trimmed, self._stream)
+        return trimmed
+
+    def _archive_below(self, minid: str) -> None:
+        assert self._archiver is not None
+        start = "-"
+        while True:
+            batch: Any = self._r.xrange(
+                self._stream, min=start, max=f"({minid}", count=self._batch_size
+            )
+            if not batch:
+                return
+            self._archiver.write(self._stream, batch)
+            if len(batch) < self._batch_size:
+                return
+            start = f"({batch[-1][0]}"
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                # one trimmer per stream at a time so entries are archived once
+                if self._r.set(self._lock_key, "1", nx=True, ex=max(1, int(self._interval_s))):
+                    self.trim_once()
+            except Exception as e:
+                logger.error("Redis retention: trim failed for {}: {}", self._stream, e)
+
+    def start(self) -> None:
+        if self._mode == "off" or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name=f"retention:{self._stream}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
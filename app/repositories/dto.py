@@ -14,6 +14,31 @@ class TestRunPatch:
     video_name: str | None = None
     video_object_key: str | None = None
     screenshot_object_key: str | None = None
+    trace_name: str | None = None
+    trace_object_key: str | None = None
+
+    def to_update_values(self) -> dict[str, Any]:
+        data = self.__dict__
+        return {k: v for k, v in data.items() if v is not None}
+
+
+@dataclass(frozen=True)
+class PlanProposalMetrics:
+    """LLM accounting stored on plan_proposals; all durations in ms."""
+
+    llm_model: str | None = None
+    generation_ms: int | None = None
+    prompt_eval_count: int | None = None
+    eval_count: int | None = None
+    total_duration_ms: int | None = None
+    load_duration_ms: int | None = None
+    prompt_eval_duration_ms: int | None = None
+    eval_duration_ms: int | None = None
+    repair_attempts: int | None = None
+    repair_tokens: int | None = None
+    speculative_candidates: int | None = None
+    winning_candidate: int | None = None
+    speculative_saved_ms: int | None = None
 
     def to_update_values(self) -> dict[str, Any]:
         data = self.__dict__
@@ -2,7 +2,7 @@ from collections.abc import Iterable, Sequence
 from datetime import datetime
 from typing import Any, cast
 
-from sqlalchemy import CursorResult, RowMapping, func, select, update
+from sqlalchemy import CursorResult, RowMapping, func, or_, select, update
 from sqlalchemy.orm import Session
 
 from app.models.enums import PlanProposalStatus, TestRunStatus
@@ -13,7 +13,7 @@ from app.query.filters import (
     TestCaseRevisionListQuery,
     TestRunListQuery,
 )
-from app.repositories.dto import TestRunPatch
+from app.repositories.dto import PlanProposalMetrics, TestRunPatch
 from app.repositories.query_builder import (
     apply_ilike_contains,
     apply_pagination,
@@ -249,31 +249,108 @@ class PlanProposalRepository(BaseRepository):
 
         return list(self._db.execute(stmt).scalars().all())
 
-    def create(self, test_case_revision_id: int) -> PlanProposal:
+    def create(self, test_case_revision_id: int, candidates: int = 1) -> PlanProposal:
+        request_payload: dict[str, Any] = {"schema_version": 1, "generator": "ollama"}
+        if candidates > 1:
+            request_payload["candidates"] = candidates
         proposal = PlanProposal(
             test_case_revision_id=test_case_revision_id,
             status=PlanProposalStatus.pending,
-            request_payload={"schema_version": 1, "generator": "ollama"},
+            request_payload=request_payload,
         )
         self._db.add(proposal)
         self._db.flush()
         self._db.refresh(proposal)
         return proposal
 
-    def set_is_ready_for_test(self, proposal_id: int) -> PlanProposal | None:
+    def set_is_ready_for_test(
+        self, proposal_id: int, compiled_plan: dict[str, Any] | None = None
+    ) -> PlanProposal | None:
+        values: dict[str, Any] = {"is_ready_for_test": True, "ready_for_test_at": utcnow()}
+        if compiled_plan is not None:
+            values["compiled_plan"] = compiled_plan
         stmt = (
             update(PlanProposal)
             .where(PlanProposal.id == proposal_id)
             .where(PlanProposal.status == PlanProposalStatus.succeeded)
-            .values(
-                is_ready_for_test=True,
-                ready_for_test_at=utcnow(),
-            )
+            .values(**values)
         )
         self._db.execute(stmt)
         self._db.flush()
         return self.get_item(proposal_id)
 
+    def list_succeeded_with_text(self, limit: int) -> list[RowMapping]:
+        """Most recent successful plans with the revision text they were generated from."""
+        stmt = (
+            select(
+                PlanProposal.id,
+                TestCaseRevision.nl_text,
+                PlanProposal.result_payload,
+            )
+            .join(TestCaseRevision, TestCaseRevision.id == PlanProposal.test_case_revision_id)
+            .where(PlanProposal.status == PlanProposalStatus.succeeded)
+            .where(PlanProposal.result_payload.is_not(None))
+            .order_by(PlanProposal.finished_at.desc().nulls_last(), PlanProposal.id.desc())
+            .limit(limit)
+        )
+        return list(self._db.execute(stmt).mappings().all())
+
+    def llm_stats(self, since: datetime, until: datetime) -> list[RowMapping]:
+        """
+        Per-model totals and latency percentiles of proposals that called the LLM in the window.
+        Failures with no model recorded are reported under a None model instead of dropped.
+        """
+        generation_ms = PlanProposal.generation_ms
+        queue_wait_ms = PlanProposal.queue_wait_ms
+        stmt = (
+            select(
+                PlanProposal.llm_model.label("model"),
+                func.count().label("generations"),
+                func.count()
+                .filter(PlanProposal.status == PlanProposalStatus.failed)
+                .label("failed"),
+                func.coalesce(func.sum(PlanProposal.prompt_eval_count), 0).label("prompt_tokens"),
+                func.coalesce(func.sum(PlanProposal.eval_count), 0).label("eval_tokens"),
+                func.coalesce(func.sum(PlanProposal.prompt_eval_duration_ms), 0).label(
+                    "prompt_eval_ms"
+                ),
+                func.coalesce(func.sum(PlanProposal.eval_duration_ms), 0).label("eval_ms"),
+                func.coalesce(func.sum(PlanProposal.load_duration_ms), 0).label("load_ms"),
+                func.coalesce(func.sum(PlanProposal.total_duration_ms), 0).label("total_ms"),
+                func.percentile_cont(0.5).within_group(generation_ms).label("generation_ms_p50"),
+                func.percentile_cont(0.95).within_group(generation_ms).label("generation_ms_p95"),
+                func.percentile_cont(0.5).within_group(queue_wait_ms).label("queue_wait_ms_p50"),
+                func.percentile_cont(0.95).within_group(queue_wait_ms).label("queue_wait_ms_p95"),
+            )
+            .where(
+                or_(
+                    PlanProposal.llm_model.is_not(None),
+                    PlanProposal.status == PlanProposalStatus.failed,
+                )
+            )
+            .where(PlanProposal.finished_at >= since)
+            .where(PlanProposal.finished_at < until)
+            .group_by(PlanProposal.llm_model)
+            .order_by(PlanProposal.llm_model.nulls_last())
+        )
+        return list(self._db.execute(stmt).mappings().all())
+
+    def count_active(self) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(PlanProposal)
+            .where(
+                PlanProposal.status.in_([PlanProposalStatus.pending, PlanProposalStatus.running])
+            )
+        )
+        return int(self._db.execute(stmt).scalar_one())
+
+    def count_finished_since(self, since: datetime) -> int:
+        stmt = (
+            select(func.count()).select_from(PlanProposal).where(PlanProposal.finished_at >= since)
+        )
+        return int(self._db.execute(stmt).scalar_one())
+
     def _transition(
         self,
         proposal_id: int,
@@ -291,15 +368,26 @@ class PlanProposalRepository(BaseRepository):
         self._db.flush()
         return res.rowcount == 1
 
-    def mark_running(self, proposal_id: int, started_at: datetime) -> bool:
+    def mark_running(
+        self, proposal_id: int, started_at: datetime, queue_wait_ms: int | None = None
+    ) -> bool:
         return self._transition(
             proposal_id,
             from_statuses=[PlanProposalStatus.pending],
-            values={"status": PlanProposalStatus.running, "started_at": started_at},
+            values={
+                "status": PlanProposalStatus.running,
+                "started_at": started_at,
+                "queue_wait_ms": queue_wait_ms,
+            },
         )
 
     def mark_ready(
-        self, proposal_id: int, result_payload: dict[str, Any], finished_at: datetime
+        self,
+        proposal_id: int,
+        result_payload: dict[str, Any],
+        finished_at: datetime,
+        metrics: PlanProposalMetrics | None = None,
+        compiled_plan: dict[str, Any] | None = None,
     ) -> bool:
         return self._transition(
             proposal_id,
@@ -307,12 +395,20 @@ class PlanProposalRepository(BaseRepository):
             values={
                 "status": PlanProposalStatus.succeeded,
                 "result_payload": result_payload,
+                "compiled_plan": compiled_plan,
                 "error": None,
                 "finished_at": finished_at,
+                **(metrics.to_update_values() if metrics else {}),
             },
         )
 
-    def mark_failed(self, proposal_id: int, error: str, finished_at: datetime) -> bool:
+    def mark_failed(
+        self,
+        proposal_id: int,
+        error: str,
+        finished_at: datetime,
+        metrics: PlanProposalMetrics | None = None,
+    ) -> bool:
         return self._transition(
             proposal_id,
             from_statuses=[PlanProposalStatus.pending, PlanProposalStatus.running],
@@ -320,6 +416,7 @@ class PlanProposalRepository(BaseRepository):
                 "status": PlanProposalStatus.failed,
                 "error": error,
                 "finished_at": finished_at,
+                **(metrics.to_update_values() if metrics else {}),
             },
         )
 
@@ -392,6 +489,18 @@ class TestRunRepository(BaseRepository):
 
         return list(self._db.execute(stmt).scalars().all())
 
+    def count_active(self) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(TestRun)
+            .where(TestRun.status.in_([TestRunStatus.queued, TestRunStatus.running]))
+        )
+        return int(self._db.execute(stmt).scalar_one())
+
+    def count_finished_since(self, since: datetime) -> int:
+        stmt = select(func.count()).select_from(TestRun).where(TestRun.finished_at >= since)
+        return int(self._db.execute(stmt).scalar_one())
+
     def _transition(
         self,
         run_id: int,
@@ -457,6 +566,8 @@ class TestRunRepository(BaseRepository):
         video_name: str | None = None,
         video_object_key: str | None = None,
         screenshot_object_key: str | None = None,
+        trace_name: str | None = None,
+        trace_object_key: str | None = None,
     ) -> bool:
         return self._transition(
             run_id,
@@ -470,5 +581,7 @@ class TestRunRepository(BaseRepository):
                 video_name=video_name,
                 video_object_key=video_object_key,
                 screenshot_object_key=screenshot_object_key,
+                trace_name=trace_name,
+                trace_object_key=trace_object_key,
             ),
         )
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import RowMapping
+
+from app.dependencies import get_plan_proposal_repo
+from app.repositories.repositories import PlanProposalRepository
+from app.schemas.schemas import LlmModelStatsResponse, LlmStatsResponse
+from app.utils import utcnow
+
+router = APIRouter(tags=["LLM stats"])
+
+
+def _per_s(tokens: int, ms: int) -> float:
+    return round(tokens / (ms / 1000), 2) if ms else 0.0
+
+
+def _model_stats(row: RowMapping) -> LlmModelStatsResponse:
+    return LlmModelStatsResponse(
+        model=row["model"],
+        generations=row["generations"],
+        failed=row["failed"],
+        prompt_tokens=row["prompt_tokens"],
+        eval_tokens=row["eval_tokens"],
+        prompt_tokens_per_s=_per_s(row["prompt_tokens"], row["prompt_eval_ms"]),
+        eval_tokens_per_s=_per_s(row["eval_tokens"], row["eval_ms"]),
+        generation_ms_p50=row["generation_ms_p50"],
+        generation_ms_p95=row["generation_ms_p95"],
+        queue_wait_ms_p50=row["queue_wait_ms_p50"],
+        queue_wait_ms_p95=row["queue_wait_ms_p95"],
+        load_share=round(row["load_ms"] / row["total_ms"], 3) if row["total_ms"] else 0.0,
+    )
+
+
+@router.get("/llm/stats", response_model=LlmStatsResponse)
+def get_llm_stats(
+    since: datetime | None = Query(default=None, description="default: until - 24h"),
+    until: datetime | None = Query(default=None, description="default: now"),
+    plan_proposal_repo: PlanProposalRepository = Depends(get_plan_proposal_repo),
+) -> LlmStatsResponse:
+    """Tokens/s, generation latency percentiles and model-load share per model, for capacity planning."""
+    until = until or utcnow()
+    since = since or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(status_code=422, detail="since must be before until")
+
+    rows = plan_proposal_repo.llm_stats(since=since, until=until)
+    return LlmStatsResponse(since=since, until=until, models=[_model_stats(r) for r in rows])
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from loguru import logger
 from starlette import status
 
+from app.core.config import settings
 from app.dependencies import (
+    get_admission_controller,
     get_plan_proposal_repo,
     get_redis_publisher,
     get_test_case_rev_repo,
@@ -10,11 +12,14 @@ from app.dependencies import (
 )
 from app.models.enums import PlanProposalStatus
 from app.models.models import PlanProposal
+from app.plan.compiler import load_compiled_plan
 from app.query.filters import PlanProposalListQuery, get_plan_proposal_list_query
+from app.queue.admission import AdmissionController
 from app.queue.redis_queue import RedisPublisher
 from app.repositories.repositories import PlanProposalRepository, TestCaseRevisionRepository
-from app.schemas.schemas import PlanProposalResponse
+from app.schemas.schemas import PlanProposalCreateRequest, PlanProposalResponse
 from app.uow import UnitOfWork
+from app.workers.test_runner.renderer import precompile_plan
 
 router = APIRouter(prefix="", tags=["Plan proposals"])
 
@@ -57,13 +62,29 @@ def list_revision_proposals(
 )
 def create_plan_proposal(
     revision_id: int,
+    payload: PlanProposalCreateRequest | None = None,
     uow: UnitOfWork = Depends(get_uow),
     publisher: RedisPublisher = Depends(get_redis_publisher),
+    admission: AdmissionController = Depends(get_admission_controller),
 ) -> PlanProposal:
+    candidates = payload.candidates if payload else 1
+    if candidates > settings.llm_speculative_max_candidates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"candidates must be <= {settings.llm_speculative_max_candidates}",
+        )
     if not uow.revisions_repo.get_item(revision_id):
         raise HTTPException(status_code=404, detail="test_case_revision not found")
 
-    proposal = uow.plan_proposals_repo.create(revision_id)
+    rejection = admission.check_plan_proposal(uow.plan_proposals_repo)
+    if rejection:
+        raise HTTPException(
+            status_code=rejection.status_code,
+            detail=rejection.detail,
+            headers={"Retry-After": str(rejection.retry_after_s)},
+        )
+
+    proposal = uow.plan_proposals_repo.create(revision_id, candidates=candidates)
     uow.commit()
 
     logger.info("Sending plan generation msg to queue")
@@ -87,5 +108,17 @@ def mark_plan_proposal_ready_for_test(
     if proposal.status != PlanProposalStatus.succeeded:
         raise HTTPException(status_code=400, detail="plan_proposal is not succeeded")
 
-    new_proposal = plan_proposal_repo.set_is_ready_for_test(proposal_id=plan_proposal_id)
+    # proposals that succeeded before plans were stored compiled get theirs now; a plan
+    # that does not compile is accepted, as the LLM worker does; runs of it fall back to
+    # parsing result_payload and are marked failed with invalid_plan_payload
+    compiled_plan = None
+    if load_compiled_plan(proposal.compiled_plan) is None:
+        try:
+            compiled_plan = precompile_plan(proposal.result_payload)
+        except ValueError as e:
+            logger.warning(f"plan_proposal id={plan_proposal_id} plan does not compile: {e}")
+
+    new_proposal = plan_proposal_repo.set_is_ready_for_test(
+        proposal_id=plan_proposal_id, compiled_plan=compiled_plan
+    )
     return new_proposal
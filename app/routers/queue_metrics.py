@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends
+from starlette.responses import PlainTextResponse
+
+from app.clients.redis_client import InstrumentedBlockingConnectionPool
+from app.dependencies import get_queue_metrics_collector, get_redis_pool
+from app.queue.metrics import (
+    QueueMetricsCollector,
+    StreamMetrics,
+    render_pool_prometheus,
+    render_prometheus,
+)
+from app.schemas.schemas import QueueStreamMetricsResponse
+
+router = APIRouter(tags=["Queue metrics"])
+
+
+@router.get("/queue/metrics", response_model=list[QueueStreamMetricsResponse])
+def get_queue_metrics(
+    collector: QueueMetricsCollector = Depends(get_queue_metrics_collector),
+) -> list[StreamMetrics]:
+    return collector.collect()
+
+
+@router.get("/queue/pool")
+def get_redis_pool_metrics(
+    pool: InstrumentedBlockingConnectionPool = Depends(get_redis_pool),
+) -> dict[str, float]:
+    return pool.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_prometheus_metrics(
+    collector: QueueMetricsCollector = Depends(get_queue_metrics_collector),
+    pool: InstrumentedBlockingConnectionPool = Depends(get_redis_pool),
+) -> PlainTextResponse:
+    return PlainTextResponse(
+        render_prometheus(collector.collect()) + render_pool_prometheus("api", pool.stats()),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -4,12 +4,12 @@ from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException
 from starlette.responses import FileResponse, RedirectResponse, Response
 
-from app.artifacts.keys import screenshot_key, video_key
+from app.artifacts.keys import screenshot_key, trace_key, video_key
 from app.artifacts.storage import ArtifactStorage
 from app.core.config import settings
 from app.dependencies import get_artifact_storage, get_test_run_repo
 from app.repositories.repositories import TestRunRepository
-from app.workers.test_runner.artifacts import screenshot_path, video_path
+from app.workers.test_runner.artifacts import screenshot_path, trace_path, video_path
 
 router = APIRouter(tags=["Test run artifacts"])
 
@@ -80,6 +80,35 @@ def get_test_run_video(
     )
 
 
+@router.get("/test-runs/{run_id}/artifacts/trace")
+def get_test_run_trace(
+    run_id: int,
+    storage: ArtifactStorage = Depends(get_artifact_storage),
+    test_run_repo: TestRunRepository = Depends(get_test_run_repo),
+) -> Response:
+    run = test_run_repo.get_item(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="run does not exists")
+    if not run.trace_name:
+        raise HTTPException(status_code=404, detail="trace not available")
+
+    object_key = _pick_object_key(
+        explicit_key=run.trace_object_key,
+        computed_key=trace_key(run_id, str(run.trace_name)),
+    )
+
+    fallback = trace_path(settings.artifacts_root_dir_path, run_id, str(run.trace_name))
+
+    # open with `npx playwright show-trace <file>` or https://trace.playwright.dev
+    return _maybe_presign_or_local(
+        storage=storage,
+        object_key=object_key,
+        fallback_local_path=fallback,
+        filename=str(run.trace_name),
+        media_type="application/zip",
+    )
+
+
 @router.get("/test-runs/{run_id}/artifacts/screenshot")
 def get_test_run_screenshot(
     run_id: int,
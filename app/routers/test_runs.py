@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from loguru import logger
 
-from app.dependencies import get_redis_publisher, get_test_run_repo, get_uow
+from app.dependencies import (
+    get_admission_controller,
+    get_redis_publisher,
+    get_test_run_repo,
+    get_uow,
+)
 from app.models.enums import PlanProposalStatus
 from app.models.models import TestRun
 from app.query.filters import TestRunListQuery, get_test_run_list_query
+from app.queue.admission import AdmissionController
 from app.queue.redis_queue import RedisPublisher
 from app.repositories.repositories import TestRunRepository
 from app.schemas.schemas import TestRunCreateRequest, TestRunResponse
@@ -23,6 +29,7 @@ def create_test_run(
     payload: TestRunCreateRequest,
     uow: UnitOfWork = Depends(get_uow),
     publisher: RedisPublisher = Depends(get_redis_publisher),
+    admission: AdmissionController = Depends(get_admission_controller),
 ) -> TestRun:
     plan_prop = uow.plan_proposals_repo.get_item(plan_proposal_id)
     if not plan_prop:
@@ -39,6 +46,14 @@ def create_test_run(
             status_code=400, detail=f"plan_proposal {plan_proposal_id} is not marked as ready"
         )
 
+    rejection = admission.check_test_run(uow.test_runs_repo)
+    if rejection:
+        raise HTTPException(
+            status_code=rejection.status_code,
+            detail=rejection.detail,
+            headers={"Retry-After": str(rejection.retry_after_s)},
+        )
+
     ts = uow.test_runs_repo.create(
         plan_proposal_id=plan_proposal_id,
         run_params=payload.run_params,
@@ -48,7 +63,9 @@ def create_test_run(
     uow.commit()
 
     logger.info("Sending run test msg to queue")
-    publisher.publish_test_run({"run_id": ts.id, "placeholders": payload.placeholders})
+    publisher.publish_test_run(
+        {"run_id": ts.id, "placeholders": payload.placeholders, "priority": payload.priority}
+    )
     return ts
 
 
@@ -4,6 +4,7 @@ from urllib.parse import urlparse
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 
+from app.core.types import RunPriority, TraceMode, VideoMode
 from app.models.enums import TestRunStatus
 
 
@@ -55,6 +56,13 @@ class TestCaseListItemResponse(TestCaseResponseBase):
     last_revision_created_at: datetime
 
 
+class PlanProposalCreateRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    # >1: race that many generations and keep the first valid plan (lower tail latency)
+    candidates: int = Field(default=1, ge=1, le=16)
+
+
 class PlanProposalResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -68,6 +76,16 @@ class PlanProposalResponse(BaseModel):
     error: str | None = None
     is_ready_for_test: bool
     ready_for_test_at: datetime | None = None
+    llm_model: str | None = None
+    queue_wait_ms: int | None = None
+    generation_ms: int | None = None
+    prompt_eval_count: int | None = None
+    eval_count: int | None = None
+    repair_attempts: int | None = None
+    repair_tokens: int | None = None
+    speculative_candidates: int | None = None
+    winning_candidate: int | None = None
+    speculative_saved_ms: int | None = None
 
 
 class RunParams(BaseModel):
@@ -76,6 +94,12 @@ class RunParams(BaseModel):
     playwright_headless: bool = True
     playwright_timeout_ms: int = Field(default=30_000, ge=1_000, le=300_000)
     playwright_browser: Literal["chromium", "firefox", "webkit"] = "chromium"
+    # None: the runner's RUNNER_VIDEO_* / RUNNER_TRACE_MODE defaults
+    playwright_video: VideoMode | None = None
+    playwright_video_sample_percent: int | None = Field(default=None, ge=0, le=100)
+    playwright_video_width: int | None = Field(default=None, ge=320, le=1920)
+    playwright_video_height: int | None = Field(default=None, ge=180, le=1080)
+    playwright_trace: TraceMode | None = None
 
 
 class TestRunCreateRequest(BaseModel):
@@ -85,6 +109,7 @@ class TestRunCreateRequest(BaseModel):
     created_by: str | None = Field(default=None, max_length=200)
     placeholders: dict[str, str] = Field(default_factory=dict)
     site_domain: str | None = Field(default=None, max_length=200)
+    priority: RunPriority = "interactive"
 
     @field_validator("site_domain")
     def validate_site_domain(cls, v: str | None) -> str | None:
@@ -105,7 +130,8 @@ class TestRunCreateRequest(BaseModel):
     @model_validator(mode="after")
     def validate_and_fill_run_params(self) -> "TestRunCreateRequest":
         parsed = RunParams.model_validate(self.run_params)
-        self.run_params = parsed.model_dump()
+        # unset optional params stay absent, so the worker applies its defaults
+        self.run_params = parsed.model_dump(exclude_none=True)
         return self
 
 
@@ -125,8 +151,52 @@ class TestRunResponse(BaseModel):
 
     video_object_key: str | None
     screenshot_object_key: str | None
+    trace_name: str | None
+    trace_object_key: str | None
 
     created_by: str | None
     created_at: datetime
     started_at: datetime | None
     finished_at: datetime | None
+
+
+class QueueConsumerMetricsResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    pending: int
+    idle_ms: int
+
+
+class QueueStreamMetricsResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    stream: str
+    group: str
+    length: int
+    lag: int | None
+    pending: int
+    oldest_pending_age_ms: int | None
+    consumers: list[QueueConsumerMetricsResponse]
+
+
+class LlmModelStatsResponse(BaseModel):
+    # None: failed attempts that never recorded a model
+    model: str | None
+    generations: int
+    failed: int
+    prompt_tokens: int
+    eval_tokens: int
+    prompt_tokens_per_s: float
+    eval_tokens_per_s: float
+    generation_ms_p50: float | None
+    generation_ms_p95: float | None
+    queue_wait_ms_p50: float | None
+    queue_wait_ms_p95: float | None
+    load_share: float
+
+
+class LlmStatsResponse(BaseModel):
+    since: datetime
+    until: datetime
+    models: list[LlmModelStatsResponse]
@@ -1,3 +1,6 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
 from types import TracebackType
 from typing import Any
 
@@ -42,3 +45,19 @@ class RunnerDbUnitOfWork(BaseUnitOfWork):
         self.plan_proposals_repo = PlanProposalRepository(self.session)
         self.test_runs_repo = TestRunRepository(self.session)
         return self
+
+
+@asynccontextmanager
+async def uow_in_thread(uow_factory: Callable[[], BaseUnitOfWork]) -> AsyncIterator[Any]:
+    """
+    Same transaction boundaries as `with uow_factory() as uow`; the blocking session
+    calls are moved off the event loop. The session is never used by two threads at once.
+    """
+    uow = await asyncio.to_thread(uow_factory().__enter__)
+    try:
+        yield uow
+    except BaseException as e:
+        await asyncio.to_thread(uow.__exit__, type(e), e, e.__traceback__)
+        raise
+    else:
+        await asyncio.to_thread(uow.__exit__, None, None, None)
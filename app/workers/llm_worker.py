@@ -1,90 +1,398 @@
+import asyncio
 import json
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
 
+import httpx
+import redis
 from loguru import logger
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 from app.core.logging import setup_logger
-from app.llm.ollama_client import LLMClient, OllamaClient
+from app.llm.backend_pool import BackendHealthChecker
+from app.llm.dto import GenerationResult, GenerationStats, SpeculationOutcome
+from app.llm.ollama_client import (
+    KeyedLLMClient,
+    OllamaClient,
+    build_async_http_client,
+    capture_generations,
+    shared_backend_pool,
+    shared_latency_stats,
+    speculate,
+)
+from app.llm.plan_cache import CachingLLMClient, PlanCache
+from app.llm.plan_index import (
+    EmbeddingStore,
+    PlanEmbeddingIndex,
+    SemanticReuseLLMClient,
+    build_plan_index,
+)
+from app.llm.repair import RepairingLLMClient
+from app.llm.warmup import ModelKeepWarm
 from app.models.enums import PlanProposalStatus
 from app.queue.redis_consumer import RedisConsumer
+from app.repositories.dto import PlanProposalMetrics
 from app.utils import utcnow
-from app.workers.db import LlmDbUnitOfWork
+from app.workers.db import LlmDbUnitOfWork, uow_in_thread
+from app.workers.test_runner.renderer import precompile_plan
+
+
+@dataclass(frozen=True)
+class PreparedProposal:
+    proposal_id: int
+    nl_text: str
+    queue_wait_s: float
+    candidates: int = 1
+
+
+def _parse_message(body: bytes) -> int:
+    payload = json.loads(body.decode("utf-8"))
+    return int(payload["proposal_id"])
+
+
+def prepare_proposal(llm_uow: LlmDbUnitOfWork, proposal_id: int) -> PreparedProposal | None:
+    proposal = llm_uow.plan_proposals_repo.get_item(proposal_id)
+    if not proposal:
+        logger.warning(f"LLM Worker: Can't find proposal id={proposal_id}, exit")
+        return None
+
+    if proposal.status in (PlanProposalStatus.succeeded, PlanProposalStatus.failed):
+        logger.warning(
+            f"LLM Worker: Status of proposal id={proposal_id} is {proposal.status}, exit"
+        )
+        return None
+
+    started_at = utcnow()
+    queue_wait_s = max(0.0, (started_at - proposal.created_at).total_seconds())
+    ok = llm_uow.plan_proposals_repo.mark_running(
+        proposal_id, started_at=started_at, queue_wait_ms=round(queue_wait_s * 1000)
+    )
+    if not ok:
+        logger.warning(
+            f"LLM Worker: Can't set status of id={proposal_id} to {PlanProposalStatus.running}, exit"
+        )
+        return None
+
+    rev = llm_uow.test_case_revisions_repo.get_item(proposal.test_case_revision_id)
+    if not rev:
+        logger.warning(
+            f"LLM Worker: Can't set find test_case_revision id={proposal.test_case_revision_id}, exit"
+        )
+        llm_uow.plan_proposals_repo.mark_failed(
+            proposal_id, error="test_case_revision not found", finished_at=utcnow()
+        )
+        return None
+
+    return PreparedProposal(
+        proposal_id=proposal_id,
+        nl_text=rev.nl_text,
+        queue_wait_s=queue_wait_s,
+        candidates=(proposal.request_payload or {}).get("candidates", 1),
+    )
+
+
+def _total(values: Iterable[float | None]) -> int | None:
+    present = [v for v in values if v is not None]
+    return round(sum(present)) if present else None
+
+
+def proposal_metrics(
+    captured: list[GenerationResult],
+    generation_ms: float,
+    speculation: SpeculationOutcome | None = None,
+    model: str | None = None,
+) -> PlanProposalMetrics:
+    """
+    Sums every Ollama call made for the proposal; a cache hit only has generation_ms.
+    model is recorded when no call completed, so a failed attempt still counts against it.
+    """
+    repairs = [r for r in captured if r.repair]
+    raced = speculation if speculation is not None and speculation.candidates > 1 else None
+    return PlanProposalMetrics(
+        llm_model=captured[-1].model if captured else model,
+        generation_ms=round(generation_ms),
+        prompt_eval_count=_total(r.prompt_eval_count for r in captured),
+        eval_count=_total(r.eval_count for r in captured),
+        total_duration_ms=_total(r.total_ms for r in captured),
+        load_duration_ms=_total(r.load_ms for r in captured),
+        prompt_eval_duration_ms=_total(r.prompt_eval_ms for r in captured),
+        eval_duration_ms=_total(r.eval_ms for r in captured),
+        repair_attempts=len(repairs) or None,
+        repair_tokens=_total((r.prompt_eval_count or 0) + (r.eval_count or 0) for r in repairs),
+        speculative_candidates=raced.candidates if raced else None,
+        winning_candidate=raced.winner if raced else None,
+        speculative_saved_ms=_total([raced.saved_ms]) if raced else None,
+    )
+
+
+def record_generated(
+    llm_uow: LlmDbUnitOfWork,
+    proposal_id: int,
+    plan_json: dict[str, Any],
+    metrics: PlanProposalMetrics | None = None,
+) -> None:
+    logger.info(f"LLM Worker: proposal id={proposal_id}, plan_json = {plan_json}")
+    compiled_plan: dict[str, Any] | None = None
+    try:
+        compiled_plan = precompile_plan(plan_json)
+    except ValueError as e:
+        # the proposal still succeeds and can be marked ready; runs fall back to parsing
+        # result_payload and are marked failed with invalid_plan_payload
+        logger.warning(f"LLM Worker: proposal id={proposal_id} plan does not compile: {e}")
+    llm_uow.plan_proposals_repo.mark_ready(
+        proposal_id,
+        result_payload=plan_json,
+        finished_at=utcnow(),
+        metrics=metrics,
+        compiled_plan=compiled_plan,
+    )
+    logger.info(f"LLM Worker: proposal id={proposal_id} is ready")
+
+
+def record_generation_failed(
+    llm_uow: LlmDbUnitOfWork,
+    proposal_id: int,
+    e: Exception,
+    metrics: PlanProposalMetrics | None = None,
+) -> None:
+    logger.error(f"LLM Worker: Can't get json for proposal id={proposal_id}, error {e}")
+    llm_uow.plan_proposals_repo.mark_failed(
+        proposal_id, error=f"ollama_error: {e}", finished_at=utcnow(), metrics=metrics
+    )
 
 
 def handle_message(
     body: bytes,
     llm_uow_factory: Callable[[], LlmDbUnitOfWork],
-    llm_client_factory: Callable[[], LLMClient] = OllamaClient,
+    llm_client_factory: Callable[[], KeyedLLMClient] = OllamaClient,
 ) -> None:
     setup_logger()
-    payload = json.loads(body.decode("utf-8"))
-    proposal_id = int(payload["proposal_id"])
+    proposal_id = _parse_message(body)
 
     logger.info(f"LLM Worker: message for proposal id={proposal_id} received")
     with llm_uow_factory() as llm_uow:
         try:
             ollama = llm_client_factory()
-            proposal = llm_uow.plan_proposals_repo.get_item(proposal_id)
-            if not proposal:
-                logger.warning(f"LLM Worker: Can't find proposal id={proposal_id}, exit")
+            prepared = prepare_proposal(llm_uow, proposal_id)
+            if prepared is None:
                 return
 
-            if proposal.status in (PlanProposalStatus.succeeded, PlanProposalStatus.failed):
-                logger.warning(
-                    f"LLM Worker: Status of proposal id={proposal_id} is {proposal.status}, exit"
-                )
-                return
+            t0 = time.perf_counter()
+            with capture_generations() as captured, speculate(prepared.candidates) as speculation:
+                try:
+                    logger.info(f"LLM Worker: proposal id={proposal_id}, generating plan...")
+                    plan_json = ollama.generate_plan_json(prepared.nl_text)
+                except Exception as e:
+                    generation_ms = (time.perf_counter() - t0) * 1000
+                    metrics = proposal_metrics(
+                        captured, generation_ms, speculation, model=ollama.model
+                    )
+                    record_generation_failed(llm_uow, proposal_id, e, metrics)
+                    return
 
-            ok = llm_uow.plan_proposals_repo.mark_running(proposal_id, started_at=utcnow())
-            if not ok:
-                logger.warning(
-                    f"LLM Worker: Can't set status of id={proposal_id} to {PlanProposalStatus.running}, exit"
-                )
-                return
+            metrics = proposal_metrics(captured, (time.perf_counter() - t0) * 1000, speculation)
+            record_generated(llm_uow, proposal_id, plan_json, metrics)
 
-            rev = llm_uow.test_case_revisions_repo.get_item(proposal.test_case_revision_id)
-            if not rev:
-                logger.warning(
-                    f"LLM Worker: Can't set find test_case_revision id={proposal.test_case_revision_id}, exit"
-                )
-                llm_uow.plan_proposals_repo.mark_failed(
-                    proposal_id, error="test_case_revision not found", finished_at=utcnow()
-                )
+        except Exception as e:
+            logger.error(f"LLM Worker: Unexpected error for proposal id={proposal_id}, error {e}")
+            raise
+
+
+async def handle_message_async(
+    body: bytes,
+    llm_uow_factory: Callable[[], LlmDbUnitOfWork],
+    llm_client: KeyedLLMClient,
+    stats: GenerationStats | None = None,
+) -> None:
+    """
+    Same flow as handle_message; DB calls run in a thread while the generation
+    itself is awaited, so one worker can keep several generations in flight.
+    """
+    stats = stats if stats is not None else GenerationStats()
+    proposal_id = _parse_message(body)
+
+    logger.info(f"LLM Worker: message for proposal id={proposal_id} received")
+    async with uow_in_thread(llm_uow_factory) as llm_uow:
+        try:
+            prepared = await asyncio.to_thread(prepare_proposal, llm_uow, proposal_id)
+            if prepared is None:
                 return
 
-            try:
-                logger.info(f"LLM Worker: proposal id={proposal_id}, generating plan...")
-                plan_json = ollama.generate_plan_json(rev.nl_text)
-                logger.info(f"LLM Worker: proposal id={proposal_id}, plan_json = {plan_json}")
-            except Exception as e:
-                logger.error(f"LLM Worker: Can't get json for proposal id={proposal_id}, error {e}")
-                llm_uow.plan_proposals_repo.mark_failed(
-                    proposal_id, error=f"ollama_error: {e}", finished_at=utcnow()
+            stats.started(prepared.queue_wait_s * 1000)
+            t0 = time.perf_counter()
+            ok = False
+            error: Exception | None = None
+            with capture_generations() as captured, speculate(prepared.candidates) as speculation:
+                try:
+                    plan_json = await llm_client.agenerate_plan_json(prepared.nl_text)
+                    ok = True
+                except Exception as e:
+                    error = e
+            generation_ms = (time.perf_counter() - t0) * 1000
+            stats.finished(generation_ms, ok=ok)
+            logger.info(
+                f"LLM Worker: proposal id={proposal_id}, queue wait {prepared.queue_wait_s * 1000:.0f} ms, "
+                f"generation {generation_ms:.0f} ms, in flight {stats.in_flight}"
+            )
+
+            metrics = proposal_metrics(
+                captured, generation_ms, speculation, model=llm_client.model if error else None
+            )
+            if error is not None:
+                await asyncio.to_thread(
+                    record_generation_failed, llm_uow, proposal_id, error, metrics
                 )
                 return
 
-            llm_uow.plan_proposals_repo.mark_ready(
-                proposal_id, result_payload=plan_json, finished_at=utcnow()
-            )
-            logger.info(f"LLM Worker: proposal id={proposal_id} is ready")
+            await asyncio.to_thread(record_generated, llm_uow, proposal_id, plan_json, metrics)
 
         except Exception as e:
             logger.error(f"LLM Worker: Unexpected error for proposal id={proposal_id}, error {e}")
             raise
 
 
+def _build_llm_client_factory(
+    db_sessionmaker: Callable[[], Session],
+    async_http: httpx.AsyncClient | None = None,
+) -> Callable[[], KeyedLLMClient]:
+    plan_cache: PlanCache | None = None
+    if settings.llm_plan_cache_enabled:
+        plan_cache = PlanCache(
+            redis.Redis.from_url(settings.redis_url, decode_responses=True),
+            ttl_s=settings.llm_plan_cache_ttl_s,
+            lru_size=settings.llm_plan_cache_lru_size,
+        )
+
+    plan_index: PlanEmbeddingIndex | None = None
+    embedding_store: EmbeddingStore | None = None
+    if settings.llm_semantic_reuse_enabled:
+        embedding_store = EmbeddingStore(
+            redis.Redis.from_url(settings.redis_url), model=settings.ollama_embed_model
+        )
+        with LlmDbUnitOfWork(db_sessionmaker()) as llm_uow:
+            rows = llm_uow.plan_proposals_repo.list_succeeded_with_text(
+                settings.llm_semantic_index_size
+            )
+        plan_index = build_plan_index(
+            rows,
+            embedder=OllamaClient(),
+            store=embedding_store,
+            backfill_limit=settings.llm_semantic_backfill_limit,
+        )
+
+    def llm_client_factory() -> KeyedLLMClient:
+        if settings.llm_repair_enabled:
+            client: KeyedLLMClient = RepairingLLMClient(
+                OllamaClient(
+                    async_http=async_http, max_invalid_lines=settings.llm_repair_max_lines
+                ),
+                max_attempts=settings.llm_repair_max_attempts,
+                max_lines=settings.llm_repair_max_lines,
+            )
+        else:
+            client = OllamaClient(async_http=async_http)
+        if plan_index is not None:
+            client = SemanticReuseLLMClient(
+                client,
+                embedder=OllamaClient(),
+                index=plan_index,
+                threshold=settings.llm_semantic_threshold,
+                store=embedding_store,
+            )
+        if plan_cache is not None:
+            return CachingLLMClient(client, plan_cache)
+        return client
+
+    return llm_client_factory
+
+
+def _start_backend_health_checker() -> BackendHealthChecker:
+    checker = BackendHealthChecker(
+        shared_backend_pool(),
+        interval_s=settings.llm_backend_probe_interval_s,
+        stats_log_s=settings.llm_backend_stats_log_s,
+    )
+    checker.start()
+    return checker
+
+
+def _warm_up_model() -> ModelKeepWarm:
+    """Loads the model before the first message is read; keeps it loaded during business hours."""
+    client = OllamaClient()
+    if settings.llm_warmup_enabled:
+        client.warm_up()
+    keep_warm = ModelKeepWarm.from_settings(client.warm_up)
+    keep_warm.start()
+    return keep_warm
+
+
+async def main_concurrent() -> None:
+    """
+    One event loop and one keep-alive http pool; up to llm_concurrency
+    generations in flight, which only helps if Ollama runs with OLLAMA_NUM_PARALLEL >= it.
+    """
+    consumer = RedisConsumer("llm")
+    engine = create_engine(
+        settings.database_url,
+        future=True,
+        pool_size=max(5, settings.llm_concurrency),
+    )
+    db_sessionmaker = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    async_http = build_async_http_client()
+    llm_client = _build_llm_client_factory(db_sessionmaker, async_http)()
+    stats = GenerationStats()
+    checker = _start_backend_health_checker()
+    keep_warm = await asyncio.to_thread(_warm_up_model)
+
+    logger.info("LLM Worker: concurrent mode, concurrency={}", settings.llm_concurrency)
+    try:
+        await consumer.consume_async(
+            lambda msg: handle_message_async(
+                msg, lambda: LlmDbUnitOfWork(db_sessionmaker()), llm_client, stats
+            ),
+            concurrency=settings.llm_concurrency,
+        )
+    finally:
+        logger.info("LLM Worker: generation stats {}", stats.as_dict())
+        logger.info("LLM Worker: backend stats {}", shared_backend_pool().stats())
+        logger.info("LLM Worker: cold/warm latency {}", shared_latency_stats().as_dict())
+        keep_warm.stop()
+        checker.stop()
+        await async_http.aclose()
+
+
 def main() -> None:
+    if settings.llm_concurrency > 1:
+        setup_logger()
+        asyncio.run(main_concurrent())
+        return
+
     consumer = RedisConsumer("llm")
     engine = create_engine(settings.database_url, future=True)
     db_sessionmaker = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
-    consumer.consume(
-        lambda msg: handle_message(
-            msg, lambda: LlmDbUnitOfWork(db_sessionmaker()), lambda: OllamaClient()
-        )
-    )
+    llm_client_factory = _build_llm_client_factory(db_sessionmaker)
+    checker = _start_backend_health_checker()
+    keep_warm = _warm_up_model()
+
+    def _handle(msg: bytes) -> None:
+        handle_message(msg, lambda: LlmDbUnitOfWork(db_sessionmaker()), llm_client_factory)
+
+    try:
+        if settings.llm_batch_size > 1:
+            consumer.consume_batch(
+                _handle, count=settings.llm_batch_size, max_workers=settings.llm_batch_workers
+            )
+        else:
+            consumer.consume(_handle)
+    finally:
+        logger.info("LLM Worker: backend stats {}", shared_backend_pool().stats())
+        logger.info("LLM Worker: cold/warm latency {}", shared_latency_stats().as_dict())
+        keep_warm.stop()
+        checker.stop()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 import asyncio
+import functools
 import json
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
@@ -10,44 +12,126 @@ from sqlalchemy.orm import sessionmaker
 
 from app.artifacts.artifacts_service import RunArtifactsService
 from app.artifacts.factory import build_artifact_storage
+from app.artifacts.storage import ArtifactStorage
 from app.core.config import settings
 from app.core.logging import setup_logger
 from app.models.enums import TestRunStatus
 from app.queue.redis_consumer import RedisConsumer
 from app.utils import utcnow
-from app.workers.db import RunnerDbUnitOfWork
+from app.workers.db import RunnerDbUnitOfWork, uow_in_thread
 from app.workers.test_runner.dto import (
     PlanExecutionFailed,
     PlanPayload,
     PlaywrightRunnerConfig,
     RunTestOutput,
 )
-from app.workers.test_runner.playwright_run import PlaywrightRunner, PlaywrightSessionFactory
-from app.workers.test_runner.renderer import normalize_base_url, parse_placeholders, render_plan
+from app.workers.test_runner.plan_cache import RenderedPlanCache
+from app.workers.test_runner.playwright_run import (
+    BrowserPool,
+    PlaywrightRunner,
+    PlaywrightSessionFactory,
+)
+from app.workers.test_runner.renderer import (
+    normalize_base_url,
+    parse_placeholders,
+    render_compiled_plan,
+    render_plan,
+)
+
+
+def _run_param(run_params: dict[str, Any], key: str, default: Any) -> Any:
+    # runs created before a param existed do not have it; None means the worker default
+    value = run_params.get(key)
+    return default if value is None else value
+
+
+def _runner_config(run_params: dict[str, Any], artifacts_root: Path) -> PlaywrightRunnerConfig:
+    return PlaywrightRunnerConfig(
+        browser_name=str(run_params["playwright_browser"]),
+        timeout_ms=float(run_params["playwright_timeout_ms"]),
+        headless=bool(run_params["playwright_headless"]),
+        artifacts_root=artifacts_root,
+        video_mode=_run_param(run_params, "playwright_video", settings.runner_video_mode),
+        video_sample_percent=int(
+            _run_param(
+                run_params, "playwright_video_sample_percent", settings.runner_video_sample_percent
+            )
+        ),
+        video_size=(
+            int(_run_param(run_params, "playwright_video_width", settings.runner_video_width)),
+            int(_run_param(run_params, "playwright_video_height", settings.runner_video_height)),
+        ),
+        trace_mode=_run_param(run_params, "playwright_trace", settings.runner_trace_mode),
+    )
 
 
 def execute_plan_prod(
     run_params: dict[str, Any], plan: PlanPayload, base_url: str, run_id: int, artifacts_root: Path
 ) -> RunTestOutput:
-    pw_factory = PlaywrightSessionFactory(
-        PlaywrightRunnerConfig(
-            browser_name=str(run_params["playwright_browser"]),
-            timeout_ms=float(run_params["playwright_timeout_ms"]),
-            headless=bool(run_params["playwright_headless"]),
-            artifacts_root=artifacts_root,
-        )
-    )
+    pw_factory = PlaywrightSessionFactory(_runner_config(run_params, artifacts_root))
     return asyncio.run(
         PlaywrightRunner(pw_factory).execute_plan(plan, base_url=base_url, run_id=run_id)
     )
 
 
-def handle_message(
-    body: bytes,
-    run_uow_factory: Callable[[], RunnerDbUnitOfWork],
-    artifacts_service_factory: Callable[[], RunArtifactsService],
-    execute_plan_fn: Callable[..., Any],
-) -> None:
+async def execute_plan_pooled(
+    pool: BrowserPool,
+    run_params: dict[str, Any],
+    plan: PlanPayload,
+    base_url: str,
+    run_id: int,
+    artifacts_root: Path,
+) -> RunTestOutput:
+    pw_factory = PlaywrightSessionFactory(_runner_config(run_params, artifacts_root), pool=pool)
+    return await PlaywrightRunner(pw_factory).execute_plan(plan, base_url=base_url, run_id=run_id)
+
+
+class PooledPlanExecutor:
+    """
+    execute_plan_fn that keeps one event loop for the life of the worker,
+    so the BrowserPool (driver + browsers) is reused between messages.
+    """
+
+    def __init__(self, pool: BrowserPool, *, stats_log_every: int = 50) -> None:
+        self._pool = pool
+        self._loop = asyncio.Runner()
+        self._stats_log_every = stats_log_every
+        self._runs = 0
+
+    def __call__(
+        self,
+        run_params: dict[str, Any],
+        plan: PlanPayload,
+        base_url: str,
+        run_id: int,
+        artifacts_root: Path,
+    ) -> RunTestOutput:
+        try:
+            return self._loop.run(
+                execute_plan_pooled(self._pool, run_params, plan, base_url, run_id, artifacts_root)
+            )
+        finally:
+            self._runs += 1
+            if self._stats_log_every and self._runs % self._stats_log_every == 0:
+                logger.info("Run Test Worker: browser pool stats {}", self._pool.stats.as_dict())
+
+    def close(self) -> None:
+        logger.info("Run Test Worker: browser pool stats {}", self._pool.stats.as_dict())
+        try:
+            self._loop.run(self._pool.close())
+        finally:
+            self._loop.close()
+
+
+@dataclass(frozen=True)
+class PreparedRun:
+    run_id: int
+    run_params: dict[str, Any]
+    plan: PlanPayload
+    base_url: str
+
+
+def _parse_message(body: bytes) -> tuple[int, dict[str, Any]]:
     payload = json.loads(body.decode("utf-8"))
     run_id = int(payload["run_id"])
     logger.info("Run Test Worker: message received run_id={}", run_id)
@@ -56,164 +140,317 @@ def handle_message(
     placeholders = parse_placeholders(placeholders_raw)
     if not placeholders:
         logger.warning("Run Test Worker: using empty placeholders")
-    with run_uow_factory() as run_uow:
+    return run_id, placeholders
+
+
+def prepare_run(
+    run_uow: RunnerDbUnitOfWork,
+    run_id: int,
+    placeholders: dict[str, Any],
+    plan_cache: RenderedPlanCache | None = None,
+) -> PreparedRun | None:
+    run = run_uow.test_runs_repo.get_item(run_id)
+    if not run:
+        logger.warning("Run Test Worker: test_run not found run_id={}", run_id)
+        return None
+
+    if run.status in (TestRunStatus.passed, TestRunStatus.failed):
+        logger.info(
+            "Run Test Worker: test_run already finished run_id={} status={}",
+            run_id,
+            run.status,
+        )
+        return None
+
+    try:
+        base_url = normalize_base_url(run.site_domain or "")
+        logger.info(f"site_domain: {base_url}")
+    except Exception as e:
+        logger.error(f"invalid_site_domain: {e}")
+        run_uow.test_runs_repo.mark_failed(
+            run_id, error=f"invalid_site_domain: {e}", finished_at=utcnow()
+        )
+        return None
+
+    ok = run_uow.test_runs_repo.mark_running(run_id, started_at=utcnow())
+    if not ok:
+        logger.warning("Run Test Worker: cannot mark running run_id={}", run_id)
+        return None
+
+    if plan_cache is not None:
+        cached = plan_cache.get(run.plan_proposal_id, placeholders)
+        if cached is not None:
+            return PreparedRun(
+                run_id=run_id, run_params=run.run_params, plan=cached, base_url=base_url
+            )
+
+    plan_prop = run_uow.plan_proposals_repo.get_item(run.plan_proposal_id)
+    if not plan_prop:
+        logger.error("plan_proposal not found")
+        run_uow.test_runs_repo.mark_failed(
+            run_id, error="plan_proposal not found", finished_at=utcnow()
+        )
+        return None
+
+    try:
+        # the plan stored compiled at success only needs its placeholder values bound
+        compiled = render_compiled_plan(plan_prop.compiled_plan, placeholders)
+    except Exception as e:
+        logger.error(f"params_substitution_error: {e}")
+        run_uow.test_runs_repo.mark_failed(
+            run_id, error=f"params_substitution_error: {e}", finished_at=utcnow()
+        )
+        return None
+    if compiled is not None:
+        plan = PlanPayload.from_compiled(compiled)
+    else:
         try:
-            run = run_uow.test_runs_repo.get_item(run_id)
-            if not run:
-                logger.warning("Run Test Worker: test_run not found run_id={}", run_id)
-                return
+            rendered_dict = render_plan(plan_prop.result_payload, placeholders)
+        except Exception as e:
+            logger.error(f"params_substitution_error: {e}")
+            run_uow.test_runs_repo.mark_failed(
+                run_id, error=f"params_substitution_error: {e}", finished_at=utcnow()
+            )
+            return None
 
-            if run.status in (TestRunStatus.passed, TestRunStatus.failed):
-                logger.info(
-                    "Run Test Worker: test_run already finished run_id={} status={}",
-                    run_id,
-                    run.status,
-                )
-                return
+        try:
+            plan = PlanPayload.from_any(rendered_dict)
+        except Exception as e:
+            logger.error(f"invalid_plan_payload: {e}")
+            run_uow.test_runs_repo.mark_failed(
+                run_id, error=f"invalid_plan_payload: {e}", finished_at=utcnow()
+            )
+            return None
 
-            try:
-                base_url = normalize_base_url(run.site_domain or "")
-                logger.info(f"site_domain: {base_url}")
-            except Exception as e:
-                logger.error(f"invalid_site_domain: {e}")
-                run_uow.test_runs_repo.mark_failed(
-                    run_id, error=f"invalid_site_domain: {e}", finished_at=utcnow()
-                )
-                return
+    if plan_cache is not None:
+        plan_cache.set(plan_prop.id, placeholders, plan)
+    return PreparedRun(run_id=run_id, run_params=run.run_params, plan=plan, base_url=base_url)
 
-            ok = run_uow.test_runs_repo.mark_running(run_id, started_at=utcnow())
-            if not ok:
-                logger.warning("Run Test Worker: cannot mark running run_id={}", run_id)
-                return
 
-            plan_prop = run_uow.plan_proposals_repo.get_item(run.plan_proposal_id)
-            if not plan_prop:
-                logger.error("plan_proposal not found")
-                run_uow.test_runs_repo.mark_failed(
-                    run_id, error="plan_proposal not found", finished_at=utcnow()
-                )
-                return
+def record_passed(
+    run_uow: RunnerDbUnitOfWork,
+    artifacts_service: RunArtifactsService,
+    run_id: int,
+    result: RunTestOutput,
+) -> None:
+    uploaded = artifacts_service.upload_run_artifacts(
+        run_id=run_id,
+        video_name=result.video_name,
+        screenshot_name=result.screenshot_name,
+    )
 
-            try:
-                rendered_dict = render_plan(plan_prop.result_payload, placeholders)
-            except Exception as e:
-                logger.error(f"params_substitution_error: {e}")
-                run_uow.test_runs_repo.mark_failed(
-                    run_id, error=f"params_substitution_error: {e}", finished_at=utcnow()
-                )
-                return
+    run_uow.test_runs_repo.mark_passed(
+        run_id=run_id,
+        result_payload={
+            "final_url": result.final_url,
+            "executed_steps": result.executed_steps,
+            "executed_assertions": result.executed_assertions,
+        },
+        video_name=result.video_name,
+        screenshot_name=result.screenshot_name,
+        video_object_key=uploaded.video_object_key,
+        screenshot_object_key=uploaded.screenshot_object_key,
+        finished_at=utcnow(),
+    )
+    logger.info(
+        "Run Test Worker: finished run_id={} status=passed final_url={}",
+        run_id,
+        result.final_url,
+    )
 
-            try:
-                plan = PlanPayload.from_any(rendered_dict)
-            except Exception as e:
-                logger.error(f"invalid_plan_payload: {e}")
-                run_uow.test_runs_repo.mark_failed(
-                    run_id, error=f"invalid_plan_payload: {e}", finished_at=utcnow()
-                )
+
+def record_failed(
+    run_uow: RunnerDbUnitOfWork,
+    artifacts_service: RunArtifactsService,
+    run_id: int,
+    e: PlanExecutionFailed,
+) -> None:
+    result = e.result
+
+    uploaded = artifacts_service.upload_run_artifacts(
+        run_id=run_id,
+        video_name=result.video_name,
+        screenshot_name=result.screenshot_name,
+        trace_name=result.trace_name,
+    )
+
+    run_uow.test_runs_repo.mark_failed(
+        run_id,
+        error=f"execution_failed: {e}",
+        result_payload={
+            "final_url": result.final_url,
+            "executed_steps": result.executed_steps,
+            "executed_assertions": result.executed_assertions,
+        },
+        finished_at=utcnow(),
+        screenshot_name=result.screenshot_name,
+        video_name=result.video_name,
+        video_object_key=uploaded.video_object_key,
+        screenshot_object_key=uploaded.screenshot_object_key,
+        trace_name=result.trace_name,
+        trace_object_key=uploaded.trace_object_key,
+    )
+    logger.info(
+        "Run Test Worker: finished run_id={} status=failed final_url={}",
+        run_id,
+        result.final_url,
+    )
+
+
+def handle_message(
+    body: bytes,
+    run_uow_factory: Callable[[], RunnerDbUnitOfWork],
+    artifacts_service_factory: Callable[[], RunArtifactsService],
+    execute_plan_fn: Callable[..., Any],
+    plan_cache: RenderedPlanCache | None = None,
+) -> None:
+    run_id, placeholders = _parse_message(body)
+    with run_uow_factory() as run_uow:
+        try:
+            prepared = prepare_run(run_uow, run_id, placeholders, plan_cache)
+            if prepared is None:
                 return
 
             artifacts_service = artifacts_service_factory()
 
             try:
-                """
-                playwright_factory = PlaywrightSessionFactory(
-                    PlaywrightRunnerConfig(
-                        browser_name=str(run.run_params["playwright_browser"]),
-                        timeout_ms=float(run.run_params["playwright_timeout_ms"]),
-                        headless=bool(run.run_params["playwright_headless"]),
-                        artifacts_root=artifacts_service.local_root_dir,
-                    )
-                )
-
-                result = asyncio.run(
-                    PlaywrightRunner(playwright_factory).execute_plan(
-                        plan,
-                        base_url=base_url,
-                        run_id=run_id,
-                    )
-                )
-                """
                 result = execute_plan_fn(
-                    run.run_params, plan, base_url, run_id, artifacts_service.local_root_dir
-                )
-                uploaded = artifacts_service.upload_run_artifacts(
-                    run_id=run_id,
-                    video_name=result.video_name,
-                    screenshot_name=result.screenshot_name,
-                )
-
-                run_uow.test_runs_repo.mark_passed(
-                    run_id=run_id,
-                    result_payload={
-                        "final_url": result.final_url,
-                        "executed_steps": result.executed_steps,
-                        "executed_assertions": result.executed_assertions,
-                    },
-                    video_name=result.video_name,
-                    screenshot_name=result.screenshot_name,
-                    video_object_key=uploaded.video_object_key,
-                    screenshot_object_key=uploaded.screenshot_object_key,
-                    finished_at=utcnow(),
-                )
-                logger.info(
-                    "Run Test Worker: finished run_id={} status=passed final_url={}",
+                    prepared.run_params,
+                    prepared.plan,
+                    prepared.base_url,
                     run_id,
-                    result.final_url,
+                    artifacts_service.local_root_dir,
                 )
-
             except PlanExecutionFailed as e:
-                result = e.result
+                record_failed(run_uow, artifacts_service, run_id, e)
+            else:
+                record_passed(run_uow, artifacts_service, run_id, result)
 
-                uploaded = artifacts_service.upload_run_artifacts(
-                    run_id=run_id,
-                    video_name=result.video_name,
-                    screenshot_name=result.screenshot_name,
-                )
+        except Exception:
+            logger.exception("Run Test Worker: unexpected crash run_id={}", run_id)
+            raise
 
-                run_uow.test_runs_repo.mark_failed(
-                    run_id,
-                    error=f"execution_failed: {e}",
-                    result_payload={
-                        "final_url": result.final_url,
-                        "executed_steps": result.executed_steps,
-                        "executed_assertions": result.executed_assertions,
-                    },
-                    finished_at=utcnow(),
-                    screenshot_name=result.screenshot_name,
-                    video_name=result.video_name,
-                    video_object_key=uploaded.video_object_key,
-                    screenshot_object_key=uploaded.screenshot_object_key,
-                )
-                logger.info(
-                    "Run Test Worker: finished run_id={} status=failed final_url={}",
+
+async def handle_message_async(
+    body: bytes,
+    run_uow_factory: Callable[[], RunnerDbUnitOfWork],
+    artifacts_service_factory: Callable[[], RunArtifactsService],
+    execute_plan_fn: Callable[..., Awaitable[RunTestOutput]],
+    plan_cache: RenderedPlanCache | None = None,
+) -> None:
+    run_id, placeholders = _parse_message(body)
+    async with uow_in_thread(run_uow_factory) as run_uow:
+        try:
+            prepared = await asyncio.to_thread(
+                prepare_run, run_uow, run_id, placeholders, plan_cache
+            )
+            if prepared is None:
+                return
+
+            artifacts_service = artifacts_service_factory()
+
+            try:
+                result = await execute_plan_fn(
+                    prepared.run_params,
+                    prepared.plan,
+                    prepared.base_url,
                     run_id,
-                    result.final_url,
+                    artifacts_service.local_root_dir,
                 )
+            except PlanExecutionFailed as e:
+                await asyncio.to_thread(record_failed, run_uow, artifacts_service, run_id, e)
+            else:
+                await asyncio.to_thread(record_passed, run_uow, artifacts_service, run_id, result)
 
         except Exception:
             logger.exception("Run Test Worker: unexpected crash run_id={}", run_id)
             raise
 
 
+def _build_browser_pool() -> BrowserPool:
+    return BrowserPool(
+        max_contexts_per_browser=settings.runner_browser_max_contexts,
+        max_browsers_per_type=settings.runner_browsers_per_type,
+        max_rss_mb=settings.runner_browser_max_rss_mb,
+    )
+
+
+def _artifacts_service_factory(storage: ArtifactStorage) -> Callable[[], RunArtifactsService]:
+    return lambda: RunArtifactsService(
+        storage=storage,
+        local_root=settings.artifacts_root_dir_path,
+        cleanup_local_after_upload=True,
+    )
+
+
+async def main_concurrent() -> None:
+    """
+    One event loop for the life of the process; up to runner_concurrency plans
+    run at once, each in its own BrowserContext on the shared pool.
+    """
+    consumer = RedisConsumer("test_runner")
+    engine = create_engine(
+        settings.database_url,
+        future=True,
+        pool_size=max(5, settings.runner_concurrency),
+    )
+    db_sessionmaker = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    artifacts_service_factory = _artifacts_service_factory(build_artifact_storage(settings))
+
+    pool = _build_browser_pool()
+    execute_plan_fn = functools.partial(execute_plan_pooled, pool)
+    plan_cache = RenderedPlanCache(settings.runner_plan_cache_size)
+
+    logger.info("Run Test Worker: concurrent mode, concurrency={}", settings.runner_concurrency)
+    try:
+        await consumer.consume_async(
+            lambda msg: handle_message_async(
+                msg,
+                lambda: RunnerDbUnitOfWork(db_sessionmaker()),
+                artifacts_service_factory,
+                execute_plan_fn=execute_plan_fn,
+                plan_cache=plan_cache,
+            ),
+            concurrency=settings.runner_concurrency,
+        )
+    finally:
+        logger.info("Run Test Worker: browser pool stats {}", pool.stats.as_dict())
+        await pool.close()
+
+
 def main() -> None:
     setup_logger()
+    if settings.runner_mode == "concurrent":
+        asyncio.run(main_concurrent())
+        return
+
     consumer = RedisConsumer("test_runner")
     engine = create_engine(settings.database_url, future=True)
     db_sessionmaker = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
-    storage = build_artifact_storage(settings)
-
-    consumer.consume(
-        lambda msg: handle_message(
-            msg,
-            lambda: RunnerDbUnitOfWork(db_sessionmaker()),
-            lambda: RunArtifactsService(
-                storage=storage,
-                local_root=settings.artifacts_root_dir_path,
-                cleanup_local_after_upload=True,
-            ),
-            execute_plan_fn=execute_plan_prod,
+    artifacts_service_factory = _artifacts_service_factory(build_artifact_storage(settings))
+    plan_cache = RenderedPlanCache(settings.runner_plan_cache_size)
+
+    execute_plan_fn: Callable[..., Any] = execute_plan_prod
+    executor: PooledPlanExecutor | None = None
+    if settings.runner_browser_pool_enabled:
+        executor = PooledPlanExecutor(
+            _build_browser_pool(), stats_log_every=settings.runner_pool_stats_log_every
         )
-    )
+        execute_plan_fn = executor
+
+    try:
+        consumer.consume(
+            lambda msg: handle_message(
+                msg,
+                lambda: RunnerDbUnitOfWork(db_sessionmaker()),
+                artifacts_service_factory,
+                execute_plan_fn=execute_plan_fn,
+                plan_cache=plan_cache,
+            )
+        )
+    finally:
+        if executor is not None:
+            executor.close()
 
 
 if __name__ == "__main__":
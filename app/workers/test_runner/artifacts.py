@@ -11,6 +11,11 @@ def run_screenshot_dir(artifacts_root: Path, run_id: int) -> Path:
     return artifacts_root / "screenshots" / str(run_id)
 
 
+def run_trace_dir(artifacts_root: Path, run_id: int) -> Path:
+    """artifacts/traces/<run_id>/"""
+    return artifacts_root / "traces" / str(run_id)
+
+
 def video_path(artifacts_root: Path, run_id: int, video_name: str) -> Path:
     """artifacts/videos/<run_id>/<video_name>"""
     return run_video_dir(artifacts_root, run_id) / video_name
@@ -21,6 +26,11 @@ def screenshot_path(artifacts_root: Path, run_id: int, image_name: str) -> Path:
     return run_screenshot_dir(artifacts_root, run_id) / image_name
 
 
+def trace_path(artifacts_root: Path, run_id: int, trace_name: str) -> Path:
+    """artifacts/traces/<run_id>/<trace_name>"""
+    return run_trace_dir(artifacts_root, run_id) / trace_name
+
+
 def ensure_dir(path: Path) -> Path:
     path.mkdir(parents=True, exist_ok=True)
     return path
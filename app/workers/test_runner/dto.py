@@ -1,13 +1,16 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 from playwright.async_api import Browser, BrowserContext, Page, Playwright
 
-import app.workers.test_runner.patterns as runner_patterns
+from app.core.types import TraceMode, VideoMode
 from app.exceptions import PlanExecutionError
 from app.models.enums import TestRunStatus
+from app.plan.compiler import PlanCompileError
+from app.plan.compiler import compile_plan as compile_plan_ops
+from app.plan.dto import CompiledPlan
 from app.workers.test_runner.validators import _validate_line_no_double_slash_regex
 
 
@@ -22,6 +25,7 @@ class RunTestOutput:
     headless: bool
     video_name: str | None = None
     screenshot_name: str | None = None
+    trace_name: str | None = None
 
 
 @dataclass
@@ -45,6 +49,39 @@ class PlaywrightSession:
 class SessionArtifacts:
     video_name: str | None = None
     screenshot_name: str | None = None
+    trace_name: str | None = None
+    # set by the runner before the session closes; decides whether an on_failure video is kept
+    failed: bool = False
+
+
+@dataclass
+class BrowserPoolStats:
+    hits: int = 0
+    misses: int = 0
+    launches: int = 0
+    recycles: int = 0
+    launch_ms_total: float = 0.0
+    launch_ms_max: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def launch_ms_avg(self) -> float:
+        return self.launch_ms_total / self.launches if self.launches else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "launch_ms_avg": round(self.launch_ms_avg, 1),
+            "launch_ms_max": round(self.launch_ms_max, 1),
+        }
 
 
 @dataclass(frozen=True)
@@ -54,13 +91,34 @@ class PlaywrightRunnerConfig:
     browser_name: str
     artifacts_root: Path
 
+    video_mode: VideoMode = "on_failure"
+    video_sample_percent: int = 10
     video_size: tuple[int, int] = (1280, 720)
+    trace_mode: TraceMode = "off"
+
+
+def compile_plan(steps: list[str], assertions: list[str]) -> CompiledPlan:
+    try:
+        return compile_plan_ops(steps, assertions)
+    except PlanCompileError as e:
+        raise PlanExecutionError(str(e)) from e
 
 
 @dataclass(frozen=True)
 class PlanPayload:
     steps: list[str]
     assertions: list[str]
+    # what the runner executes; compiled from steps/assertions when not given
+    compiled: CompiledPlan | None = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.compiled is None:
+            object.__setattr__(self, "compiled", compile_plan(self.steps, self.assertions))
+
+    @property
+    def ops(self) -> CompiledPlan:
+        assert self.compiled is not None
+        return self.compiled
 
     @classmethod
     def from_any(cls, raw: Any) -> "PlanPayload":
@@ -85,12 +143,21 @@ class PlanPayload:
         if not isinstance(assertions, list) or not all(isinstance(x, str) for x in assertions):
             raise PlanExecutionError("plan_payload.assertions must be list[str]")
 
-        if not any(runner_patterns.RE_GOTO.match(s.strip()) for s in steps):
+        for line in [*steps, *assertions]:
+            _validate_line_no_double_slash_regex(line)
+
+        # one pass over the lines; an unsupported one fails the run before a browser is started
+        compiled = compile_plan(steps, assertions)
+        if not compiled.has_goto():
             raise PlanExecutionError("steps must include at least one page.goto(...)")
 
-        for s in steps:
-            _validate_line_no_double_slash_regex(s)
-        for a in assertions:
-            _validate_line_no_double_slash_regex(a)
+        return cls.from_compiled(compiled)
 
-        return cls(steps=[s.strip() for s in steps], assertions=[a.strip() for a in assertions])
+    @classmethod
+    def from_compiled(cls, compiled: CompiledPlan) -> "PlanPayload":
+        """A plan that was already checked when it was compiled, e.g. the stored one."""
+        return cls(
+            steps=[op.source for op in compiled.steps],
+            assertions=[op.source for op in compiled.assertions],
+            compiled=compiled,
+        )
@@ -0,0 +1,47 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from app.workers.test_runner.dto import PlanPayload
+
+
+def placeholders_key(placeholders: dict[str, str]) -> str:
+    material = json.dumps(placeholders, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class RenderedPlanCache:
+    """
+    In-process LRU of plans ready to execute, keyed by (proposal_id, placeholder set).
+    Matrix runs repeat the same pairs, and a hit skips loading the proposal and rendering.
+    A succeeded proposal's plan never changes, so entries are not invalidated.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._lru: OrderedDict[tuple[int, str], PlanPayload] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, proposal_id: int, placeholders: dict[str, str]) -> PlanPayload | None:
+        key = (proposal_id, placeholders_key(placeholders))
+        with self._lock:
+            plan = self._lru.get(key)
+            if plan is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def set(self, proposal_id: int, placeholders: dict[str, str], plan: PlanPayload) -> None:
+        if self._size <= 0:
+            return
+        key = (proposal_id, placeholders_key(placeholders))
+        with self._lock:
+            self._lru[key] = plan
+            self._lru.move_to_end(key)
+            while len(self._lru) > self._size:
+                self._lru.popitem(last=False)
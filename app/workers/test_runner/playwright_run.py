@@ -1,17 +1,36 @@
+import asyncio
+import contextlib
+import os
 import re
+import time
 import uuid
-from collections.abc import AsyncIterator
+from collections.abc import AsyncIterator, Callable
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from playwright.async_api import Page, Playwright, async_playwright, expect
+from loguru import logger
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    async_playwright,
+    expect,
+)
 
-import app.workers.test_runner.patterns as runner_patterns
 from app.exceptions import PlanExecutionError
 from app.models.enums import TestRunStatus
-from app.workers.test_runner.artifacts import ensure_dir, run_screenshot_dir, run_video_dir
+from app.plan.dto import OpCode, PlanOp
+from app.workers.test_runner.artifacts import (
+    ensure_dir,
+    run_screenshot_dir,
+    run_trace_dir,
+    run_video_dir,
+)
 from app.workers.test_runner.dto import (
+    BrowserPoolStats,
     PlanExecutionFailed,
     PlanPayload,
     PlaywrightRunnerConfig,
@@ -19,11 +38,213 @@ from app.workers.test_runner.dto import (
     RunTestOutput,
     SessionArtifacts,
 )
+from app.workers.test_runner.video import keeps_video, records_video
+
+
+def _get_browser_launcher(p: Playwright, browser_name: str) -> Any:
+    launcher = getattr(p, browser_name, None)
+    if launcher is None:
+        raise PlanExecutionError(f"Unsupported browser: {browser_name}")
+    return launcher
+
+
+def process_tree(root_pid: int | None = None) -> dict[int, int]:
+    """
+    Every descendant of root_pid (this process by default) mapped to its parent pid.
+    Linux only (/proc); empty when it cannot be read.
+    """
+    root_pid = root_pid or os.getpid()
+    parents: dict[int, int] = {}
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            tasks = list(Path(f"/proc/{pid}/task").iterdir())
+            children = [int(c) for task in tasks for c in (task / "children").read_text().split()]
+        except OSError:
+            # exited meanwhile, or no /proc
+            continue
+        for child in children:
+            if child not in parents:
+                parents[child] = pid
+                stack.append(child)
+    return parents
+
+
+def process_tree_rss_mb(root_pid: int) -> float | None:
+    """RSS of root_pid and all of its descendants, in MB; None when it cannot be measured."""
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total_pages = 0
+    measured = False
+    for pid in (root_pid, *process_tree(root_pid)):
+        try:
+            total_pages += int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        measured = True
+    return total_pages * page_size / (1024 * 1024) if measured else None
+
+
+@dataclass
+class PooledBrowser:
+    key: tuple[str, bool]
+    browser: Browser
+    contexts_served: int = 0
+    active_contexts: int = 0
+    retired: bool = False
+    # root process of this browser, when it could be told apart at launch
+    pid: int | None = None
+
+
+class BrowserPool:
+    """
+    One playwright driver per process and a small set of browsers per (browser_name, headless).
+    Runs lease a browser and open their own BrowserContext on it; the browser itself stays up
+    and is recycled after max_contexts_per_browser contexts or when its own process tree
+    grows above max_rss_mb.
+
+    Must be used from a single long-lived event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_contexts_per_browser: int = 100,
+        max_browsers_per_type: int = 1,
+        max_rss_mb: int = 0,
+        playwright_factory: Callable[[], Any] = async_playwright,
+        rss_probe: Callable[[int], float | None] = process_tree_rss_mb,
+        process_probe: Callable[[], dict[int, int]] = process_tree,
+    ) -> None:
+        self._max_contexts = max_contexts_per_browser
+        self._max_browsers = max(1, max_browsers_per_type)
+        self._max_rss_mb = max_rss_mb
+        self._playwright_factory = playwright_factory
+        self._rss_probe = rss_probe
+        self._process_probe = process_probe
+
+        self._playwright: Playwright | None = None
+        self._browsers: dict[tuple[str, bool], list[PooledBrowser]] = {}
+        self._lock = asyncio.Lock()
+        self.stats = BrowserPoolStats()
+
+    async def _driver(self) -> Playwright:
+        if self._playwright is None:
+            self._playwright = await self._playwright_factory().start()
+        return self._playwright
+
+    async def _launch(self, key: tuple[str, bool]) -> PooledBrowser:
+        p = await self._driver()
+        launcher = _get_browser_launcher(p, key[0])
+
+        # launches are serialized by self._lock, so the processes that appear belong to
+        # this browser; its root is the one whose parent is not new
+        before = self._process_probe() if self._max_rss_mb > 0 else {}
+        started = time.perf_counter()
+        browser = await launcher.launch(headless=key[1])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        pid = None
+        if self._max_rss_mb > 0:
+            new = {c: p for c, p in self._process_probe().items() if c not in before}
+            roots = [c for c, p in new.items() if p not in new]
+            if len(roots) == 1:
+                pid = roots[0]
+            else:
+                logger.warning("Browser pool: cannot tell {} process apart, rss unchecked", key[0])
+
+        self.stats.launches += 1
+        self.stats.launch_ms_total += elapsed_ms
+        self.stats.launch_ms_max = max(self.stats.launch_ms_max, elapsed_ms)
+        logger.info(
+            "Browser pool: launched {} headless={} in {:.0f} ms", key[0], key[1], elapsed_ms
+        )
+        return PooledBrowser(key=key, browser=browser, pid=pid)
+
+    async def acquire(self, browser_name: str, *, headless: bool) -> PooledBrowser:
+        key = (browser_name, headless)
+        async with self._lock:
+            slots = self._browsers.setdefault(key, [])
+            for b in slots:
+                if not b.retired and not b.browser.is_connected():
+                    b.retired = True
+            # retired browsers stay in slots until release() closes them with their last
+            # context, so close() still reaches the ones with contexts open
+            for b in [b for b in slots if b.retired and b.active_contexts == 0]:
+                slots.remove(b)
+                self.stats.recycles += 1
+                await self._close_browser(b)
+            available = [b for b in slots if not b.retired]
+
+            pooled = min(available, key=lambda b: b.active_contexts, default=None)
+            if pooled is not None and (
+                pooled.active_contexts == 0 or len(available) >= self._max_browsers
+            ):
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+                pooled = await self._launch(key)
+                slots.append(pooled)
+
+            pooled.active_contexts += 1
+            pooled.contexts_served += 1
+            if pooled.contexts_served >= self._max_contexts:
+                pooled.retired = True
+            return pooled
+
+    async def release(self, pooled: PooledBrowser) -> None:
+        async with self._lock:
+            pooled.active_contexts -= 1
+
+            if not pooled.retired and self._max_rss_mb > 0 and pooled.pid is not None:
+                rss_mb = self._rss_probe(pooled.pid)
+                if rss_mb is not None and rss_mb > self._max_rss_mb:
+                    logger.info(
+                        "Browser pool: rss {:.0f} MB > {} MB, recycling {}",
+                        rss_mb,
+                        self._max_rss_mb,
+                        pooled.key[0],
+                    )
+                    pooled.retired = True
+
+            if pooled.retired and pooled.active_contexts == 0:
+                slots = self._browsers.get(pooled.key, [])
+                if pooled in slots:
+                    slots.remove(pooled)
+                self.stats.recycles += 1
+                await self._close_browser(pooled)
+
+    @asynccontextmanager
+    async def lease(
+        self, browser_name: str, *, headless: bool
+    ) -> AsyncIterator[tuple[Playwright, Browser]]:
+        pooled = await self.acquire(browser_name, headless=headless)
+        try:
+            yield await self._driver(), pooled.browser
+        finally:
+            await self.release(pooled)
+
+    async def _close_browser(self, pooled: PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning("Browser pool: failed to close {}: {}", pooled.key[0], e)
+
+    async def close(self) -> None:
+        async with self._lock:
+            for slots in self._browsers.values():
+                for pooled in slots:
+                    await self._close_browser(pooled)
+            self._browsers.clear()
+
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
 
 
 class PlaywrightSessionFactory:
-    def __init__(self, cfg: PlaywrightRunnerConfig) -> None:
+    def __init__(self, cfg: PlaywrightRunnerConfig, pool: BrowserPool | None = None) -> None:
         self._cfg = cfg
+        self._pool = pool
 
     @property
     def browser_name(self) -> str:
@@ -57,12 +278,6 @@ class PlaywrightSessionFactory:
         except Exception:
             return None
 
-    def _get_browser_launcher(self, p: Playwright) -> Any:
-        launcher = getattr(p, self._cfg.browser_name, None)
-        if launcher is None:
-            raise PlanExecutionError(f"Unsupported browser: {self._cfg.browser_name}")
-        return launcher
-
     @asynccontextmanager
     async def session(
         self,
@@ -70,133 +285,163 @@ class PlaywrightSessionFactory:
         base_url: str,
         run_id: int,
     ) -> AsyncIterator[tuple[PlaywrightSession, SessionArtifacts]]:
+        if self._pool is not None:
+            lease = self._pool.lease(self._cfg.browser_name, headless=self._cfg.headless)
+            async with (
+                lease as (p, browser),
+                self._context_session(p, browser, base_url=base_url, run_id=run_id) as out,
+            ):
+                yield out
+            return
+
         async with async_playwright() as p:
-            launcher = self._get_browser_launcher(p)
+            launcher = _get_browser_launcher(p, self._cfg.browser_name)
             browser = await launcher.launch(headless=self._cfg.headless)
+            try:
+                async with self._context_session(
+                    p, browser, base_url=base_url, run_id=run_id
+                ) as out:
+                    yield out
+            finally:
+                await browser.close()
 
-            context_kwargs: dict[str, Any] = {"base_url": base_url}
-
-            if self._cfg.artifacts_root:
-                video_dir = ensure_dir(run_video_dir(self._cfg.artifacts_root, run_id))
-                context_kwargs["record_video_dir"] = str(video_dir)
-                context_kwargs["record_video_size"] = {
-                    "width": self._cfg.video_size[0],
-                    "height": self._cfg.video_size[1],
-                }
+    @asynccontextmanager
+    async def _context_session(
+        self,
+        p: Playwright,
+        browser: Browser,
+        *,
+        base_url: str,
+        run_id: int,
+    ) -> AsyncIterator[tuple[PlaywrightSession, SessionArtifacts]]:
+        context_kwargs: dict[str, Any] = {"base_url": base_url}
+
+        video_dir: Path | None = None
+        if self._cfg.artifacts_root and records_video(
+            self._cfg.video_mode, sample_percent=self._cfg.video_sample_percent, run_id=run_id
+        ):
+            video_dir = ensure_dir(run_video_dir(self._cfg.artifacts_root, run_id))
+            context_kwargs["record_video_dir"] = str(video_dir)
+            context_kwargs["record_video_size"] = {
+                "width": self._cfg.video_size[0],
+                "height": self._cfg.video_size[1],
+            }
+
+        context = await browser.new_context(**context_kwargs)
+        tracing = bool(self._cfg.artifacts_root) and self._cfg.trace_mode == "on_failure"
+        if tracing:
+            await context.tracing.start(screenshots=True, snapshots=True)
+        page = await context.new_page()
+        page.set_default_timeout(self._cfg.timeout_ms)
+
+        artifacts = SessionArtifacts()
+        session = PlaywrightSession(playwright=p, browser=browser, context=context, page=page)
 
-            context = await browser.new_context(**context_kwargs)
-            page = await context.new_page()
-            page.set_default_timeout(self._cfg.timeout_ms)
+        try:
+            yield session, artifacts
+        finally:
+            if tracing:
+                artifacts.trace_name = await self._stop_tracing(context, artifacts, run_id=run_id)
 
-            artifacts = SessionArtifacts()
-            session = PlaywrightSession(playwright=p, browser=browser, context=context, page=page)
+            video = page.video
+            keep = video is not None and keeps_video(self._cfg.video_mode, failed=artifacts.failed)
 
             try:
-                yield session, artifacts
+                await page.close()
             finally:
-                video = page.video
-
-                try:
-                    await page.close()
-                finally:
-                    if video is not None:
-                        try:
-                            artifacts.video_name = Path(await video.path()).name
-                        except Exception:
-                            artifacts.video_name = None
-
-                    await context.close()
-                    await browser.close()
+                if video is not None and keep:
+                    try:
+                        artifacts.video_name = Path(await video.path()).name
+                    except Exception:
+                        artifacts.video_name = None
+
+                await context.close()
+
+                if video is not None and not keep:
+                    # the recording is finished once its context is closed; drop it rather than upload it
+                    with contextlib.suppress(Exception):
+                        await video.delete()
+                    if video_dir is not None:
+                        with contextlib.suppress(OSError):
+                            video_dir.rmdir()
+
+    async def _stop_tracing(
+        self, context: BrowserContext, artifacts: SessionArtifacts, *, run_id: int
+    ) -> str | None:
+        """Writes the trace zip for a failed run; a passing run's trace is discarded unwritten."""
+        try:
+            if not artifacts.failed:
+                await context.tracing.stop()
+                return None
+            filename = f"{uuid.uuid4()}.zip"
+            trace_dir = ensure_dir(run_trace_dir(self._cfg.artifacts_root, run_id))
+            await context.tracing.stop(path=str(trace_dir / filename))
+            return filename
+        except Exception as e:
+            logger.warning("Playwright trace: failed to stop run_id={}: {}", run_id, e)
+            return None
 
 
 class PlaywrightRunner:
     def __init__(self, session_factory: PlaywrightSessionFactory) -> None:
         self._sf = session_factory
 
-    async def _run_step(self, step: str, page: Any) -> str | None:
-        s = step.strip()
-
-        m = runner_patterns.RE_GOTO.match(s)
-        if m:
-            await page.goto(m.group("url"))
-            return s
-
-        m = runner_patterns.RE_FILL.match(s)
-        if m:
-            await page.fill(m.group("sel"), m.group("val"))
-            return "await page.fill('<***>', '<***>')"
-
-        m = runner_patterns.RE_CLICK.match(s)
-        if m:
-            await page.click(m.group("sel"))
-            return s
-
-        m = runner_patterns.RE_WAIT_SEL.match(s)
-        if m:
-            await page.wait_for_selector(m.group("sel"))
-            return s
-
-        m = runner_patterns.RE_WAIT_URL_STR.match(s)
-        if m:
-            await page.wait_for_url(m.group("url"))
-            return s
-
-        m = runner_patterns.RE_WAIT_URL_RE.match(s)
-        if m:
-            await page.wait_for_url(re.compile(m.group("pat")))
-            return s
-
-        return None
-
-    async def _run_assertion(self, assertion: str, page: Any) -> str | None:
-        a = assertion.strip()
-
-        m = runner_patterns.RE_EXPECT_URL_STR.match(a)
-        if m:
-            await expect(page).to_have_url(m.group("url"))
-            return a
-
-        m = runner_patterns.RE_EXPECT_URL_RE.match(a)
-        if m:
-            await expect(page).to_have_url(re.compile(m.group("pat")))
-            return a
-
-        m = runner_patterns.RE_EXPECT_VISIBLE.match(a)
-        if m:
-            await expect(page.locator(m.group("sel"))).to_be_visible()
-            return a
-
-        m = runner_patterns.RE_EXPECT_CONTAINS.match(a)
-        if m:
-            await expect(page.locator(m.group("sel"))).to_contain_text(m.group("text"))
-            return a
-
-        return None
+    async def _exec_step(self, op: PlanOp, page: Any) -> str:
+        """Runs a compiled step; returns the line as it is recorded in executed_steps."""
+        match op.op:
+            case OpCode.goto:
+                await page.goto(op.args[0])
+            case OpCode.fill:
+                await page.fill(op.args[0], op.args[1])
+                return "await page.fill('<***>', '<***>')"
+            case OpCode.click:
+                await page.click(op.args[0])
+            case OpCode.wait_selector:
+                await page.wait_for_selector(op.args[0])
+            case OpCode.wait_url:
+                await page.wait_for_url(op.args[0])
+            case OpCode.wait_url_regex:
+                await page.wait_for_url(re.compile(op.args[0]))
+            case _:
+                raise PlanExecutionError(f"not a step: {op.source}")
+        return op.source
+
+    async def _exec_assertion(self, op: PlanOp, page: Any) -> str:
+        match op.op:
+            case OpCode.expect_url:
+                await expect(page).to_have_url(op.args[0])
+            case OpCode.expect_url_regex:
+                await expect(page).to_have_url(re.compile(op.args[0]))
+            case OpCode.expect_visible:
+                await expect(page.locator(op.args[0])).to_be_visible()
+            case OpCode.expect_text:
+                await expect(page.locator(op.args[0])).to_contain_text(op.args[1])
+            case _:
+                raise PlanExecutionError(f"not an assertion: {op.source}")
+        return op.source
 
     async def execute_plan(self, plan: PlanPayload, *, base_url: str, run_id: int) -> RunTestOutput:
         executed_steps: list[str] = []
         executed_assertions: list[str] = []
         final_url: str = ""
+        error: Exception | None = None
 
         async with self._sf.session(base_url=base_url, run_id=run_id) as (s, artifacts):
             page = s.page
 
             try:
-                for i, raw in enumerate(plan.steps, start=1):
-                    executed_step = await self._run_step(raw, page)
-                    if not executed_step:
-                        raise PlanExecutionError(f"Unsupported step #{i}: {raw}")
-                    executed_steps.append(executed_step)
-
-                for i, raw in enumerate(plan.assertions, start=1):
-                    executed_assertion = await self._run_assertion(raw, page)
-                    if not executed_assertion:
-                        raise PlanExecutionError(f"Unsupported assertion #{i}: {raw}")
-                    executed_assertions.append(executed_assertion)
+                # the plan was compiled when it was loaded; no pattern matching here
+                for op in plan.ops.steps:
+                    executed_steps.append(await self._exec_step(op, page))
+
+                for op in plan.ops.assertions:
+                    executed_assertions.append(await self._exec_assertion(op, page))
 
                 final_url = page.url
 
             except Exception as e:
+                error = e
+                artifacts.failed = True
                 try:
                     artifacts.screenshot_name = await self._sf.make_screenshot(
                         page=page, run_id=run_id
@@ -209,18 +454,21 @@ class PlaywrightRunner:
                 except Exception:
                     final_url = ""
 
-                failed = RunTestOutput(
-                    status=TestRunStatus.failed,
-                    final_url=final_url,
-                    executed_steps=executed_steps,
-                    executed_assertions=executed_assertions,
-                    timeout_ms=self._sf.timeout_ms,
-                    browser=self._sf.browser_name,
-                    headless=self._sf.headless,
-                    video_name=artifacts.video_name,
-                    screenshot_name=artifacts.screenshot_name,
-                )
-                raise PlanExecutionFailed(result=failed, original_exc=e) from e
+        # built after the session closed: the video name is only known then
+        if error is not None:
+            failed = RunTestOutput(
+                status=TestRunStatus.failed,
+                final_url=final_url,
+                executed_steps=executed_steps,
+                executed_assertions=executed_assertions,
+                timeout_ms=self._sf.timeout_ms,
+                browser=self._sf.browser_name,
+                headless=self._sf.headless,
+                video_name=artifacts.video_name,
+                screenshot_name=artifacts.screenshot_name,
+                trace_name=artifacts.trace_name,
+            )
+            raise PlanExecutionFailed(result=failed, original_exc=error) from error
 
         return RunTestOutput(
             status=TestRunStatus.passed,
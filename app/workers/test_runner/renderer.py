@@ -1,9 +1,21 @@
+import functools
 import json
 import re
+from collections.abc import Callable
 from typing import Any
 from urllib.parse import urlparse
 
 import app.workers.test_runner.patterns as runner_patterns
+from app.plan.compiler import (
+    PLACEHOLDER_TOKEN_RE,
+    PlanCompileError,
+    compile_assertion,
+    compile_plan,
+    compile_step,
+    dump_compiled_plan,
+    load_compiled_plan,
+)
+from app.plan.dto import CompiledPlan, PlanOp
 
 
 def normalize_base_url(site_domain: str) -> str:
@@ -32,13 +44,42 @@ def _safe_placeholder_keys(placeholders: dict[str, str]) -> list[str]:
     return list(placeholders.keys())
 
 
-def apply_placeholders(text: str, placeholders: dict[str, str]) -> str:
-    for k, v in placeholders.items():
-        text = text.replace(k, v)
+# any <...> run; a <placeholder> key is found by looking the match up, not by its own alternative
+_TOKEN_PATTERN = r"<[^<>]+>"
+
+
+@functools.lru_cache(maxsize=256)
+def _substitution_re(keys: tuple[str, ...]) -> re.Pattern[str]:
+    # other keys (plain text) are tried first, longest first so a prefix does not shadow a key
+    literal = [k for k in keys if k and not re.fullmatch(_TOKEN_PATTERN, k)]
+    alternatives = [re.escape(k) for k in sorted(literal, key=len, reverse=True)]
+    return re.compile("|".join([*alternatives, _TOKEN_PATTERN]))
+
+
+def _substitute(text: str, placeholders: dict[str, str], pattern: re.Pattern[str]) -> str:
+    def replace(m: re.Match[str]) -> str:
+        found = m.group()
+        value = placeholders.get(found)
+        if value is not None:
+            return value
+        if runner_patterns.PLACEHOLDER_RE.fullmatch(found):
+            raise ValueError("unresolved placeholders remain after substitution")
+        return found
 
-    if runner_patterns.PLACEHOLDER_RE.search(text):
-        raise ValueError("unresolved placeholders remain after substitution")
-    return text
+    return pattern.sub(replace, text)
+
+
+def _substituter(placeholders: dict[str, str]) -> Callable[[str], str]:
+    """
+    One pass per line: keys are replaced and leftover <placeholders> rejected by a single
+    pattern, compiled once per key set. Substituted values are not scanned again.
+    """
+    pattern = _substitution_re(tuple(placeholders))
+    return lambda text: _substitute(text, placeholders, pattern)
+
+
+def apply_placeholders(text: str, placeholders: dict[str, str]) -> str:
+    return _substituter(placeholders)(text)
 
 
 def parse_placeholders(placeholders_raw: Any) -> dict[str, Any]:
@@ -66,7 +107,9 @@ def parse_placeholders(placeholders_raw: Any) -> dict[str, Any]:
     return out
 
 
-def render_plan(plan_payload: Any, placeholders: dict[str, str]) -> dict[str, Any]:
+def render_plan(
+    plan_payload: Any, placeholders: dict[str, str], *, resolve: bool = True
+) -> dict[str, Any]:
     if isinstance(plan_payload, str):
         plan_payload = json.loads(plan_payload)
 
@@ -81,15 +124,70 @@ def render_plan(plan_payload: Any, placeholders: dict[str, str]) -> dict[str, An
     if not isinstance(assertions, list) or not all(isinstance(x, str) for x in assertions):
         raise ValueError("plan_payload.assertions must be list[str]")
 
-    steps2 = []
-    for s in steps:
-        s = apply_placeholders(s, placeholders)
-        s = normalize_js_regex_url(s)
-        steps2.append(s)
-
-    assertions2 = []
-    for a in assertions:
-        a = apply_placeholders(a, placeholders)
-        a = normalize_js_regex_url(a)
-        assertions2.append(a)
-    return {"steps": steps2, "assertions": assertions2}
+    if resolve:
+        substitute = _substituter(placeholders)
+        steps = [substitute(s) for s in steps]
+        assertions = [substitute(a) for a in assertions]
+    return {
+        "steps": [normalize_js_regex_url(s) for s in steps],
+        "assertions": [normalize_js_regex_url(a) for a in assertions],
+    }
+
+
+def precompile_plan(plan_payload: Any) -> dict[str, Any]:
+    """
+    The succeeded plan with placeholders left in, checked the way PlanPayload.from_any
+    checks a rendered one, in its stored form. Runs bind placeholders into it instead
+    of rendering, parsing and validating result_payload again; only the lines a value
+    is bound into are checked again, see _bind.
+    """
+    rendered = render_plan(plan_payload, {}, resolve=False)
+    steps, assertions = rendered["steps"], rendered["assertions"]
+    for line in [*steps, *assertions]:
+        if runner_patterns.BAD_DOUBLE_SLASH_URL.search(line):
+            raise ValueError(f"Invalid regex delimiter //...// in: {line}")
+
+    compiled = compile_plan(steps, assertions)
+    if not compiled.has_goto():
+        raise ValueError("steps must include at least one page.goto(...)")
+    return dump_compiled_plan(compiled)
+
+
+def _bind(op: PlanOp, placeholders: dict[str, str], kind: str, number: int) -> PlanOp:
+    if not op.placeholders:
+        return op
+    # only the tokens this op indexes; the same single pass as render_plan rejects the rest
+    substitute = _substituter({t: placeholders[t] for t in op.placeholders if t in placeholders})
+    # a value can bring in a //...// regex or a quote that changes how the line parses,
+    # so the bound line goes through what render_plan and PlanPayload.from_any do to it
+    line = normalize_js_regex_url(substitute(op.source))
+    if runner_patterns.BAD_DOUBLE_SLASH_URL.search(line):
+        raise ValueError(f"Invalid regex delimiter //...// in: {line}")
+    bound = compile_step(line) if kind == "step" else compile_assertion(line)
+    if bound is None:
+        raise PlanCompileError(f"Unsupported {kind} #{number}: {line}")
+    return bound._replace(placeholders=())
+
+
+def render_compiled_plan(stored: Any, placeholders: dict[str, str]) -> CompiledPlan | None:
+    """
+    Binds placeholder values into the ops that index them and checks the lines they
+    change the way a rendered plan is checked; raises ValueError. None when there is no
+    usable stored plan, or a key is not a <...> token (those are substituted as plain
+    text anywhere in a line, which only render_plan does); callers then use render_plan.
+    """
+    compiled = load_compiled_plan(stored)
+    if compiled is None or not all(PLACEHOLDER_TOKEN_RE.fullmatch(k) for k in placeholders):
+        return None
+    bound = CompiledPlan(
+        steps=tuple(
+            _bind(op, placeholders, "step", i) for i, op in enumerate(compiled.steps, start=1)
+        ),
+        assertions=tuple(
+            _bind(op, placeholders, "assertion", i)
+            for i, op in enumerate(compiled.assertions, start=1)
+        ),
+    )
+    if not bound.has_goto():
+        raise ValueError("steps must include at least one page.goto(...)")
+    return bound
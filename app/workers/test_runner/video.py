@@ -0,0 +1,16 @@
+import zlib
+
+from app.core.types import VideoMode
+
+
+def records_video(mode: VideoMode, *, sample_percent: int, run_id: int) -> bool:
+    if mode == "off":
+        return False
+    if mode == "sampled":
+        # keyed by run_id, so a retried message makes the same choice
+        return zlib.crc32(str(run_id).encode("ascii")) % 100 < sample_percent
+    return True
+
+
+def keeps_video(mode: VideoMode, *, failed: bool) -> bool:
+    return failed or mode != "on_failure"
@@ -4,7 +4,9 @@ from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock, PropertyMock
 
+import fakeredis
 import pytest
+import redis
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -18,6 +20,7 @@ from app.dependencies import get_db, get_redis_publisher
 from app.main import app
 from app.models.models import PlanProposal, TestCase, TestCaseRevision, TestRun
 from app.workers.db import LlmDbUnitOfWork, RunnerDbUnitOfWork
+from tests.workers.helper_llm_worker import FakeOllama
 
 
 @pytest.fixture(scope="session")
@@ -94,6 +97,18 @@ def publisher():
     return FakeRedisPublisher()
 
 
+@pytest.fixture()
+def fake_redis(monkeypatch):
+    """One fakeredis server; clients made with redis.Redis.from_url (RedisConsumer) connect to it."""
+    server = fakeredis.FakeServer()
+
+    def from_url(cls, url, **kwargs):
+        return fakeredis.FakeRedis(server=server, **kwargs)
+
+    monkeypatch.setattr(redis.Redis, "from_url", classmethod(from_url))
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
 class FakeArtifactStorage:
     def __init__(self, *, presign_url: str | None = None, local_root: Path | None = None):
         self._presign_url = presign_url
@@ -137,6 +152,20 @@ def runner_uow_factory(db_session):
     return lambda: RunnerDbUnitOfWork(db_session)
 
 
+@pytest.fixture()
+def fake_ollama():
+    servers: list[FakeOllama] = []
+
+    def start(delay_s: float = 0.0, load_ms: float = 0.0) -> FakeOllama:
+        server = FakeOllama(delay_s, load_ms)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
 def create_test_case(
         client: TestClient,
         payload: dict,
@@ -310,7 +339,9 @@ class FakeSessionFactory:
     async def session(self, *, base_url: str, run_id: int):
         # emulate PlaywrightSession + SessionArtifacts objects
         s = SimpleNamespace(page=self._page)
-        artifacts = SimpleNamespace(video_name=self._video_name, screenshot_name=None)
+        artifacts = SimpleNamespace(
+            video_name=self._video_name, screenshot_name=None, trace_name=None, failed=False
+        )
         yield s, artifacts
 
 
@@ -341,12 +372,15 @@ def artifacts_service_factory(tmp_path):
         )
 
         svc.upload_calls = []
+        svc.trace_calls = []
 
-        def fake_upload_run_artifacts(*, run_id, video_name, screenshot_name):
+        def fake_upload_run_artifacts(*, run_id, video_name, screenshot_name, trace_name=None):
             svc.upload_calls.append((run_id, video_name, screenshot_name))
+            svc.trace_calls.append((run_id, trace_name))
             return SimpleNamespace(
                 video_object_key="obj/video.webm",
                 screenshot_object_key="obj/shot.png",
+                trace_object_key="obj/trace.zip" if trace_name else None,
             )
 
         svc.upload_run_artifacts = fake_upload_run_artifacts
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+import pytest
+
+from app.dependencies import get_admission_controller
+from app.main import app
+from app.models.enums import TestRunStatus
+from app.queue.admission import AdmissionController
+from app.queue.dto import AdmissionLimits
+from app.utils import utcnow
+from tests.conftest import make_test_case_revision_proposal, make_test_run
+from tests.data.data_proposals import PROPOSAL_DATA_SUCCESS_READY_1
+from tests.data.data_test_case import TEST_CASE_REQUEST_1
+from tests.data.data_test_run import TEST_RUN_DATA_CREATE_1, TEST_RUN_REQUEST_1
+
+
+class FakeLagCollector:
+    def __init__(self, lag: int | None):
+        self.lag = lag
+
+    def group_lag(self, stream: str, group: str) -> int | None:
+        return self.lag
+
+
+def _controller(lag: int | None, *, max_lag: int = 10, max_active: int = 100) -> AdmissionController:
+    limits = AdmissionLimits(streams=("s",), group="g", max_lag=max_lag, max_active=max_active)
+    return AdmissionController(
+        FakeLagCollector(lag),
+        enabled=True,
+        drain_window_s=100,
+        retry_after_max_s=600,
+        test_runs=limits,
+        plan_proposals=limits,
+    )
+
+
+@pytest.fixture()
+def ready_proposal(db_session):
+    _, proposal = make_test_case_revision_proposal(
+        db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1
+    )
+    return proposal
+
+
+def test_create_test_run_admitted_under_limits(client, ready_proposal, publisher):
+    app.dependency_overrides[get_admission_controller] = lambda: _controller(lag=3)
+
+    r = client.post(f"/plan-proposals/{ready_proposal.id}/test-runs", json=TEST_RUN_REQUEST_1)
+    assert r.status_code == 202, r.text
+    assert len(publisher.test_run_calls) == 1
+
+
+def test_create_test_run_429_with_retry_after_from_drain_rate(
+    client, db_session, ready_proposal, publisher
+):
+    # 10 runs finished within the 100s window -> 0.1 runs/s
+    for _ in range(10):
+        make_test_run(
+            db_session,
+            plan_proposal_id=ready_proposal.id,
+            status=TestRunStatus.passed,
+            finished_at=utcnow() - timedelta(seconds=10),
+            **TEST_RUN_DATA_CREATE_1,
+        )
+    app.dependency_overrides[get_admission_controller] = lambda: _controller(lag=14)
+
+    r = client.post(f"/plan-proposals/{ready_proposal.id}/test-runs", json=TEST_RUN_REQUEST_1)
+    assert r.status_code == 429, r.text
+    # 5 entries over the limit at 0.1/s
+    assert r.headers["Retry-After"] == "50"
+    assert publisher.test_run_calls == []
+
+
+def test_create_test_run_503_when_not_draining(client, db_session, ready_proposal, publisher):
+    for _ in range(3):
+        make_test_run(db_session, plan_proposal_id=ready_proposal.id, **TEST_RUN_DATA_CREATE_1)
+    app.dependency_overrides[get_admission_controller] = lambda: _controller(
+        lag=None, max_active=2
+    )
+
+    r = client.post(f"/plan-proposals/{ready_proposal.id}/test-runs", json=TEST_RUN_REQUEST_1)
+    assert r.status_code == 503, r.text
+    assert r.headers["Retry-After"] == "100"
+    assert publisher.test_run_calls == []
+
+
+def test_create_plan_proposal_429(client, db_session, ready_proposal, publisher):
+    ready_proposal.finished_at = utcnow()
+    db_session.flush()
+    app.dependency_overrides[get_admission_controller] = lambda: _controller(lag=100_000)
+
+    r = client.post(
+        f"/test-case-revisions/{ready_proposal.test_case_revision_id}/plan-proposals"
+    )
+    assert r.status_code == 429, r.text
+    assert r.headers["Retry-After"] == "600"
+    assert publisher.proposal_calls == []
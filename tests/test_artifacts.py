@@ -144,3 +144,35 @@ def test_get_screenshot_serves_local_file_when_no_presign(client, db_session, tm
         assert r.content.startswith(b"\x89PNG")
     finally:
         app.dependency_overrides.pop(get_artifact_storage, None)
+
+
+def test_get_trace_404_not_available(client, db_session):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, **TEST_RUN_DATA_CREATE_PASSED_1)
+
+    r = client.get(f"/test-runs/{run.id}/artifacts/trace")
+    assert r.status_code == 404
+    assert r.json()["detail"] == "trace not available"
+
+
+def test_get_trace_serves_local_file_when_no_presign(client, db_session, tmp_path):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run = make_test_run(
+        db_session,
+        plan_proposal_id=proposal.id,
+        trace_name="trace.zip",
+        **TEST_RUN_DATA_CREATE_PASSED_1
+    )
+
+    p = tmp_path / f"traces/{run.id}"
+    p.mkdir(parents=True, exist_ok=True)
+    (p / "trace.zip").write_bytes(b"PK\x03\x04")
+
+    app.dependency_overrides[get_artifact_storage] = lambda: FakeArtifactStorage(presign_url=None, local_root=tmp_path)
+    try:
+        r = client.get(f"/test-runs/{run.id}/artifacts/trace")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/zip")
+        assert r.content.startswith(b"PK")
+    finally:
+        app.dependency_overrides.pop(get_artifact_storage, None)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from app.models.enums import PlanProposalStatus
+from app.utils import utcnow
+from tests.conftest import make_test_case_revision_proposal
+from tests.data.data_proposals import PROPOSAL_DATA_SUCCESS_1
+from tests.data.data_test_case import TEST_CASE_REQUEST_1
+
+
+def _proposal(db, **metrics):
+    data = {**PROPOSAL_DATA_SUCCESS_1, "finished_at": utcnow() - timedelta(minutes=5), **metrics}
+    make_test_case_revision_proposal(db, TEST_CASE_REQUEST_1, data)
+
+
+LLAMA = {
+    "llm_model": "llama3.1:8b",
+    "prompt_eval_count": 100,
+    "eval_count": 200,
+    "prompt_eval_duration_ms": 500,
+    "eval_duration_ms": 4000,
+    "load_duration_ms": 0,
+    "total_duration_ms": 5000,
+    "queue_wait_ms": 100,
+}
+
+
+def test_llm_stats_aggregates_per_model(client, db_session):
+    for generation_ms in (4000, 5000, 6000):
+        _proposal(db_session, generation_ms=generation_ms, **LLAMA)
+    _proposal(
+        db_session,
+        **{**LLAMA, "load_duration_ms": 5000, "total_duration_ms": 10_000, "generation_ms": 10_000},
+        status=PlanProposalStatus.failed,
+    )
+    _proposal(db_session, llm_model="qwen2.5:7b", generation_ms=800, eval_count=50, eval_duration_ms=500)
+    # cache hit: no model call, not part of the stats
+    _proposal(db_session, generation_ms=3)
+    # outside the default 24h window
+    _proposal(db_session, finished_at=utcnow() - timedelta(days=2), generation_ms=1, **LLAMA)
+    db_session.commit()
+
+    r = client.get("/llm/stats")
+    assert r.status_code == 200, r.text
+    models = {m["model"]: m for m in r.json()["models"]}
+
+    assert set(models) == {"llama3.1:8b", "qwen2.5:7b"}
+    llama = models["llama3.1:8b"]
+    assert llama["generations"] == 4
+    assert llama["failed"] == 1
+    assert llama["eval_tokens"] == 800
+    assert llama["eval_tokens_per_s"] == 50.0
+    assert llama["prompt_tokens_per_s"] == 200.0
+    assert llama["generation_ms_p50"] == 5500
+    assert llama["generation_ms_p95"] > 9000
+    assert llama["queue_wait_ms_p95"] == 100
+    assert llama["load_share"] == round(5000 / 25_000, 3)
+
+    qwen = models["qwen2.5:7b"]
+    assert qwen["eval_tokens_per_s"] == 100.0
+    assert qwen["prompt_tokens_per_s"] == 0.0
+    assert qwen["load_share"] == 0.0
+
+
+def test_llm_stats_reports_failures_without_a_model(client, db_session):
+    _proposal(db_session, generation_ms=1000, **LLAMA)
+    _proposal(db_session, generation_ms=50, status=PlanProposalStatus.failed)
+    _proposal(db_session, generation_ms=70, status=PlanProposalStatus.failed)
+    # cache hit: still left out
+    _proposal(db_session, generation_ms=3)
+    db_session.commit()
+
+    r = client.get("/llm/stats")
+    assert r.status_code == 200, r.text
+    models = r.json()["models"]
+
+    assert [m["model"] for m in models] == ["llama3.1:8b", None]
+    unknown = models[1]
+    assert unknown["generations"] == 2
+    assert unknown["failed"] == 2
+    assert unknown["eval_tokens"] == 0
+    assert unknown["load_share"] == 0.0
+
+
+def test_llm_stats_window(client, db_session):
+    _proposal(db_session, generation_ms=1000, **LLAMA)
+    db_session.commit()
+
+    since = (utcnow() - timedelta(hours=1)).isoformat()
+    until = (utcnow() - timedelta(minutes=30)).isoformat()
+    r = client.get("/llm/stats", params={"since": since, "until": until})
+    assert r.status_code == 200, r.text
+    assert r.json()["models"] == []
+
+    r = client.get("/llm/stats", params={"since": until, "until": since})
+    assert r.status_code == 422
@@ -1,6 +1,8 @@
 from datetime import datetime
 
+from app.core.config import settings
 from app.models.enums import PlanProposalStatus
+from app.models.models import PlanProposal
 from tests.conftest import (
     make_plan_proposal,
     make_test_case_and_revision,
@@ -95,6 +97,25 @@ def test_create_plan_proposal_202_creates_and_publishes(client, db_session, publ
     assert publisher.proposal_calls == [{"proposal_id": data["id"]}]
 
 
+def test_create_plan_proposal_with_candidates(client, db_session, publisher):
+    tc = make_test_case_and_revision(db_session, **TEST_CASE_REQUEST_1)
+
+    r = client.post(f"/test-case-revisions/{tc.revisions[0].id}/plan-proposals", json={"candidates": 3})
+    assert r.status_code == 202, r.text
+
+    proposal = db_session.get(PlanProposal, r.json()["id"])
+    assert proposal.request_payload["candidates"] == 3
+
+
+def test_create_plan_proposal_400_if_too_many_candidates(client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "llm_speculative_max_candidates", 2)
+    tc = make_test_case_and_revision(db_session, **TEST_CASE_REQUEST_1)
+
+    r = client.post(f"/test-case-revisions/{tc.revisions[0].id}/plan-proposals", json={"candidates": 3})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "candidates must be <= 2"
+
+
 def test_mark_ready_404_if_proposal_not_found(client):
     r = client.patch("/plan-proposals/999999/ready")
     assert r.status_code == 404
@@ -120,6 +141,33 @@ def test_mark_ready_ok(client, db_session):
     assert data["ready_for_test_at"] is not None
 
 
+def test_mark_ready_stores_compiled_plan(client, db_session):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_1)
+
+    r = client.patch(f"/plan-proposals/{proposal.id}/ready")
+    assert r.status_code == 200, r.text
+
+    db_session.expire_all()
+    stored = db_session.get(PlanProposal, proposal.id).compiled_plan
+    assert [op["op"] for op in stored["steps"]] == ["goto"]
+    assert [op["op"] for op in stored["assertions"]] == ["expect_url"]
+
+
+def test_mark_ready_ok_without_compiled_plan_if_plan_invalid(client, db_session):
+    tc, proposal = make_test_case_revision_proposal(
+        db_session,
+        TEST_CASE_REQUEST_1,
+        {**PROPOSAL_DATA_SUCCESS_1, "result_payload": {"steps": ["await page.click('#a')"], "assertions": []}},
+    )
+
+    r = client.patch(f"/plan-proposals/{proposal.id}/ready")
+    assert r.status_code == 200, r.text
+    assert r.json()["is_ready_for_test"] is True
+
+    db_session.expire_all()
+    assert db_session.get(PlanProposal, proposal.id).compiled_plan is None
+
+
 ######
 # FILTERS TEST
 ######
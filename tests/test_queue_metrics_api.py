@@ -0,0 +1,81 @@
+from app.core.config import settings
+from app.dependencies import get_queue_metrics_collector
+from app.main import app
+from app.queue.metrics import ConsumerMetrics, StreamMetrics, render_prometheus
+
+METRICS = [
+    StreamMetrics(
+        stream="llm_jobs",
+        group="llm_group",
+        length=12,
+        lag=7,
+        pending=2,
+        oldest_pending_age_ms=4500,
+        consumers=[ConsumerMetrics(name="llm_worker:host:1:1", pending=2, idle_ms=1200)],
+    ),
+    StreamMetrics(
+        stream="test_run_jobs",
+        group="test_run_group",
+        length=0,
+        lag=0,
+        pending=0,
+        oldest_pending_age_ms=None,
+    ),
+]
+
+
+class FakeQueueMetricsCollector:
+    def collect(self) -> list[StreamMetrics]:
+        return METRICS
+
+
+def test_get_queue_metrics(client):
+    app.dependency_overrides[get_queue_metrics_collector] = FakeQueueMetricsCollector
+
+    r = client.get("/queue/metrics")
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert [m["stream"] for m in data] == ["llm_jobs", "test_run_jobs"]
+    assert data[0]["lag"] == 7
+    assert data[0]["oldest_pending_age_ms"] == 4500
+    assert data[0]["consumers"][0]["idle_ms"] == 1200
+    assert data[1]["oldest_pending_age_ms"] is None
+    assert data[1]["consumers"] == []
+
+
+def test_get_prometheus_metrics(client):
+    app.dependency_overrides[get_queue_metrics_collector] = FakeQueueMetricsCollector
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert 'autotest_queue_lag{stream="llm_jobs",group="llm_group"} 7' in r.text
+    assert 'autotest_queue_oldest_pending_age_seconds{stream="llm_jobs",group="llm_group"} 4.5' in r.text
+
+
+def test_render_prometheus_skips_unknown_lag():
+    text = render_prometheus(
+        [
+            StreamMetrics(
+                stream="s", group="g", length=3, lag=None, pending=0, oldest_pending_age_ms=None
+            )
+        ]
+    )
+    assert "autotest_queue_lag{" not in text
+    assert 'autotest_queue_length{stream="s",group="g"} 3' in text
+
+
+def test_redis_pool_is_shared_and_reported(client):
+    app.dependency_overrides[get_queue_metrics_collector] = FakeQueueMetricsCollector
+
+    assert app.state.redis.connection_pool is app.state.redis_pool
+
+    r = client.get("/queue/pool")
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data["max_connections"] == settings.redis_pool_max_connections
+    assert data["in_use"] == 0
+    assert data["checkout_timeouts"] == 0
+
+    r = client.get("/metrics")
+    assert 'autotest_redis_pool_saturation{pool="api"} 0.0' in r.text
@@ -82,7 +82,49 @@ def test_create_test_run_202_creates_and_publishes(client, db_session, publisher
     assert data["finished_at"] is None
     assert data["error"] is None
 
-    assert publisher.test_run_calls == [{"run_id": data["id"], "placeholders": TEST_RUN_REQUEST_1["placeholders"]}]
+    assert publisher.test_run_calls == [
+        {"run_id": data["id"], "placeholders": TEST_RUN_REQUEST_1["placeholders"], "priority": "interactive"}
+    ]
+
+
+@pytest.mark.parametrize("priority, response_code", [
+    ("interactive", 202),
+    ("ci", 202),
+    ("nightly", 202),
+    ("urgent", 422),
+])
+def test_create_test_run_priority(client, db_session, publisher, priority, response_code):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+
+    r = client.post(
+        f"/plan-proposals/{proposal.id}/test-runs", json={**TEST_RUN_REQUEST_1, "priority": priority}
+    )
+    assert r.status_code == response_code, r.text
+    if response_code == 202:
+        assert publisher.test_run_calls[0]["priority"] == priority
+    else:
+        assert publisher.test_run_calls == []
+
+
+@pytest.mark.parametrize("video, response_code", [
+    ({"playwright_video": "on_failure", "playwright_video_width": 640, "playwright_video_height": 360}, 202),
+    ({"playwright_video": "sampled", "playwright_video_sample_percent": 5}, 202),
+    ({"playwright_video": "sometimes"}, 422),
+    ({"playwright_video_sample_percent": 101}, 422),
+    ({"playwright_video_width": 4000}, 422),
+    ({"playwright_video": "off", "playwright_trace": "on_failure"}, 202),
+    ({"playwright_trace": "always"}, 422),
+])
+def test_create_test_run_video_params(client, db_session, publisher, video, response_code):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+
+    r = client.post(
+        f"/plan-proposals/{proposal.id}/test-runs",
+        json={**TEST_RUN_REQUEST_1, "run_params": {**TEST_RUN_REQUEST_1["run_params"], **video}},
+    )
+    assert r.status_code == response_code, r.text
+    if response_code == 202:
+        assert r.json()["run_params"] == {**TEST_RUN_REQUEST_1["run_params"], **video}
 
 
 def test_get_test_run_404(client):
@@ -1,13 +1,24 @@
 import json
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from tests.data.data_llm_worker import LLM_PAYLOAD_OK
 
+PLAN = {
+    "steps": ["await page.goto('/login')"],
+    "assertions": ["await expect(page).toHaveURL('/login')"],
+}
+
 
 def msg(proposal_id: int) -> bytes:
     return json.dumps({"proposal_id": proposal_id}).encode("utf-8")
 
 
 class OllamaOK:
+    model = "fake-model"
+
     def __init__(self):
         self._payload = LLM_PAYLOAD_OK
 
@@ -16,5 +27,96 @@ class OllamaOK:
 
 
 class OllamaBoom:
+    model = "fake-model"
+
     def generate_plan_json(self, nl_text: str):
         raise RuntimeError("boom")
+
+
+class AsyncOllamaOK:
+    model = "fake-model"
+
+    def __init__(self):
+        self._payload = LLM_PAYLOAD_OK
+
+    async def agenerate_plan_json(self, nl_text: str):
+        return self._payload
+
+
+class AsyncOllamaBoom:
+    model = "fake-model"
+
+    async def agenerate_plan_json(self, nl_text: str):
+        raise RuntimeError("boom")
+
+
+class FakeOllama:
+    """Stand-in Ollama endpoint on a local port: /api/generate and /api/tags."""
+
+    def __init__(self, delay_s: float = 0.0, load_ms: float = 0.0):
+        self.delay_s = delay_s
+        self.load_ms = load_ms
+        self.down = False
+        self.generations = 0
+        # response texts served in order before falling back to PLAN
+        self.responses: list[str] = []
+        # (delay_s, response text) per request body, for racing requests
+        self.script: Callable[[dict], tuple[float, str]] | None = None
+        self.requests: list[dict] = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(503 if fake.down else 200, {"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append(body)
+                if fake.down:
+                    self._reply(503, {"error": "unavailable"})
+                    return
+                # the first request pays for loading the model, later ones find it loaded
+                load_ns, fake.load_ms = int(fake.load_ms * 1e6), 0.0
+                if not body.get("prompt"):
+                    self._reply(200, {"response": "", "done": True, "load_duration": load_ns})
+                    return
+                if fake.script is not None:
+                    delay_s, text = fake.script(body)
+                else:
+                    delay_s = fake.delay_s
+                    text = fake.responses.pop(0) if fake.responses else json.dumps(PLAN)
+                time.sleep(delay_s)
+                fake.generations += 1
+                self._reply(
+                    200,
+                    {
+                        "response": text,
+                        "done": True,
+                        "done_reason": "stop",
+                        "load_duration": load_ns,
+                        "prompt_eval_count": 40,
+                        "eval_count": 60,
+                        "prompt_eval_duration": 200_000_000,
+                        "eval_duration": 1_500_000_000,
+                        "total_duration": 1_800_000_000 + load_ns,
+                    },
+                )
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,265 @@
+import os
+import subprocess
+import sys
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.exceptions import PlanExecutionError
+from app.workers.test_runner.dto import PlaywrightRunnerConfig
+from app.workers.test_runner.playwright_run import (
+    BrowserPool,
+    PlaywrightSessionFactory,
+    process_tree,
+    process_tree_rss_mb,
+)
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self) -> bool:
+        return self.connected and not self.closed
+
+    async def close(self):
+        self.closed = True
+
+    async def new_context(self, **kwargs):
+        page = AsyncMock()
+        page.video = None
+        page.set_default_timeout = Mock()
+        context = AsyncMock()
+        context.new_page.return_value = page
+        self.contexts.append((kwargs, context))
+        return context
+
+
+class FakeLauncher:
+    def __init__(self, procs):
+        self.browsers = []
+        self._procs = procs
+
+    async def launch(self, *, headless: bool):
+        b = FakeBrowser()
+        # browser root under the driver (pid 1), with one renderer child
+        b.pid = 10 * (len(self._procs) + 1)
+        self._procs[b.pid] = 1
+        self._procs[b.pid + 1] = b.pid
+        self.browsers.append(b)
+        return b
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.procs = {}
+        self.chromium = FakeLauncher(self.procs)
+        self.firefox = FakeLauncher(self.procs)
+        self.stopped = False
+        self.starts = 0
+
+    async def start(self):
+        self.starts += 1
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+def make_pool(**kwargs) -> tuple[BrowserPool, FakePlaywright]:
+    fake = FakePlaywright()
+    kwargs.setdefault("process_probe", lambda: dict(fake.procs))
+    return BrowserPool(playwright_factory=lambda: fake, **kwargs), fake
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_browser_and_counts_hits():
+    pool, fake = make_pool()
+
+    for _ in range(3):
+        async with pool.lease("chromium", headless=True) as (_p, browser):
+            assert browser is fake.chromium.browsers[0]
+
+    assert fake.starts == 1
+    assert len(fake.chromium.browsers) == 1
+    assert pool.stats.misses == 1
+    assert pool.stats.hits == 2
+    assert pool.stats.launches == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_keys_by_browser_and_headless():
+    pool, fake = make_pool()
+
+    async with pool.lease("chromium", headless=True):
+        pass
+    async with pool.lease("chromium", headless=False):
+        pass
+    async with pool.lease("firefox", headless=True):
+        pass
+
+    assert len(fake.chromium.browsers) == 2
+    assert len(fake.firefox.browsers) == 1
+    assert pool.stats.misses == 3
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_after_max_contexts():
+    pool, fake = make_pool(max_contexts_per_browser=2)
+
+    for _ in range(3):
+        async with pool.lease("chromium", headless=True):
+            pass
+
+    first, second = fake.chromium.browsers
+    assert first.closed
+    assert not second.closed
+    assert pool.stats.recycles == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_recycles_only_the_browser_over_max_rss():
+    rss = {}
+    pool, _fake = make_pool(max_browsers_per_type=2, max_rss_mb=100, rss_probe=rss.get)
+
+    small = await pool.acquire("chromium", headless=True)
+    big = await pool.acquire("chromium", headless=True)
+    rss.update({small.pid: 50.0, big.pid: 512.0})
+    await pool.release(small)
+    await pool.release(big)
+
+    assert (small.pid, big.pid) == (small.browser.pid, big.browser.pid)
+    assert not small.browser.closed
+    assert big.browser.closed
+    assert pool.stats.recycles == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_skips_rss_check_when_browser_process_unknown():
+    probed = []
+    # no /proc: nothing to tell the browser's processes apart with
+    pool, _fake = make_pool(max_rss_mb=100, rss_probe=probed.append, process_probe=dict)
+
+    async with pool.lease("chromium", headless=True):
+        pass
+
+    assert probed == []
+    assert pool.stats.recycles == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_launches_extra_browser_when_busy():
+    pool, fake = make_pool(max_browsers_per_type=2)
+
+    a = await pool.acquire("chromium", headless=True)
+    b = await pool.acquire("chromium", headless=True)
+    c = await pool.acquire("chromium", headless=True)
+
+    assert a.browser is not b.browser
+    assert c.browser in (a.browser, b.browser)
+    assert len(fake.chromium.browsers) == 2
+
+    for pooled in (a, b, c):
+        await pool.release(pooled)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_process_tree_rss_covers_root_and_children():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        assert process_tree()[child.pid] == os.getpid()
+        own = process_tree_rss_mb(child.pid)
+        assert own is not None and 0 < own < process_tree_rss_mb(os.getpid())
+    finally:
+        child.kill()
+        child.wait()
+
+
+@pytest.mark.asyncio
+async def test_pool_unsupported_browser_raises():
+    pool, _fake = make_pool()
+
+    with pytest.raises(PlanExecutionError, match="Unsupported browser"):
+        await pool.acquire("netscape", headless=True)
+
+
+@pytest.mark.asyncio
+async def test_pool_close_stops_browsers_and_driver():
+    pool, fake = make_pool()
+    async with pool.lease("chromium", headless=True):
+        pass
+
+    await pool.close()
+
+    assert fake.chromium.browsers[0].closed
+    assert fake.stopped
+
+
+@pytest.mark.asyncio
+async def test_pool_close_closes_retired_browser_with_open_context():
+    pool, fake = make_pool(max_contexts_per_browser=1)
+
+    retired = await pool.acquire("chromium", headless=True)
+    await pool.acquire("chromium", headless=True)
+    assert len(fake.chromium.browsers) == 2
+    assert not retired.browser.closed
+
+    await pool.close()
+
+    assert all(b.closed for b in fake.chromium.browsers)
+
+
+@pytest.mark.asyncio
+async def test_pool_closes_disconnected_browser_when_last_context_released():
+    pool, _fake = make_pool()
+
+    lost = await pool.acquire("chromium", headless=True)
+    lost.browser.connected = False
+    fresh = await pool.acquire("chromium", headless=True)
+
+    assert fresh.browser is not lost.browser
+    assert not lost.browser.closed
+
+    await pool.release(lost)
+    assert lost.browser.closed
+    await pool.release(fresh)
+    assert not fresh.browser.closed
+    assert pool.stats.recycles == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_recycle_of_idle_disconnected_browser():
+    pool, fake = make_pool()
+
+    async with pool.lease("chromium", headless=True):
+        pass
+    fake.chromium.browsers[0].connected = False
+    async with pool.lease("chromium", headless=True):
+        pass
+
+    assert fake.chromium.browsers[0].closed
+    assert len(fake.chromium.browsers) == 2
+    assert pool.stats.recycles == 1
+
+
+@pytest.mark.asyncio
+async def test_session_factory_with_pool_closes_context_not_browser(tmp_path):
+    pool, fake = make_pool()
+    sf = PlaywrightSessionFactory(
+        PlaywrightRunnerConfig(
+            headless=True, timeout_ms=1000, browser_name="chromium", artifacts_root=tmp_path
+        ),
+        pool=pool,
+    )
+
+    async with sf.session(base_url="https://example.com", run_id=7) as (s, artifacts):
+        assert isinstance(s.page, AsyncMock)
+        assert artifacts.video_name is None
+
+    browser = fake.chromium.browsers[0]
+    kwargs, context = browser.contexts[0]
+    assert kwargs["base_url"] == "https://example.com"
+    context.close.assert_awaited_once()
+    assert not browser.closed
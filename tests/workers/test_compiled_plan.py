@@ -0,0 +1,116 @@
+import pytest
+
+from app.exceptions import PlanExecutionError
+from app.plan.compiler import COMPILED_PLAN_VERSION, load_compiled_plan
+from app.plan.dto import OpCode
+from app.workers.test_runner.dto import PlanPayload
+from app.workers.test_runner.renderer import (
+    precompile_plan,
+    render_compiled_plan,
+    render_plan,
+)
+
+PLAN = {
+    "steps": [
+        "await page.goto('/login')",
+        "await page.fill('#email', '<email>')",
+        "await page.fill('#password', '<password>')",
+        "await page.click('#submit')",
+    ],
+    "assertions": ["await expect(page.locator('#hello')).toContainText('Hi <email>')"],
+}
+
+
+def test_precompile_plan_stores_ops_with_placeholder_index():
+    stored = precompile_plan(PLAN)
+
+    assert stored["version"] == COMPILED_PLAN_VERSION
+    assert [op["op"] for op in stored["steps"]] == ["goto", "fill", "fill", "click"]
+    assert stored["steps"][0]["placeholders"] == []
+    assert stored["steps"][1]["placeholders"] == ["<email>"]
+    assert stored["assertions"][0]["placeholders"] == ["<email>"]
+
+
+def test_precompile_plan_rejects_invalid_plan():
+    with pytest.raises(ValueError, match="Unsupported step #1"):
+        precompile_plan({"steps": ["page.goto('/x')"], "assertions": []})
+    with pytest.raises(ValueError, match="page.goto"):
+        precompile_plan({"steps": ["await page.click('#a')"], "assertions": []})
+
+
+def test_load_compiled_plan_roundtrip_and_version_mismatch():
+    stored = precompile_plan(PLAN)
+
+    compiled = load_compiled_plan(stored)
+    assert compiled is not None
+    assert compiled.steps[1].op is OpCode.fill
+    assert compiled.steps[1].args == ("#email", "<email>")
+
+    assert load_compiled_plan(None) is None
+    assert load_compiled_plan({**stored, "version": COMPILED_PLAN_VERSION + 1}) is None
+
+
+def test_render_compiled_plan_matches_render_plan():
+    placeholders = {"<email>": "a@b.c", "<password>": "secret"}
+
+    compiled = render_compiled_plan(precompile_plan(PLAN), placeholders)
+    assert compiled is not None
+    plan = PlanPayload.from_compiled(compiled)
+
+    expected = PlanPayload.from_any(render_plan(PLAN, placeholders))
+    assert plan.steps == expected.steps
+    assert plan.assertions == expected.assertions
+    assert plan.ops == expected.ops
+    assert compiled.assertions[0].args == ("#hello", "Hi a@b.c")
+
+
+def test_render_compiled_plan_unresolved_placeholder_raises():
+    with pytest.raises(ValueError, match="unresolved placeholders"):
+        render_compiled_plan(precompile_plan(PLAN), {"<email>": "a@b.c"})
+
+
+@pytest.mark.parametrize("stored", [None, {"version": 0, "steps": [], "assertions": []}])
+def test_render_compiled_plan_without_usable_plan_returns_none(stored):
+    assert render_compiled_plan(stored, {}) is None
+
+
+def test_render_compiled_plan_non_token_key_returns_none():
+    # plain-text keys can match anywhere in a line, only render_plan substitutes those
+    assert render_compiled_plan(precompile_plan(PLAN), {"#email": "#login"}) is None
+
+
+REGEX_PLAN = {
+    "steps": ["await page.goto('/login')", "await page.click('<button>')"],
+    "assertions": ["await expect(page).toHaveURL(/<path>/)"],
+}
+
+
+@pytest.mark.parametrize(
+    ("placeholders", "valid"),
+    [
+        ({"<button>": "#go", "<path>": "home"}, True),
+        # //secure// after substitution, normalized to /secure/ by both paths
+        ({"<button>": "#go", "<path>": "/secure/"}, True),
+        # //secure/ after substitution: a bad regex delimiter
+        ({"<button>": "#go", "<path>": "/secure"}, False),
+        # the quote ends the selector early: the line no longer parses
+        ({"<button>": "a[title='go']", "<path>": "home"}, False),
+    ],
+)
+def test_render_compiled_plan_checks_bound_lines_like_render_plan(placeholders, valid):
+    stored = precompile_plan(REGEX_PLAN)
+    if not valid:
+        with pytest.raises((ValueError, PlanExecutionError)):
+            PlanPayload.from_any(render_plan(REGEX_PLAN, placeholders))
+        with pytest.raises(ValueError):
+            render_compiled_plan(stored, placeholders)
+        return
+
+    compiled = render_compiled_plan(stored, placeholders)
+    assert compiled is not None
+    plan = PlanPayload.from_compiled(compiled)
+
+    expected = PlanPayload.from_any(render_plan(REGEX_PLAN, placeholders))
+    assert plan.steps == expected.steps
+    assert plan.assertions == expected.assertions
+    assert plan.ops == expected.ops
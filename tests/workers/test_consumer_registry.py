@@ -0,0 +1,107 @@
+import re
+import time
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.queue.redis_consumer import RedisConsumer
+from app.queue.registry import ConsumerRegistry, make_consumer_name
+
+STREAMS = ["jobs", "jobs:ci"]
+GROUP = "workers"
+TTL_S = 1
+
+
+@pytest.fixture()
+def r():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    for stream in STREAMS:
+        client.xgroup_create(stream, GROUP, id="0", mkstream=True)
+    return client
+
+
+def make_registry(r, consumer="alive"):
+    return ConsumerRegistry(
+        r, streams=STREAMS, group=GROUP, consumer=consumer, heartbeat_ttl_s=TTL_S
+    )
+
+
+def consumers(r, stream):
+    return {c["name"] for c in r.xinfo_consumers(stream, GROUP)}
+
+
+def test_make_consumer_name_is_unique_per_process_start():
+    name = make_consumer_name("llm_worker")
+
+    assert re.fullmatch(r"llm_worker:[^:]+:\d+:\d+", name)
+
+
+def test_heartbeat_renews_one_key_for_all_streams(r):
+    registry = make_registry(r)
+    key = f"{GROUP}:heartbeat:alive"
+
+    registry.heartbeat()
+    r.pexpire(key, 200)
+    registry.heartbeat()
+
+    assert r.ttl(key) == TTL_S
+    assert r.keys("*heartbeat*") == [key]
+
+
+def test_run_renews_heartbeat_every_interval(r, monkeypatch):
+    registry = make_registry(r)
+    waits = iter([False, False, True])
+    beats = []
+    monkeypatch.setattr(registry._stop, "wait", lambda timeout: next(waits))
+    monkeypatch.setattr(registry, "heartbeat", lambda: beats.append(time.time()))
+
+    registry._run()
+
+    assert len(beats) == 2
+
+
+def test_prune_removes_only_idle_consumers_without_pending_or_heartbeat(r):
+    for stream in STREAMS:
+        for name in ("dead", "beating", "alive", "busy"):
+            r.xgroup_createconsumer(stream, GROUP, name)
+    # "busy" owns a pending entry on the first stream only
+    r.xadd(STREAMS[0], {"n": "1"})
+    r.xreadgroup(GROUP, "busy", {STREAMS[0]: ">"})
+    r.set(f"{GROUP}:heartbeat:beating", "1", ex=60)
+    time.sleep(TTL_S + 0.05)  # idle past the heartbeat ttl
+    r.xgroup_createconsumer(STREAMS[0], GROUP, "fresh")
+
+    removed = make_registry(r).prune_dead_consumers()
+
+    assert {stream: sorted(names) for stream, names in removed.items()} == {
+        STREAMS[0]: ["dead"],
+        STREAMS[1]: ["busy", "dead"],
+    }
+    assert consumers(r, STREAMS[0]) == {"busy", "beating", "alive", "fresh"}
+    assert consumers(r, STREAMS[1]) == {"beating", "alive"}
+
+
+def test_stop_deregisters_where_nothing_is_pending(r):
+    registry = make_registry(r)
+    registry.heartbeat()
+    r.xadd(STREAMS[0], {"n": "1"})
+    r.xreadgroup(GROUP, "alive", {STREAMS[0]: ">"})
+    r.xreadgroup(GROUP, "alive", {STREAMS[1]: ">"})
+
+    registry.stop()
+
+    assert not r.exists(f"{GROUP}:heartbeat:alive")
+    assert consumers(r, STREAMS[0]) == {"alive"}
+    assert consumers(r, STREAMS[1]) == set()
+
+
+def test_consumer_keeps_one_heartbeat_for_all_lanes(fake_redis):
+    consumer = RedisConsumer("test_runner")
+
+    consumer.registry.heartbeat()
+
+    assert consumer.registry._streams == consumer.streams
+    assert fake_redis.keys("*heartbeat*") == [
+        f"{settings.redis_test_group}:heartbeat:{consumer.consumer_name}"
+    ]
@@ -0,0 +1,111 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from app.llm import ollama_client
+from app.llm.backend_pool import BackendHealthChecker, LLMBackendPool
+from app.llm.ollama_client import OllamaClient
+from tests.workers.helper_llm_worker import PLAN
+
+
+@pytest.fixture(autouse=True)
+def _blocking_generate(monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", False)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_pool_prefers_lower_expected_wait():
+    pool = LLMBackendPool(["http://a", "http://b"], clock=FakeClock())
+    pool.release(pool.acquire(exclude=["http://b"]), 2.0, ok=True)
+    pool.release(pool.acquire(exclude=["http://a"]), 0.5, ok=True)
+
+    # (in_flight + 1) * ewma: b costs 0.5, 1.0, 1.5, then ties a at 2.0 and the idle one wins
+    assert [pool.acquire() for _ in range(4)] == ["http://b"] * 3 + ["http://a"]
+
+
+def test_pool_ejects_after_consecutive_failures_until_eject_window_ends():
+    clock = FakeClock()
+    pool = LLMBackendPool(["http://a", "http://b"], eject_after=2, eject_s=30, clock=clock)
+    pool.release(pool.acquire(exclude=["http://b"]), 0.1, ok=True)
+    for _ in range(2):
+        pool.release(pool.acquire(exclude=["http://b"]), 0.1, ok=False)
+
+    assert pool.ejected() == ["http://a"]
+    assert pool.acquire() == "http://b"
+    # with every other endpoint excluded an ejected one is still used
+    assert pool.acquire(exclude=["http://b"]) == "http://a"
+
+    clock.now = 31
+    assert pool.ejected() == []
+
+
+def test_client_routes_most_generations_to_faster_backend(fake_ollama):
+    slow, fast = fake_ollama(delay_s=0.08), fake_ollama(delay_s=0.0)
+    pool = LLMBackendPool([slow.url, fast.url])
+    client = OllamaClient(backends=pool, session=requests.Session())
+
+    for _ in range(20):
+        assert client.generate_plan_json("open login") == PLAN
+
+    assert slow.generations + fast.generations == 20
+    assert fast.generations > slow.generations
+    stats = {s["url"]: s for s in pool.stats()}
+    assert stats[fast.url]["share"] > 0.5
+    assert stats[fast.url]["ewma_ms"] < stats[slow.url]["ewma_ms"]
+    assert stats[fast.url]["generations_per_min"] > 0
+
+
+def test_client_fails_over_from_unreachable_endpoint(fake_ollama):
+    dead, live = fake_ollama(), fake_ollama()
+    dead.close()
+    pool = LLMBackendPool([dead.url, live.url], eject_after=1)
+    client = OllamaClient(backends=pool, session=requests.Session())
+
+    for _ in range(3):
+        assert client.generate_plan_json("open login") == PLAN
+
+    assert live.generations == 3
+    assert pool.ejected() == [dead.url]
+
+
+def test_health_checker_reinstates_endpoint_once_it_answers(fake_ollama):
+    flaky, other = fake_ollama(), fake_ollama()
+    pool = LLMBackendPool([flaky.url, other.url], eject_after=2)
+    client = OllamaClient(backends=pool, session=requests.Session())
+    checker = BackendHealthChecker(pool, interval_s=60, stats_log_s=0)
+
+    flaky.down = True
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            with pool.lease(exclude=[other.url]) as url:
+                client._generate_blocking(url, client._payload("open login"))
+
+    assert pool.ejected() == [flaky.url]
+    assert checker.check_once() == []
+
+    flaky.down = False
+    assert checker.check_once() == [flaky.url]
+    assert pool.ejected() == []
+
+
+@pytest.mark.asyncio
+async def test_async_generations_spread_over_backends_by_in_flight(fake_ollama):
+    a, b = fake_ollama(delay_s=0.05), fake_ollama(delay_s=0.05)
+    pool = LLMBackendPool([a.url, b.url])
+
+    async with httpx.AsyncClient() as http:
+        client = OllamaClient(backends=pool, async_http=http)
+        plans = await asyncio.gather(*(client.agenerate_plan_json("open login") for _ in range(6)))
+
+    assert plans == [PLAN] * 6
+    assert a.generations == b.generations == 3
+    assert all(s["in_flight"] == 0 for s in pool.stats())
@@ -0,0 +1,19 @@
+from app.llm.utils import PLAN_JSON_SCHEMA, SYSTEM_PROMPT, get_llm_request_payload
+
+
+def test_payload_sends_static_instructions_as_system_prompt():
+    first = get_llm_request_payload("Open /login and sign in", "m", 800, 8192)
+    second = get_llm_request_payload("Open /cart", "m", 800, 8192)
+
+    assert first["system"] == second["system"] == SYSTEM_PROMPT
+    assert first["prompt"] == "NL_TEST_CASE:\nOpen /login and sign in\n"
+    assert "ALLOWED STEPS" not in first["prompt"]
+
+
+def test_payload_constrains_output_to_plan_schema():
+    payload = get_llm_request_payload("x", "m", 800, 8192)
+
+    assert payload["format"] == PLAN_JSON_SCHEMA
+    assert PLAN_JSON_SCHEMA["required"] == ["steps", "assertions"]
+    assert PLAN_JSON_SCHEMA["additionalProperties"] is False
+    assert PLAN_JSON_SCHEMA["properties"]["steps"]["items"] == {"type": "string"}
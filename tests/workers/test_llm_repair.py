@@ -0,0 +1,166 @@
+import json
+
+import httpx
+import pytest
+import requests
+
+from app.llm import ollama_client
+from app.llm.llm_output_validator import (
+    PlanLineError,
+    PlanValidationError,
+    validate_plan_payload,
+)
+from app.llm.ollama_client import OllamaClient, capture_generations
+from app.llm.repair import RepairingLLMClient
+from app.llm.stream_parser import IncrementalPlanParser
+from app.workers.llm_worker import proposal_metrics
+
+GOTO = "await page.goto('/login')"
+CLICK = "await page.click('#submit')"
+BAD_STEP = "await page.locator('#submit').click()"
+BAD_ASSERT = "await expect(page.url()).toBe('/home')"
+URL_ASSERT = "await expect(page).toHaveURL('/home')"
+
+BROKEN_PLAN = {"steps": [GOTO, BAD_STEP], "assertions": [URL_ASSERT]}
+
+
+def repair(*lines: str) -> str:
+    return json.dumps({"lines": list(lines)})
+
+
+@pytest.fixture(autouse=True)
+def _blocking_generate(monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", False)
+
+
+def test_validator_reports_every_unsupported_line():
+    raw = {"steps": [GOTO, BAD_STEP], "assertions": [BAD_ASSERT]}
+
+    with pytest.raises(PlanLineError, match=r"unsupported step #2: .* \(\+1 more\)") as exc:
+        validate_plan_payload(raw)
+
+    assert [(i.section, i.index) for i in exc.value.invalid] == [("steps", 1), ("assertions", 0)]
+    assert exc.value.plan == raw
+
+
+def test_stream_parser_lets_through_up_to_max_invalid_lines():
+    parser = IncrementalPlanParser(max_invalid_lines=1)
+    parser.feed(json.dumps({"steps": [GOTO, BAD_STEP]})[:-1])
+    assert parser.invalid_lines == 1
+
+    with pytest.raises(PlanValidationError, match="unsupported assertion #1"):
+        parser.feed(', "assertions": [' + json.dumps(BAD_ASSERT))
+
+
+def test_repair_sends_only_the_bad_lines_and_splices_the_fix(fake_ollama):
+    server = fake_ollama()
+    server.responses = [json.dumps(BROKEN_PLAN), repair(CLICK)]
+    client = RepairingLLMClient(OllamaClient(server.url, session=requests.Session()))
+
+    with capture_generations() as captured:
+        plan = client.generate_plan_json("open login and submit")
+
+    assert plan == {"steps": [GOTO, CLICK], "assertions": [URL_ASSERT]}
+    repair_request = server.requests[1]
+    assert "unsupported step #2: " + BAD_STEP in repair_request["prompt"]
+    assert GOTO not in repair_request["prompt"]
+    assert repair_request["system"] == server.requests[0]["system"]
+    assert repair_request["format"]["properties"]["lines"]["maxItems"] == 1
+
+    metrics = proposal_metrics(captured, 2000)
+    assert (metrics.repair_attempts, metrics.repair_tokens) == (1, 100)
+    assert metrics.eval_count == 120
+
+
+def test_streaming_client_keeps_going_past_a_repairable_line(fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+    server = fake_ollama()
+    server.responses = [json.dumps(BROKEN_PLAN), repair(CLICK)]
+    ollama = OllamaClient(server.url, session=requests.Session(), max_invalid_lines=1)
+
+    plan = RepairingLLMClient(ollama).generate_plan_json("open login and submit")
+
+    assert plan["steps"] == [GOTO, CLICK]
+    assert server.requests[0]["stream"] is True
+    assert server.requests[1]["stream"] is False
+
+
+def test_repair_gives_up_after_max_attempts(fake_ollama):
+    server = fake_ollama()
+    server.responses = [json.dumps(BROKEN_PLAN), repair(BAD_STEP), "not json"]
+    client = RepairingLLMClient(
+        OllamaClient(server.url, session=requests.Session()), max_attempts=2
+    )
+
+    with pytest.raises(PlanLineError, match="unsupported step #2"):
+        client.generate_plan_json("open login and submit")
+
+    assert len(server.requests) == 3
+
+
+def test_too_many_bad_lines_are_not_repaired(fake_ollama):
+    server = fake_ollama()
+    server.responses = [json.dumps({"steps": [GOTO, BAD_STEP], "assertions": [BAD_ASSERT]})]
+    client = RepairingLLMClient(OllamaClient(server.url, session=requests.Session()), max_lines=1)
+
+    with pytest.raises(PlanLineError):
+        client.generate_plan_json("open login and submit")
+
+    assert len(server.requests) == 1
+
+
+class RegeneratingClient:
+    """Repairs by regenerating; each attempt comes back with more bad lines."""
+
+    model = "fake-model"
+
+    def __init__(self):
+        self.repairs = 0
+
+    def _more_bad_lines(self) -> PlanLineError:
+        self.repairs += 1
+        with pytest.raises(PlanLineError) as exc:
+            validate_plan_payload({"steps": [GOTO] + [BAD_STEP] * (self.repairs + 1), "assertions": [URL_ASSERT]})
+        return exc.value
+
+    def generate_plan_json(self, nl_text):
+        return validate_plan_payload(BROKEN_PLAN)
+
+    def repair_lines(self, nl_text, invalid):
+        raise self._more_bad_lines()
+
+    async def agenerate_plan_json(self, nl_text):
+        return self.generate_plan_json(nl_text)
+
+    async def arepair_lines(self, nl_text, invalid):
+        raise self._more_bad_lines()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("is_async", [False, True])
+async def test_repair_stops_once_a_later_error_has_too_many_lines(is_async):
+    inner = RegeneratingClient()
+    client = RepairingLLMClient(inner, max_attempts=5, max_lines=2)
+
+    with pytest.raises(PlanLineError, match=r"\(\+2 more\)"):
+        if is_async:
+            await client.agenerate_plan_json("open login and submit")
+        else:
+            client.generate_plan_json("open login and submit")
+
+    # 1 bad line -> repair -> 2 -> repair -> 3, which is over max_lines
+    assert inner.repairs == 2
+
+
+@pytest.mark.asyncio
+async def test_async_repair(fake_ollama):
+    server = fake_ollama()
+    server.responses = [json.dumps(BROKEN_PLAN), repair(CLICK)]
+
+    async with httpx.AsyncClient() as http:
+        client = RepairingLLMClient(OllamaClient(server.url, async_http=http))
+        with capture_generations() as captured:
+            plan = await client.agenerate_plan_json("open login and submit")
+
+    assert plan["steps"] == [GOTO, CLICK]
+    assert [r.repair for r in captured] == [False, True]
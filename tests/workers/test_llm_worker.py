@@ -1,15 +1,26 @@
+import pytest
+import requests
 from sqlalchemy import select
 
+from app.llm import ollama_client
+from app.llm.dto import GenerationStats
+from app.llm.ollama_client import OllamaClient
 from app.models.enums import PlanProposalStatus
 from app.models.models import PlanProposal
-from app.workers.llm_worker import handle_message
+from app.workers.llm_worker import handle_message, handle_message_async
 from tests.conftest import (
     make_test_case_revision_proposal,
 )
 from tests.data.data_llm_worker import LLM_PAYLOAD_OK
 from tests.data.data_proposals import PROPOSAL_DATA_CREATE_1, PROPOSAL_DATA_SUCCESS_1
 from tests.data.data_test_case import TEST_CASE_REQUEST_1
-from tests.workers.helper_llm_worker import OllamaBoom, OllamaOK, msg
+from tests.workers.helper_llm_worker import (
+    AsyncOllamaBoom,
+    AsyncOllamaOK,
+    OllamaBoom,
+    OllamaOK,
+    msg,
+)
 
 
 def get_proposal(db, proposal_id: int) -> PlanProposal:
@@ -70,3 +81,91 @@ def test_llm_worker_ollama_error_marks_failed(db_session, llm_uow_factory):
     assert updated.started_at is not None
     assert updated.finished_at is not None
     assert updated.result_payload is None
+    # no Ollama call completed, the attempt still counts against the client's model
+    assert updated.llm_model == "fake-model"
+
+
+@pytest.mark.asyncio
+async def test_llm_worker_async_happy_path_records_stats(db_session, llm_uow_factory):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_CREATE_1)
+    proposal_id = proposal.id
+    stats = GenerationStats()
+
+    await handle_message_async(msg(proposal_id), llm_uow_factory, AsyncOllamaOK(), stats)
+
+    updated = get_proposal(db_session, proposal_id)
+
+    assert updated.status == PlanProposalStatus.succeeded
+    assert updated.result_payload == LLM_PAYLOAD_OK
+    # nothing captured on success means a cache hit, which is not an LLM call
+    assert updated.llm_model is None
+    assert stats.generations == 1
+    assert stats.failed == 0
+    assert stats.in_flight == 0
+    assert stats.in_flight_max == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_worker_async_ollama_error_marks_failed(db_session, llm_uow_factory):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_CREATE_1)
+    proposal_id = proposal.id
+    stats = GenerationStats()
+
+    await handle_message_async(msg(proposal_id), llm_uow_factory, AsyncOllamaBoom(), stats)
+
+    updated = get_proposal(db_session, proposal_id)
+
+    assert updated.status == PlanProposalStatus.failed
+    assert "boom" in updated.error
+    assert updated.result_payload is None
+    assert updated.llm_model == "fake-model"
+    assert stats.failed == 1
+    assert stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_llm_worker_async_final_status_skips_generation(db_session, llm_uow_factory):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_1)
+    proposal_id = proposal.id
+    stats = GenerationStats()
+
+    await handle_message_async(msg(proposal_id), llm_uow_factory, AsyncOllamaBoom(), stats)
+
+    assert get_proposal(db_session, proposal_id).status == PlanProposalStatus.succeeded
+    assert stats.generations == 0
+
+
+def test_llm_worker_stores_token_and_latency_accounting(db_session, llm_uow_factory, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", False)
+    server = fake_ollama(load_ms=300)
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_CREATE_1)
+    proposal_id = proposal.id
+
+    handle_message(
+        msg(proposal_id),
+        llm_uow_factory=llm_uow_factory,
+        llm_client_factory=lambda: OllamaClient(server.url, model="m1", session=requests.Session()),
+    )
+
+    updated = get_proposal(db_session, proposal_id)
+
+    assert updated.status == PlanProposalStatus.succeeded
+    assert updated.llm_model == "m1"
+    assert (updated.prompt_eval_count, updated.eval_count) == (40, 60)
+    assert (updated.prompt_eval_duration_ms, updated.eval_duration_ms) == (200, 1500)
+    assert (updated.load_duration_ms, updated.total_duration_ms) == (300, 2100)
+    assert updated.generation_ms is not None
+    assert updated.queue_wait_ms is not None
+
+
+def test_llm_worker_without_llm_call_only_stores_timing(db_session, llm_uow_factory):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_CREATE_1)
+    proposal_id = proposal.id
+
+    handle_message(msg(proposal_id), llm_uow_factory=llm_uow_factory, llm_client_factory=OllamaOK)
+
+    updated = get_proposal(db_session, proposal_id)
+
+    assert updated.generation_ms is not None
+    assert updated.llm_model is None
+    assert updated.eval_count is None
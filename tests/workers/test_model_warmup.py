@@ -0,0 +1,117 @@
+from datetime import UTC, datetime
+
+import pytest
+import requests
+
+from app.llm import ollama_client
+from app.llm.backend_pool import LLMBackendPool
+from app.llm.dto import ColdWarmLatency, GenerationResult
+from app.llm.ollama_client import OllamaClient
+from app.llm.utils import get_llm_request_payload
+from app.llm.warmup import ModelKeepWarm, in_business_hours
+from tests.workers.helper_llm_worker import PLAN
+
+MONDAY_0530_UTC = datetime(2026, 10, 19, 5, 30, tzinfo=UTC)
+SATURDAY_1200_UTC = datetime(2026, 10, 24, 12, 0, tzinfo=UTC)
+
+
+@pytest.fixture(autouse=True)
+def _blocking_generate(monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", False)
+    monkeypatch.setattr(ollama_client.settings, "ollama_keep_alive", "45m")
+
+
+def test_warm_up_loads_model_on_every_endpoint(fake_ollama):
+    a, b = fake_ollama(load_ms=1500), fake_ollama(load_ms=1500)
+    client = OllamaClient(backends=LLMBackendPool([a.url, b.url]), session=requests.Session())
+
+    loaded = client.warm_up()
+
+    assert set(loaded) == {a.url, b.url}
+    for server in (a, b):
+        assert server.requests == [
+            {"model": client.model, "prompt": "", "stream": False, "keep_alive": "45m"}
+        ]
+        assert server.generations == 0
+
+
+def test_warm_up_skips_unreachable_endpoint(fake_ollama):
+    dead, live = fake_ollama(), fake_ollama()
+    dead.close()
+    pool = LLMBackendPool([dead.url, live.url])
+    client = OllamaClient(backends=pool, session=requests.Session())
+
+    assert list(client.warm_up()) == [live.url]
+    # warm-up does not feed the routing stats
+    assert all(s["generations"] == 0 and s["failures"] == 0 for s in pool.stats())
+
+
+def test_generation_after_model_load_counts_as_cold(fake_ollama):
+    server = fake_ollama(load_ms=1500)
+    latency = ColdWarmLatency(threshold_ms=1000)
+    client = OllamaClient(server.url, session=requests.Session(), latency=latency)
+
+    assert client.generate_plan_json("open login") == PLAN
+    assert client.generate_plan_json("open login") == PLAN
+
+    assert (latency.cold_total, latency.warm_total) == (1, 1)
+    assert server.requests[0]["keep_alive"] == "45m"
+
+
+def test_cold_start_falls_back_to_first_token_time():
+    latency = ColdWarmLatency(threshold_ms=1000)
+
+    assert latency.record(3000, GenerationResult(text="{}", first_token_ms=2500))
+    assert not latency.record(900, GenerationResult(text="{}", first_token_ms=200))
+    assert not latency.record(900, GenerationResult(text="{}", load_ms=5, first_token_ms=2500))
+    assert latency.as_dict()["cold_p99_ms"] == 3000
+
+
+def test_keep_alive_is_sent_but_not_part_of_generation_options():
+    payload = get_llm_request_payload("x", "m", 100, 2048, keep_alive="-1")
+
+    assert payload["keep_alive"] == -1
+    assert "keep_alive" not in payload["options"]
+    assert get_llm_request_payload("x", "m", 100, 2048, keep_alive="30m")["keep_alive"] == "30m"
+
+
+@pytest.mark.parametrize(
+    "now, start, end, weekdays_only, expected",
+    [
+        (datetime(2026, 10, 19, 8, 0), 8, 18, True, True),
+        (datetime(2026, 10, 19, 18, 0), 8, 18, True, False),
+        (datetime(2026, 10, 24, 10, 0), 8, 18, True, False),
+        (datetime(2026, 10, 24, 10, 0), 8, 18, False, True),
+        (datetime(2026, 10, 19, 23, 0), 22, 6, True, True),
+        (datetime(2026, 10, 19, 12, 0), 22, 6, True, False),
+    ],
+)
+def test_in_business_hours(now, start, end, weekdays_only, expected):
+    assert (
+        in_business_hours(now, start_hour=start, end_hour=end, weekdays_only=weekdays_only)
+        is expected
+    )
+
+
+@pytest.mark.parametrize(
+    "now, tz, expected",
+    [
+        (MONDAY_0530_UTC, "UTC", False),
+        (MONDAY_0530_UTC, "Europe/Berlin", True),
+        (SATURDAY_1200_UTC, "Europe/Berlin", False),
+    ],
+)
+def test_keep_warm_pings_only_during_business_hours(now, tz, expected):
+    pings = []
+    keep_warm = ModelKeepWarm(
+        lambda: pings.append(1),
+        interval_s=600,
+        start_hour=7,
+        end_hour=20,
+        weekdays_only=True,
+        tz=tz,
+        clock=lambda: now,
+    )
+
+    assert keep_warm.ping_once() is expected
+    assert len(pings) == int(expected)
@@ -0,0 +1,95 @@
+import fakeredis
+import pytest
+
+from app.llm.plan_cache import CachingLLMClient, PlanCache, normalize_nl_text, plan_cache_key
+
+VALID_PLAN = {
+    "steps": ["await page.goto('/login')", "await page.click('#submit')"],
+    "assertions": ["await expect(page).toHaveURL('/dashboard')"],
+}
+
+OPTIONS = {"num_ctx": 8192, "num_predict": 800, "temperature": 0.1}
+
+
+class CountingClient:
+    model = "llama3.1:8b"
+
+    def __init__(self, plan=VALID_PLAN):
+        self.calls = 0
+        self._plan = plan
+
+    def generation_options(self):
+        return OPTIONS
+
+    def generate_plan_json(self, nl_text: str):
+        self.calls += 1
+        return self._plan
+
+
+def test_normalize_collapses_whitespace_only():
+    assert normalize_nl_text("  Log in\n\tand   see Dashboard ") == "Log in and see Dashboard"
+
+
+def test_key_ignores_whitespace_and_depends_on_model_and_options():
+    key = plan_cache_key("log in  and see dashboard", model="m", options=OPTIONS)
+
+    assert key == plan_cache_key(" log in and\nsee dashboard", model="m", options=OPTIONS)
+    assert key != plan_cache_key("log in and see dashboard", model="other", options=OPTIONS)
+    assert key != plan_cache_key(
+        "log in and see dashboard", model="m", options={**OPTIONS, "temperature": 0.7}
+    )
+
+
+def test_caching_client_generates_once_per_normalized_text():
+    inner = CountingClient()
+    client = CachingLLMClient(inner, PlanCache(None, ttl_s=60, lru_size=8))
+
+    first = client.generate_plan_json("log in and see dashboard")
+    second = client.generate_plan_json("log in   and see dashboard\n")
+
+    assert inner.calls == 1
+    assert first == second == VALID_PLAN
+
+
+def test_invalid_cached_plan_is_dropped_and_regenerated():
+    cache = PlanCache(None, ttl_s=60, lru_size=8)
+    inner = CountingClient()
+    key = plan_cache_key("text", model=inner.model, options=OPTIONS)
+    cache.set(key, {"steps": ["rm -rf /"], "assertions": []})
+
+    plan = CachingLLMClient(inner, cache).generate_plan_json("text")
+
+    assert inner.calls == 1
+    assert plan == VALID_PLAN
+    assert cache.get(key) == VALID_PLAN
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PlanCache(None, ttl_s=60, lru_size=2)
+    cache.set("a", VALID_PLAN)
+    cache.set("b", VALID_PLAN)
+    cache.get("a")
+    cache.set("c", VALID_PLAN)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == VALID_PLAN
+    assert cache.get("c") == VALID_PLAN
+
+
+@pytest.mark.parametrize("raw", ["{not json", "[1, 2]", "null", b"\xff\xfe"])
+def test_unreadable_redis_entry_is_deleted_and_regenerated(raw):
+    r = fakeredis.FakeRedis(decode_responses=False)
+    cache = PlanCache(r, ttl_s=60, lru_size=8)
+    inner = CountingClient()
+    key = plan_cache_key("text", model=inner.model, options=OPTIONS)
+    r.set(f"plan_cache:{key}", raw)
+
+    assert cache.get(key) is None
+    assert cache.misses == 1
+    assert not r.exists(f"plan_cache:{key}")
+
+    plan = CachingLLMClient(inner, cache).generate_plan_json("text")
+
+    assert inner.calls == 1
+    assert plan == VALID_PLAN
+    assert cache.get(key) == VALID_PLAN
@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+from app.exceptions import PlanExecutionError
+from app.plan import compiler
+from app.plan.compiler import compile_assertion, compile_line, compile_step
+from app.plan.dto import OpCode
+from app.workers.test_runner.dto import PlanPayload
+
+ALL_PATTERNS = [
+    (compiler.RE_GOTO, OpCode.goto),
+    (compiler.RE_FILL, OpCode.fill),
+    (compiler.RE_CLICK, OpCode.click),
+    (compiler.RE_WAIT_SEL, OpCode.wait_selector),
+    (compiler.RE_WAIT_URL_STR, OpCode.wait_url),
+    (compiler.RE_WAIT_URL_RE, OpCode.wait_url_regex),
+    (compiler.RE_EXPECT_URL_STR, OpCode.expect_url),
+    (compiler.RE_EXPECT_URL_RE, OpCode.expect_url_regex),
+    (compiler.RE_EXPECT_VISIBLE, OpCode.expect_visible),
+    (compiler.RE_EXPECT_CONTAINS, OpCode.expect_text),
+]
+
+LINES = [
+    "await page.goto('/login')",
+    "await page.fill('#email', '<email>')",
+    "await page.fill('#q',    'a (b) c')",
+    "await page.click('[data-testid=\"submit\"]')",
+    "await page.waitForSelector('#x')",
+    "await page.waitForURL('/home')",
+    "await page.waitForURL(/secure.*/)",
+    "await expect(page).toHaveURL('/home')",
+    "await expect(page).toHaveURL(/dash(board)?/)",
+    "await expect(page.locator('#x')).toBeVisible()",
+    "await expect(page.locator('#x')).toContainText('Hi (there)')",
+    "  await page.click('#padded')  ",
+    "await page.type('#x', 'y')",
+    "await expect(page).toHaveTitle('X')",
+    "await expect(page.locator('#x')).toBeHidden()",
+    "await page.locator('#x').click()",
+    "page.goto('/login')",
+    "await expect",
+    "",
+]
+
+
+def cascade(line: str):
+    """What the validator, PlanPayload and the runner each used to do: try every pattern in turn."""
+    s = line.strip()
+    for pattern, op in ALL_PATTERNS:
+        m = pattern.match(s)
+        if m:
+            return op, m.groups()
+    return None
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_prefix_dispatch_matches_trying_every_pattern(line):
+    op = compile_line(line)
+
+    assert (None if op is None else (op.op, op.args)) == cascade(line)
+    if op is not None:
+        assert op.source == line.strip()
+
+
+def test_steps_and_assertions_are_not_interchangeable():
+    assert compile_step("await expect(page).toHaveURL('/x')") is None
+    assert compile_assertion("await page.goto('/x')") is None
+    assert compile_step("await page.fill('#a', 'b')").args == ("#a", "b")
+
+
+def test_plan_payload_rejects_unsupported_line_before_running():
+    raw = {"steps": ["await page.goto('/login')", "await page.type('#x', 'y')"], "assertions": []}
+
+    with pytest.raises(PlanExecutionError, match=r"Unsupported step #2: await page\.type"):
+        PlanPayload.from_any(raw)
+
+
+def test_plan_payload_keeps_compiled_ops():
+    plan = PlanPayload.from_any(
+        {"steps": [" await page.goto('/a') "], "assertions": ["await expect(page).toHaveURL(/a/)"]}
+    )
+
+    assert [op.op for op in plan.ops.steps] == [OpCode.goto]
+    assert plan.ops.assertions[0].args == ("a",)
+    assert plan.steps == ["await page.goto('/a')"]
+
+
+@pytest.mark.skipif(
+    not os.environ.get("AUTOTEST_BENCHMARKS"), reason="benchmark, set AUTOTEST_BENCHMARKS=1"
+)
+def test_compile_throughput_on_large_plans():
+    """
+    Benchmark: 2000 plans of 60 steps and 40 assertions. Before, the validator and the
+    runner each ran the pattern cascade over every line; now each line is compiled once.
+    Wall-clock comparisons are unreliable on a loaded machine, so it only runs on request.
+    """
+    steps = ["await page.goto('/login')"] + [
+        "await page.fill('#email', '<email>')",
+        "await page.click('#submit')",
+        "await page.waitForSelector('#menu')",
+        "await page.waitForURL(/dashboard.*/)",
+    ] * 15
+    assertions = [
+        "await expect(page).toHaveURL('/home')",
+        "await expect(page.locator('#x')).toBeVisible()",
+        "await expect(page.locator('#x')).toContainText('Hello')",
+        "await expect(page).toHaveURL(/home/)",
+    ] * 10
+    plans = [steps[:60] + assertions] * 2000
+    n_lines = len(plans) * len(plans[0])
+
+    def best_of(per_line, repeat=3) -> float:
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for plan in plans:
+                for line in plan:
+                    per_line(line)
+            timings.append(time.perf_counter() - t0)
+        return min(timings)
+
+    compiled_s = best_of(compile_line)
+    before_s = best_of(lambda line: (cascade(line), cascade(line)))
+
+    assert compiled_s < before_s, (
+        f"plan compiler: {n_lines / compiled_s:,.0f} lines/s,"
+        f" validator + runner cascades: {n_lines / before_s:,.0f} lines/s"
+    )
@@ -0,0 +1,126 @@
+import pytest
+
+from app.llm.plan_index import PlanEmbeddingIndex, SemanticReuseLLMClient, build_plan_index, text_key
+from app.repositories.repositories import PlanProposalRepository
+from tests.conftest import make_test_case_revision_proposal
+from tests.data.data_proposals import PROPOSAL_DATA_CREATE_1, PROPOSAL_DATA_SUCCESS_1
+from tests.data.data_test_case import TEST_CASE_REQUEST_1
+
+VOCAB = ["log", "in", "dashboard", "visible", "logout", "cart", "checkout"]
+
+PLAN_LOGIN = {
+    "steps": ["await page.goto('/login')"],
+    "assertions": ["await expect(page).toHaveURL('/dashboard')"],
+}
+PLAN_CART = {
+    "steps": ["await page.goto('/cart')"],
+    "assertions": ["await expect(page.locator('#checkout')).toBeVisible()"],
+}
+
+
+class BagOfWordsEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, text: str) -> list[float]:
+        self.calls += 1
+        words = text.lower().replace(",", " ").split()
+        return [float(sum(w.startswith(v) for w in words)) for v in VOCAB]
+
+
+class CountingClient:
+    model = "m"
+
+    def __init__(self, plan):
+        self.calls = 0
+        self._plan = plan
+
+    def generation_options(self):
+        return {}
+
+    def generate_plan_json(self, nl_text: str):
+        self.calls += 1
+        return self._plan
+
+
+def test_index_returns_most_similar_plan():
+    embedder = BagOfWordsEmbedder()
+    index = PlanEmbeddingIndex(initial_capacity=1)
+    index.add("a", embedder.embed("log in and see dashboard"), "log in and see dashboard", PLAN_LOGIN)
+    index.add("b", embedder.embed("open cart and checkout"), "open cart and checkout", PLAN_CART)
+
+    match = index.search(embedder.embed("user logs in, dashboard visible"))
+
+    assert len(index) == 2
+    assert match.key == "a"
+    assert match.plan == PLAN_LOGIN
+    assert 0.0 < match.score <= 1.0
+
+
+def test_index_overwrites_existing_key_and_rejects_other_dimension():
+    index = PlanEmbeddingIndex()
+    index.add("a", [1.0, 0.0], "x", PLAN_LOGIN)
+    index.add("a", [0.0, 1.0], "x", PLAN_CART)
+
+    assert len(index) == 1
+    assert index.search([0.0, 1.0]).plan == PLAN_CART
+    with pytest.raises(ValueError):
+        index.add("b", [1.0, 0.0, 0.0], "y", PLAN_LOGIN)
+
+
+def test_semantic_client_reuses_near_duplicate_and_indexes_new_plans():
+    embedder = BagOfWordsEmbedder()
+    index = PlanEmbeddingIndex()
+    inner = CountingClient(PLAN_LOGIN)
+    client = SemanticReuseLLMClient(inner, embedder=embedder, index=index, threshold=0.8)
+
+    first = client.generate_plan_json("log in and see dashboard")
+    second = client.generate_plan_json("user logs in, dashboard visible")
+    client.generate_plan_json("open cart and checkout")
+
+    assert first == second == PLAN_LOGIN
+    assert inner.calls == 2
+    assert len(index) == 2
+
+
+def test_semantic_client_revalidates_candidate():
+    embedder = BagOfWordsEmbedder()
+    index = PlanEmbeddingIndex()
+    index.add("a", embedder.embed("log in"), "log in", {"steps": ["bad"], "assertions": []})
+    inner = CountingClient(PLAN_LOGIN)
+
+    plan = SemanticReuseLLMClient(inner, embedder=embedder, index=index, threshold=0.5).generate_plan_json(
+        "log in"
+    )
+
+    assert plan == PLAN_LOGIN
+    assert inner.calls == 1
+
+
+class ConstantEmbedder:
+    def embed(self, text: str) -> list[float]:
+        return [1.0, 2.0, 3.0]
+
+
+def test_build_plan_index_from_succeeded_proposals(db_session):
+    make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_1)
+    make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_CREATE_1)
+
+    rows = PlanProposalRepository(db_session).list_succeeded_with_text(limit=100)
+    index = build_plan_index(rows, embedder=ConstantEmbedder(), store=None, backfill_limit=10)
+
+    assert len(rows) == 1
+    assert rows[0]["nl_text"] == TEST_CASE_REQUEST_1["nl_text"]
+    match = index.search([1.0, 2.0, 3.0])
+    assert match.key == text_key(TEST_CASE_REQUEST_1["nl_text"])
+    assert match.plan == PROPOSAL_DATA_SUCCESS_1["result_payload"]
+    assert match.score == pytest.approx(1.0)
+
+
+def test_build_plan_index_limits_backfill(db_session):
+    make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_1)
+
+    rows = PlanProposalRepository(db_session).list_succeeded_with_text(limit=100)
+    index = build_plan_index(rows, embedder=ConstantEmbedder(), store=None, backfill_limit=0)
+
+    assert len(index) == 0
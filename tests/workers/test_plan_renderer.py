@@ -62,6 +62,21 @@ def test_apply_placeholders_unresolved_raises():
         apply_placeholders(TEXT_WITH_UNRESOLVED, PLACEHOLDERS_OK)
 
 
+def test_apply_placeholders_single_pass_keeps_values():
+    # a value is not substituted again, even when it looks like a placeholder
+    out = apply_placeholders("'<A>' '<B>'", {"<A>": "<B>", "<B>": "x"})
+    assert out == "'<B>' 'x'"
+
+
+def test_apply_placeholders_longest_key_first():
+    out = apply_placeholders("<id> <id_2>", {"<id>": "1", "<id_2>": "2"})
+    assert out == "1 2"
+
+
+def test_apply_placeholders_plain_text_key():
+    assert apply_placeholders("#email #email", {"#email": "#login"}) == "#login #login"
+
+
 # -----------------------------
 # render_plan
 # -----------------------------
@@ -0,0 +1,223 @@
+import json
+
+import httpx
+import pytest
+
+from app.llm import ollama_client
+from app.llm.llm_output_validator import MAX_LINE_LEN, PlanValidationError, validate_plan_payload
+from app.llm.dto import TokenStats
+from app.llm.ollama_client import OllamaClient
+from app.llm.stream_parser import IncrementalPlanParser
+
+PLAN_TEXT = json.dumps(
+    {
+        "steps": ["await page.goto('/login')", "await page.fill('#user', '<login>')"],
+        "assertions": ["await expect(page).toHaveURL('/dashboard')"],
+    }
+)
+
+
+def chunks(text: str, size: int = 3) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_accepts_valid_plan_token_by_token():
+    parser = IncrementalPlanParser()
+    for c in chunks(PLAN_TEXT):
+        parser.feed(c)
+
+    assert parser.done
+    assert json.loads(parser.text) == json.loads(PLAN_TEXT)
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ('{"steps": ["await page.goto(\'/a\')", "await page.evaluate(\'x\')"', "unsupported step #2"),
+        ('{"assertions": ["await page.click(\'#a\')"', "unsupported assertion #1"),
+        ('{"steps": [], "code"', "unexpected keys"),
+        ('{"steps": "await', r"must be list\[str\]"),
+        ('{"steps": [{"a"', r"must be list\[str\]"),
+        ('Sure! {"steps"', "before the plan object"),
+        ('{"steps": [], "assertions": []} trailing', "after the plan object"),
+    ],
+)
+def test_parser_aborts_at_first_invalid_token(text, error):
+    parser = IncrementalPlanParser()
+    with pytest.raises(PlanValidationError, match=error):
+        for c in chunks(text):
+            parser.feed(c)
+
+
+def test_parser_aborts_on_runaway_line_and_too_many_steps():
+    with pytest.raises(PlanValidationError, match="longer than"):
+        IncrementalPlanParser(max_line_len=20).feed('{"steps": ["' + "a" * 21 + '"')
+    # an unterminated line is cut off before the model finishes it
+    with pytest.raises(PlanValidationError, match="longer than"):
+        IncrementalPlanParser(max_line_len=20).feed('{"steps": ["' + "a" * 121)
+
+    steps = ", ".join(["\"await page.click('#a')\""] * 3)
+    with pytest.raises(PlanValidationError, match="too many steps"):
+        IncrementalPlanParser(max_steps=2).feed('{"steps": [' + steps)
+
+
+@pytest.mark.parametrize("line_len", [MAX_LINE_LEN, MAX_LINE_LEN + 1])
+def test_parser_and_validator_share_line_limit(line_len):
+    # quotes are escaped on the wire, so the raw line is longer than the decoded one
+    prefix, suffix = "await page.fill('#q', '", "')"
+    step = prefix + '"' * (line_len - len(prefix) - len(suffix)) + suffix
+    plan = {"steps": ["await page.goto('/')", step], "assertions": []}
+
+    def parse():
+        parser = IncrementalPlanParser()
+        for c in chunks(json.dumps(plan)):
+            parser.feed(c)
+
+    if line_len <= MAX_LINE_LEN:
+        parse()
+        validate_plan_payload(plan)
+    else:
+        with pytest.raises(PlanValidationError, match="longer than"):
+            parse()
+        with pytest.raises(PlanValidationError, match="longer than"):
+            validate_plan_payload(plan)
+
+
+def test_parser_validates_unescaped_line():
+    parser = IncrementalPlanParser()
+    parser.feed(json.dumps({"steps": ["await page.fill('#q', 'say \"hi\"')"]}))
+    assert parser.done
+
+
+class FakeStreamResponse:
+    def __init__(self, lines: list[bytes]):
+        self._lines = lines
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        for line in self._lines:
+            self.read += 1
+            yield line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response: FakeStreamResponse):
+        self._response = response
+
+    def post(self, *args, **kwargs):
+        return self._response
+
+
+def _ollama_lines(tokens: list[str], **final) -> list[bytes]:
+    lines = [json.dumps({"response": t, "done": False}).encode() for t in tokens]
+    lines.append(
+        json.dumps({"response": "", "done": True, "done_reason": "stop", **final}).encode()
+    )
+    return lines
+
+
+def test_ollama_streaming_returns_validated_plan(monkeypatch):
+    response = FakeStreamResponse(_ollama_lines(chunks(PLAN_TEXT, 7)))
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+
+    plan = OllamaClient(base_url="http://ollama", session=FakeSession(response)).generate_plan_json(
+        "log in"
+    )
+
+    assert plan == json.loads(PLAN_TEXT)
+    assert response.closed
+
+
+def test_ollama_streaming_stops_reading_at_invalid_line(monkeypatch):
+    bad = '{"steps": ["await page.evaluate(\'1\')", '
+    tokens = [*chunks(bad, 5), *(["\"await page.click('#a')\", "] * 50)]
+    response = FakeStreamResponse(_ollama_lines(tokens))
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+
+    with pytest.raises(PlanValidationError, match="unsupported step #1"):
+        OllamaClient(base_url="http://ollama", session=FakeSession(response)).generate_plan_json(
+            "log in"
+        )
+
+    assert response.closed
+    assert response.read < len(chunks(bad, 5)) + 2
+
+
+@pytest.mark.asyncio
+async def test_ollama_async_streaming_returns_validated_plan(monkeypatch):
+    seen: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content))
+        body = b"\n".join(_ollama_lines(chunks(PLAN_TEXT, 7)))
+        return httpx.Response(200, content=body)
+
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+        client = OllamaClient(base_url="http://ollama", async_http=http)
+        plan = await client.agenerate_plan_json("log in")
+
+    assert plan == json.loads(PLAN_TEXT)
+    assert seen[0]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_ollama_async_requires_http_client():
+    with pytest.raises(RuntimeError, match="async http client"):
+        await OllamaClient(base_url="http://ollama", session=FakeSession(None)).agenerate_plan_json(
+            "log in"
+        )
+
+
+def test_ollama_streaming_reads_token_counts_after_the_plan(monkeypatch):
+    response = FakeStreamResponse(
+        _ollama_lines([*chunks(PLAN_TEXT, 7), "\n"], prompt_eval_count=42, eval_count=57)
+    )
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+    tokens = TokenStats(prompt_version=2)
+    client = OllamaClient(base_url="http://ollama", session=FakeSession(response), tokens=tokens)
+
+    client.generate_plan_json("log in")
+
+    assert tokens.as_dict() == {
+        "prompt_version": 2,
+        "generations": 1,
+        "malformed": 0,
+        "malformed_rate": 0.0,
+        "prompt_eval_avg": 42.0,
+        "eval_avg": 57.0,
+    }
+
+
+def test_ollama_streaming_does_not_wait_forever_for_final_chunk(monkeypatch):
+    response = FakeStreamResponse(_ollama_lines([*chunks(PLAN_TEXT, 7), *([" "] * 100)]))
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+    tokens = TokenStats(prompt_version=2)
+    client = OllamaClient(base_url="http://ollama", session=FakeSession(response), tokens=tokens)
+
+    assert client.generate_plan_json("log in") == json.loads(PLAN_TEXT)
+    assert response.read < len(chunks(PLAN_TEXT, 7)) + 10
+    assert tokens.counted == 0
+
+
+def test_ollama_counts_malformed_output(monkeypatch):
+    bad = '{"steps": ["await page.evaluate(\'1\')"], "assertions": []}'
+    response = FakeStreamResponse(_ollama_lines(chunks(bad, 5)))
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", True)
+    tokens = TokenStats(prompt_version=2)
+    client = OllamaClient(base_url="http://ollama", session=FakeSession(response), tokens=tokens)
+
+    with pytest.raises(PlanValidationError):
+        client.generate_plan_json("log in")
+
+    assert (tokens.generations, tokens.malformed) == (0, 1)
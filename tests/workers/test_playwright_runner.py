@@ -4,7 +4,9 @@ from unittest.mock import AsyncMock, Mock
 import pytest
 
 import app.workers.test_runner.playwright_run as runner_mod
+from app.exceptions import PlanExecutionError
 from app.models.enums import TestRunStatus
+from app.plan.compiler import compile_assertion, compile_step
 from app.workers.test_runner.dto import PlanExecutionFailed, PlanPayload
 from app.workers.test_runner.playwright_run import PlaywrightRunner
 from tests.conftest import FakeExpectPlaywright, FakeSessionFactory, make_page
@@ -50,7 +52,7 @@ async def test_run_step_dispatch(step, method, args, expected_return):
     runner = PlaywrightRunner(session_factory=Mock())
     page = AsyncMock()
 
-    res = await runner._run_step(step, page)
+    res = await runner._exec_step(compile_step(step), page)
 
     assert res == expected_return
     getattr(page, method).assert_awaited_once_with(*args)
@@ -62,7 +64,7 @@ async def test_run_step_wait_url_regex_compiles_pattern():
     page = AsyncMock()
 
     step = r"await page.waitForURL(/secure.*/)"
-    res = await runner._run_step(step, page)
+    res = await runner._exec_step(compile_step(step), page)
 
     assert res == step
 
@@ -73,12 +75,13 @@ async def test_run_step_wait_url_regex_compiles_pattern():
 
 
 @pytest.mark.asyncio
-async def test_run_step_unsupported_returns_none():
+async def test_run_step_rejects_assertion_op():
     runner = PlaywrightRunner(session_factory=Mock())
     page = AsyncMock()
 
-    res = await runner._run_step("await page.type('#x', 'y')", page)
-    assert res is None
+    assert compile_step("await page.type('#x', 'y')") is None
+    with pytest.raises(PlanExecutionError, match="not a step"):
+        await runner._exec_step(compile_assertion("await expect(page).toHaveURL('/x')"), page)
 
 
 # ------------------------------
@@ -121,7 +124,7 @@ async def test_run_assertion_dispatch(monkeypatch, assertion, expected_kind, exp
     fake_expect = FakeExpectPlaywright(page, locator_obj)
     monkeypatch.setattr(runner_mod, "expect", fake_expect, raising=True)
 
-    res = await runner._run_assertion(assertion, page)
+    res = await runner._exec_assertion(compile_assertion(assertion), page)
     assert res == assertion
 
     if expected_kind == "to_have_url" and isinstance(expected_value, re.Pattern):
@@ -142,7 +145,7 @@ async def test_run_assertion_dispatch(monkeypatch, assertion, expected_kind, exp
 
 
 @pytest.mark.asyncio
-async def test_run_assertion_unsupported_returns_none(monkeypatch):
+async def test_run_assertion_rejects_step_op(monkeypatch):
     runner = PlaywrightRunner(session_factory=Mock())
 
     page = AsyncMock()
@@ -152,8 +155,10 @@ async def test_run_assertion_unsupported_returns_none(monkeypatch):
     fake_expect = FakeExpectPlaywright(page, locator_obj)
     monkeypatch.setattr(runner_mod, "expect", fake_expect, raising=True)
 
-    res = await runner._run_assertion("await expect(page).toHaveTitle('X')", page)
-    assert res is None
+    assert compile_assertion("await expect(page).toHaveTitle('X')") is None
+    with pytest.raises(PlanExecutionError, match="not an assertion"):
+        await runner._exec_assertion(compile_step("await page.goto('/x')"), page)
+    assert fake_expect.page_matcher.calls == []
 
 
 @pytest.mark.asyncio
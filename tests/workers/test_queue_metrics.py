@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+
+from app.queue.metrics import ConsumerMetrics, QueueMetricsCollector, StreamMetrics
+
+STREAM = "jobs"
+GROUP = "workers"
+NOW_MS = 10_000
+
+
+@pytest.fixture()
+def r():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def make_collector(r):
+    return QueueMetricsCollector(r, [(STREAM, GROUP)])
+
+
+def test_collect_reads_lag_pending_and_oldest_pending_age(r):
+    for ms in (1000, 2000, 3000, 4000, 5000):
+        r.xadd(STREAM, {"run_id": str(ms)}, id=f"{ms}-0")
+    r.xgroup_create(STREAM, GROUP, id="0")
+    r.xreadgroup(GROUP, "c1", {STREAM: ">"}, count=2)
+    r.xreadgroup(GROUP, "c2", {STREAM: ">"}, count=1)
+    r.xack(STREAM, GROUP, "1000-0")
+
+    m = make_collector(r)._collect_one(STREAM, GROUP, NOW_MS)
+
+    assert (m.length, m.lag, m.pending) == (5, 2, 2)
+    # 2000-0 is now the oldest entry delivered and not acked
+    assert m.oldest_pending_age_ms == NOW_MS - 2000
+    assert [(c.name, c.pending) for c in m.consumers] == [("c1", 1), ("c2", 1)]
+    assert all(c.idle_ms >= 0 for c in m.consumers)
+    assert make_collector(r).group_lag(STREAM, GROUP) == 2
+
+
+def test_collect_without_pending_entries_has_no_oldest_age(r):
+    r.xadd(STREAM, {"run_id": "1"}, id="1000-0")
+    r.xgroup_create(STREAM, GROUP, id="0")
+    r.xreadgroup(GROUP, "c1", {STREAM: ">"})
+    r.xack(STREAM, GROUP, "1000-0")
+
+    m = make_collector(r)._collect_one(STREAM, GROUP, NOW_MS)
+
+    assert (m.lag, m.pending, m.oldest_pending_age_ms) == (0, 0, None)
+    assert m.consumers == [ConsumerMetrics(name="c1", pending=0, idle_ms=m.consumers[0].idle_ms)]
+
+
+def test_collect_missing_group_lags_by_whole_stream(r):
+    r.xadd(STREAM, {"run_id": "1"})
+    r.xadd(STREAM, {"run_id": "2"})
+
+    assert make_collector(r).collect() == [
+        StreamMetrics(
+            stream=STREAM, group=GROUP, length=2, lag=2, pending=0, oldest_pending_age_ms=None
+        )
+    ]
+    assert make_collector(r).group_lag(STREAM, GROUP) == 2
+
+
+def test_collect_missing_stream_is_empty(r):
+    assert make_collector(r).collect() == [
+        StreamMetrics(
+            stream=STREAM, group=GROUP, length=0, lag=0, pending=0, oldest_pending_age_ms=None
+        )
+    ]
+    assert make_collector(r).group_lag(STREAM, GROUP) == 0
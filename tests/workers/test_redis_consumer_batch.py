@@ -0,0 +1,117 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.config import settings
+from app.queue import lanes
+from app.queue.redis_consumer import RedisConsumer
+
+
+@pytest.fixture()
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def record_xacks(consumer, monkeypatch):
+    calls = []
+    xack = consumer._r.xack
+
+    def spy(stream, group, *ids):
+        calls.append((stream, group, set(ids)))
+        return xack(stream, group, *ids)
+
+    monkeypatch.setattr(consumer._r, "xack", spy)
+    return calls
+
+
+def fail_on(bad_ids):
+    def handler(raw: bytes) -> None:
+        if json.loads(raw)["id"] in bad_ids:
+            raise RuntimeError("boom")
+
+    return handler
+
+
+def pending_ids(r, stream, group):
+    return {p["message_id"] for p in r.xpending_range(stream, group, "-", "+", 100)}
+
+
+def test_process_batch_acks_successful_ids_with_one_xack(fake_redis, pool, monkeypatch):
+    consumer = RedisConsumer("llm")
+    stream, group = settings.redis_llm_stream, settings.redis_llm_group
+    ids = [fake_redis.xadd(stream, {"id": str(i)}) for i in range(4)]
+    xacks = record_xacks(consumer, monkeypatch)
+
+    messages = consumer._read(count=4, block_ms=1)
+    failed = consumer._process_batch(pool, fail_on({"1"}), messages)
+
+    assert failed == 1
+    assert xacks == [(stream, group, {ids[0], ids[2], ids[3]})]
+    assert pending_ids(fake_redis, stream, group) == {ids[1]}
+    stats = consumer.stats
+    assert (stats.batches, stats.messages, stats.failed) == (1, 4, 1)
+    assert stats.busy_s > 0
+    assert stats.last_batch_ms == stats.max_batch_ms
+
+
+def test_process_batch_failing_every_message_acks_nothing(fake_redis, pool, monkeypatch):
+    consumer = RedisConsumer("llm")
+    stream, group = settings.redis_llm_stream, settings.redis_llm_group
+    ids = [fake_redis.xadd(stream, {"id": str(i)}) for i in range(2)]
+    xacks = record_xacks(consumer, monkeypatch)
+
+    failed = consumer._process_batch(pool, fail_on({"0", "1"}), consumer._read(count=2, block_ms=1))
+
+    assert failed == 2
+    assert xacks == []
+    assert pending_ids(fake_redis, stream, group) == set(ids)
+    assert consumer.stats.as_dict()["failed"] == 2
+
+
+def test_process_batch_stats_accumulate_across_lanes(fake_redis, pool):
+    consumer = RedisConsumer("test_runner")
+    group = settings.redis_test_group
+    streams = lanes.test_run_streams()
+    for stream in streams:
+        fake_redis.xadd(stream, {"id": stream})
+    resp = fake_redis.xreadgroup(group, consumer.consumer_name, dict.fromkeys(streams, ">"))
+    messages = consumer._delivered(resp)
+
+    consumer._process_batch(pool, fail_on({streams[0]}), messages[:1])
+    consumer._process_batch(pool, fail_on({streams[0]}), messages[1:])
+
+    # the second batch spans two lanes and is acked in one pipelined round trip
+    assert [pending_ids(fake_redis, s, group) for s in streams[1:]] == [set(), set()]
+    assert pending_ids(fake_redis, streams[0], group) == {messages[0][1]}
+    stats = consumer.stats
+    assert (stats.batches, stats.messages, stats.failed) == (2, len(streams), 1)
+    assert stats.throughput == pytest.approx(stats.messages / stats.busy_s)
+
+
+class StopConsuming(Exception):
+    pass
+
+
+def test_consume_batch_sleeps_after_failed_batch_and_closes(fake_redis, monkeypatch):
+    consumer = RedisConsumer("llm")
+    stream, group = settings.redis_llm_stream, settings.redis_llm_group
+    ids = [fake_redis.xadd(stream, {"id": str(i)}) for i in range(3)]
+    xacks = record_xacks(consumer, monkeypatch)
+    sleeps = []
+
+    def sleep(s):
+        sleeps.append(s)
+        raise StopConsuming
+
+    monkeypatch.setattr("app.queue.redis_consumer.time.sleep", sleep)
+    close = consumer.close
+    monkeypatch.setattr(consumer, "close", lambda: (close(), sleeps.append("closed")))
+
+    with pytest.raises(StopConsuming):
+        consumer.consume_batch(fail_on({"2"}), count=3, block_ms=1, on_error_sleep_s=0.5)
+
+    assert sleeps == [0.5, "closed"]
+    assert xacks == [(stream, group, set(ids[:2]))]
+    assert consumer.stats.batches == 1
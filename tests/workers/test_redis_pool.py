@@ -0,0 +1,50 @@
+import fakeredis
+import pytest
+import redis
+
+from app.clients.redis_client import InstrumentedBlockingConnectionPool
+
+
+def make_pool(**kwargs):
+    return InstrumentedBlockingConnectionPool(
+        connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer(), **kwargs
+    )
+
+
+def test_checkout_and_release_update_in_use():
+    pool = make_pool(max_connections=2, timeout=1)
+
+    first = pool.get_connection()
+    second = pool.get_connection()
+    pool.release(first)
+
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["in_use"], stats["in_use_max"]) == (2, 1, 2)
+    pool.release(second)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_exhausted_pool_counts_checkout_timeout():
+    pool = make_pool(max_connections=1, timeout=0.01)
+    pool.get_connection()
+
+    with pytest.raises(redis.ConnectionError, match="No connection available"):
+        pool.get_connection()
+
+    assert pool.stats()["checkout_timeouts"] == 1
+
+
+def test_failed_connect_is_not_a_checkout_timeout():
+    pool = InstrumentedBlockingConnectionPool(
+        host="127.0.0.1", port=1, max_connections=1, timeout=1
+    )
+
+    with pytest.raises(redis.ConnectionError):
+        pool.get_connection()
+
+    stats = pool.stats()
+    assert (stats["checkout_timeouts"], stats["checkouts"], stats["in_use"]) == (0, 0, 0)
+    # the failed connection went back to the pool, so the next checkout does not wait for it
+    with pytest.raises(redis.ConnectionError) as ei:
+        pool.get_connection()
+    assert "No connection available" not in str(ei.value)
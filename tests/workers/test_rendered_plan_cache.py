@@ -0,0 +1,37 @@
+from app.workers.test_runner.dto import PlanPayload
+from app.workers.test_runner.plan_cache import RenderedPlanCache, placeholders_key
+
+PLAN = PlanPayload(steps=["await page.goto('/login')"], assertions=[])
+
+
+def test_placeholders_key_ignores_order():
+    assert placeholders_key({"<a>": "1", "<b>": "2"}) == placeholders_key({"<b>": "2", "<a>": "1"})
+    assert placeholders_key({"<a>": "1"}) != placeholders_key({"<a>": "2"})
+
+
+def test_rendered_plan_cache_hit_and_miss():
+    cache = RenderedPlanCache(4)
+    cache.set(1, {"<a>": "1"}, PLAN)
+
+    assert cache.get(1, {"<a>": "1"}) is PLAN
+    assert cache.get(1, {"<a>": "2"}) is None
+    assert cache.get(2, {"<a>": "1"}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_rendered_plan_cache_evicts_least_recently_used():
+    cache = RenderedPlanCache(2)
+    cache.set(1, {}, PLAN)
+    cache.set(2, {}, PLAN)
+    cache.get(1, {})
+    cache.set(3, {}, PLAN)
+
+    assert cache.get(1, {}) is PLAN
+    assert cache.get(2, {}) is None
+    assert cache.get(3, {}) is PLAN
+
+
+def test_rendered_plan_cache_disabled():
+    cache = RenderedPlanCache(0)
+    cache.set(1, {}, PLAN)
+    assert cache.get(1, {}) is None
@@ -0,0 +1,105 @@
+import json
+import time
+
+import httpx
+import pytest
+import requests
+
+from app.llm import ollama_client
+from app.llm.dto import SpeculationOutcome
+from app.llm.llm_output_validator import PlanValidationError
+from app.llm.ollama_client import OllamaClient, capture_generations, speculate
+from app.workers.llm_worker import proposal_metrics
+from tests.workers.helper_llm_worker import PLAN
+
+BAD_PLAN = {"steps": ["await page.locator('#x').click()"], "assertions": []}
+
+
+def by_seed(**per_seed: tuple[float, dict]):
+    """FakeOllama script: candidate 0 has no seed, candidate i > 0 sends seed i."""
+
+    def script(body: dict) -> tuple[float, str]:
+        delay_s, plan = per_seed[f"c{body['options'].get('seed', 0)}"]
+        return delay_s, json.dumps(plan)
+
+    return script
+
+
+@pytest.fixture(autouse=True)
+def _blocking_generate(monkeypatch):
+    monkeypatch.setattr(ollama_client.settings, "llm_streaming_enabled", False)
+    monkeypatch.setattr(ollama_client.settings, "llm_speculative_temperature_step", 0.3)
+
+
+def test_candidates_differ_in_seed_and_temperature():
+    payloads = OllamaClient("http://x")._candidate_payloads("open login", 3)
+
+    assert "seed" not in payloads[0]["options"]
+    assert [p["options"].get("seed") for p in payloads[1:]] == [1, 2]
+    assert [p["options"]["temperature"] for p in payloads] == [0.1, 0.4, 0.7]
+    assert {p["prompt"] for p in payloads} == {payloads[0]["prompt"]}
+
+
+@pytest.mark.asyncio
+async def test_first_valid_candidate_wins_and_the_rest_are_cancelled(fake_ollama):
+    server = fake_ollama()
+    server.script = by_seed(c0=(1.0, PLAN), c1=(0.05, PLAN), c2=(1.0, PLAN))
+
+    async with httpx.AsyncClient() as http:
+        client = OllamaClient(server.url, async_http=http)
+        started = time.perf_counter()
+        with capture_generations() as captured, speculate(3) as outcome:
+            assert await client.agenerate_plan_json("open login") == PLAN
+
+    assert time.perf_counter() - started < 0.8
+    assert outcome.winner == 1
+    assert len(server.requests) == 3
+    assert len(captured) == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_candidate_is_skipped(fake_ollama):
+    server = fake_ollama()
+    server.script = by_seed(c0=(0.0, BAD_PLAN), c1=(0.1, PLAN))
+
+    async with httpx.AsyncClient() as http:
+        client = OllamaClient(server.url, async_http=http)
+        with capture_generations() as captured, speculate(2) as outcome:
+            assert await client.agenerate_plan_json("open login") == PLAN
+
+    assert outcome.winner == 1
+    # the failed candidate's tokens are still accounted for
+    assert len(captured) == 2
+
+
+def test_sync_client_races_candidates_too(fake_ollama):
+    server = fake_ollama()
+    server.script = by_seed(c0=(1.0, PLAN), c1=(0.05, PLAN))
+    client = OllamaClient(server.url, session=requests.Session())
+
+    with speculate(2) as outcome:
+        assert client.generate_plan_json("open login") == PLAN
+
+    assert outcome.winner == 1
+
+
+def test_all_candidates_failing_raises_candidate_zero_error(fake_ollama):
+    server = fake_ollama()
+    server.script = by_seed(c0=(0.05, BAD_PLAN), c1=(0.0, {"steps": []}))
+    client = OllamaClient(server.url, session=requests.Session())
+
+    with pytest.raises(PlanValidationError, match="unsupported step #1"):
+        with speculate(2):
+            client.generate_plan_json("open login")
+
+
+def test_speculation_is_stored_on_the_proposal():
+    outcome = SpeculationOutcome(candidates=3, winner=2, winner_ms=900.0, saved_ms=1250.4)
+
+    metrics = proposal_metrics([], 950.0, outcome)
+    assert (metrics.speculative_candidates, metrics.winning_candidate) == (3, 2)
+    assert metrics.speculative_saved_ms == 1250
+
+    assert (
+        proposal_metrics([], 950.0, SpeculationOutcome(candidates=1)).speculative_candidates is None
+    )
@@ -0,0 +1,153 @@
+import time
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.queue.reclaimer import StreamReclaimer
+from app.queue.redis_consumer import RedisConsumer
+
+STREAM = "jobs"
+GROUP = "workers"
+DEAD = "jobs:dead"
+
+
+@pytest.fixture()
+def r():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    client.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    return client
+
+
+def make_reclaimer(r, *, min_idle_ms=1, max_deliveries=5, clock=time.monotonic):
+    return StreamReclaimer(
+        r,
+        stream=STREAM,
+        group=GROUP,
+        consumer="alive",
+        dead_letter_stream=DEAD,
+        min_idle_ms=min_idle_ms,
+        max_deliveries=max_deliveries,
+        interval_s=60,
+        clock=clock,
+    )
+
+
+def deliver(r, n, consumer="dead"):
+    ids = [r.xadd(STREAM, {"run_id": str(i)}) for i in range(n)]
+    r.xreadgroup(GROUP, consumer, {STREAM: ">"})
+    time.sleep(0.01)  # idle past min_idle_ms
+    return ids
+
+
+def owners(r):
+    return {p["message_id"]: p["consumer"] for p in r.xpending_range(STREAM, GROUP, "-", "+", 100)}
+
+
+def test_reclaim_claims_stale_entries_up_to_count(r):
+    ids = deliver(r, 3)
+
+    claimed = make_reclaimer(r).reclaim(2)
+
+    assert [msg_id for msg_id, _ in claimed] == ids[:2]
+    assert claimed[0][1] == {"run_id": "0"}
+    assert owners(r) == {ids[0]: "alive", ids[1]: "alive", ids[2]: "dead"}
+
+
+def test_reclaim_leaves_entries_that_are_not_idle(r):
+    deliver(r, 1)
+
+    assert make_reclaimer(r, min_idle_ms=60_000).reclaim(10) == []
+    assert set(owners(r).values()) == {"dead"}
+
+
+def test_reclaim_acks_entries_deleted_from_stream(r):
+    ids = deliver(r, 2)
+    r.xdel(STREAM, ids[0])
+
+    claimed = make_reclaimer(r).reclaim(10)
+
+    assert [msg_id for msg_id, _ in claimed] == [ids[1]]
+    assert owners(r) == {ids[1]: "alive"}
+
+
+def test_reclaim_moves_poison_entries_to_dead_letter(r):
+    ids = deliver(r, 2)
+    # the first entry was already handed out twice more
+    for _ in range(2):
+        r.xclaim(STREAM, GROUP, "dead", min_idle_time=0, message_ids=[ids[0]])
+    time.sleep(0.01)
+
+    claimed = make_reclaimer(r, max_deliveries=3).reclaim(10)
+
+    assert [msg_id for msg_id, _ in claimed] == [ids[1]]
+    assert owners(r) == {ids[1]: "alive"}
+    [(_, dead)] = r.xrange(DEAD)
+    assert dead["source_id"] == ids[0]
+    assert dead["source_stream"] == STREAM
+    assert dead["times_delivered"] == "4"
+    assert dead["run_id"] == "0"
+
+
+def test_poison_counted_per_id_despite_other_pending_entries(r):
+    # this consumer already owns pending entries between the claimed ones
+    ids = deliver(r, 3)
+    r.xclaim(STREAM, GROUP, "alive", min_idle_time=0, message_ids=[ids[1]])
+    for _ in range(3):
+        r.xclaim(STREAM, GROUP, "dead", min_idle_time=0, message_ids=[ids[2]])
+    time.sleep(0.01)
+
+    claimed = make_reclaimer(r, max_deliveries=3).reclaim(10, skip={ids[1]})
+
+    assert [msg_id for msg_id, _ in claimed] == [ids[0]]
+    assert [fields["source_id"] for _, fields in r.xrange(DEAD)] == [ids[2]]
+
+
+def test_repeated_reclaim_skips_entries_being_handled(r):
+    ids = deliver(r, 2)
+    reclaimer = make_reclaimer(r)
+
+    first = reclaimer.reclaim(10)
+    handling = {msg_id for msg_id, _ in first}
+    time.sleep(0.01)  # the handler is slower than min_idle_ms
+    second = reclaimer.reclaim(10, skip=handling)
+
+    assert [msg_id for msg_id, _ in first] == ids
+    assert second == []
+    delivered = {
+        p["message_id"]: p["times_delivered"] for p in r.xpending_range(STREAM, GROUP, "-", "+", 10)
+    }
+    assert delivered == {ids[0]: 2, ids[1]: 2}
+
+
+def test_reclaim_is_due_once_per_interval(r):
+    now = [100.0]
+    reclaimer = make_reclaimer(r, clock=lambda: now[0])
+
+    assert reclaimer.due()
+    reclaimer.reclaim(1)
+    assert not reclaimer.due()
+    now[0] += 60
+    assert reclaimer.due()
+
+
+def test_consumer_takes_reclaimed_entries_up_to_free_capacity(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "redis_reclaim_min_idle_ms", 1)
+    consumer = RedisConsumer("llm")
+    stream = settings.redis_llm_stream
+    ids = [fake_redis.xadd(stream, {"proposal_id": str(i)}) for i in range(3)]
+    fake_redis.xreadgroup(settings.redis_llm_group, "crashed", {stream: ">"})
+    time.sleep(0.01)
+
+    first = consumer._read(count=2, block_ms=1)
+    # the reclaim interval has not passed: nothing more is claimed, the stream is read instead
+    second = consumer._read(count=2, block_ms=1)
+
+    assert [msg_id for _, msg_id, _ in first] == ids[:2]
+    assert second == []
+    pending = fake_redis.xpending_range(stream, settings.redis_llm_group, "-", "+", 10)
+    assert {p["message_id"]: p["consumer"] for p in pending} == {
+        ids[0]: consumer.consumer_name,
+        ids[1]: consumer.consumer_name,
+        ids[2]: "crashed",
+    }
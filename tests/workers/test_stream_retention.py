@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+
+import fakeredis
+import pytest
+
+from app.queue.retention import StreamArchiver, StreamTrimmer
+
+STREAM = "jobs"
+DEAD = "jobs:dead"
+
+
+@pytest.fixture()
+def r():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def make_trimmer(r, *, stream=STREAM, mode="maxlen", maxlen=2, **kwargs):
+    return StreamTrimmer(
+        r, stream=stream, mode=mode, maxlen=maxlen, max_age_s=60, interval_s=60, **kwargs
+    )
+
+
+def add(r, n, stream=STREAM):
+    return [r.xadd(stream, {"run_id": str(i)}) for i in range(n)]
+
+
+def deliver(r, group, count):
+    return [
+        msg_id
+        for _, entries in r.xreadgroup(group, "c", {STREAM: ">"}, count=count)
+        for msg_id, _ in entries
+    ]
+
+
+def remaining(r, stream=STREAM):
+    return [msg_id for msg_id, _ in r.xrange(stream)]
+
+
+def archived_ids(root):
+    with gzip.open(root / STREAM / os.listdir(root / STREAM)[0], "rt") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+# with an archiver the trim is exact, so the kept ids can be asserted
+
+
+def test_trim_keeps_maxlen_when_everything_is_acked(r, tmp_path):
+    ids = add(r, 6)
+    r.xgroup_create(STREAM, "g", id="0")
+    r.xack(STREAM, "g", *deliver(r, "g", 6))
+
+    trimmed = make_trimmer(r, archiver=StreamArchiver(tmp_path)).trim_once()
+
+    assert trimmed == 4
+    assert remaining(r) == ids[4:]
+    assert archived_ids(tmp_path) == ids[:4]
+
+
+def test_trim_stops_below_oldest_pending_entry(r, tmp_path):
+    ids = add(r, 6)
+    r.xgroup_create(STREAM, "g", id="0")
+    delivered = deliver(r, "g", 6)
+    r.xack(STREAM, "g", *delivered[:1], *delivered[2:])
+
+    trimmer = make_trimmer(r, archiver=StreamArchiver(tmp_path))
+    assert trimmer.safe_floor() == tuple(int(p) for p in ids[1].split("-"))
+    assert trimmer.trim_once() == 1
+
+    # maxlen=2 wants ids[4:], the pending ids[1] caps the trim
+    assert remaining(r) == ids[1:]
+    assert archived_ids(tmp_path) == ids[:1]
+
+
+def test_trim_stops_at_first_entry_a_lagging_group_has_not_read(r, tmp_path):
+    ids = add(r, 6)
+    r.xgroup_create(STREAM, "fast", id="0")
+    r.xgroup_create(STREAM, "slow", id="0")
+    r.xack(STREAM, "fast", *deliver(r, "fast", 6))
+    r.xack(STREAM, "slow", *deliver(r, "slow", 2))
+
+    trimmer = make_trimmer(r, archiver=StreamArchiver(tmp_path))
+    ms, seq = (int(p) for p in ids[1].split("-"))
+    assert trimmer.safe_floor() == (ms, seq + 1)
+    assert trimmer.trim_once() == 2
+
+    # "slow" has read and acked ids[:2] but not ids[2]
+    assert remaining(r) == ids[2:]
+
+
+def test_trim_skips_stream_without_groups(r):
+    add(r, 6)
+
+    assert make_trimmer(r).trim_once() == 0
+    assert r.xlen(STREAM) == 6
+
+
+def test_dead_letter_stream_trimmed_by_age_without_groups(r, tmp_path):
+    r.xadd(DEAD, {"source_id": "1-0"}, id="1000-0")
+    fresh = r.xadd(DEAD, {"source_id": "2-0"})
+
+    trimmer = make_trimmer(
+        r, stream=DEAD, mode="minid", archiver=StreamArchiver(tmp_path), guard_groups=False
+    )
+    assert trimmer.trim_once() == 1
+
+    assert remaining(r, DEAD) == [fresh]
+    assert [p.name for p in (tmp_path / "jobs_dead").iterdir()] == ["1970-01-01.ndjson.gz"]
+
+
+def test_maxlen_cutoff_reads_only_entries_over_maxlen(r, tmp_path, monkeypatch):
+    ids = add(r, 1003)
+    r.xgroup_create(STREAM, "g", id="$")
+    calls = []
+    xrange = r.xrange
+
+    def spy(name, min="-", max="+", count=None):
+        calls.append(count)
+        return xrange(name, min=min, max=max, count=count)
+
+    monkeypatch.setattr(r, "xrange", spy)
+    monkeypatch.setattr(r, "xrevrange", None)  # must not scan back from the tail
+
+    trimmer = make_trimmer(r, maxlen=1000, archiver=StreamArchiver(tmp_path))
+    assert trimmer.trim_once() == 3
+
+    # the cutoff reads the 3 entries over maxlen; archiving reads them in batches
+    assert calls[0] == 3
+    assert max(calls) <= 500
+    assert remaining(r)[0] == ids[3]
+
+
+def test_maxlen_cutoff_read_stops_at_safe_floor(r, monkeypatch):
+    ids = add(r, 10)
+    r.xgroup_create(STREAM, "g", id="0")
+    deliver(r, "g", 1)  # ids[0] pending, nothing trimmable
+    calls = []
+    xrange = r.xrange
+
+    def spy(name, min="-", max="+", count=None):
+        calls.append((max, count))
+        return xrange(name, min=min, max=max, count=count)
+
+    monkeypatch.setattr(r, "xrange", spy)
+
+    make_trimmer(r).trim_once()
+
+    assert calls == [(f"({ids[0]}", 8)]
+    assert r.xlen(STREAM) == 10
@@ -1,8 +1,12 @@
 import json
 
+import pytest
+
 from app.models.enums import TestRunStatus
-from app.workers.run_test_worker import handle_message
+from app.workers.run_test_worker import handle_message, handle_message_async
 from app.workers.test_runner.dto import PlanExecutionFailed, RunTestOutput
+from app.workers.test_runner.plan_cache import RenderedPlanCache
+from app.workers.test_runner.renderer import precompile_plan
 from tests.conftest import make_test_case_revision_proposal, make_test_run
 from tests.data.data_proposals import PROPOSAL_DATA_SUCCESS_READY_1
 from tests.data.data_test_case import TEST_CASE_REQUEST_1
@@ -137,3 +141,256 @@ def test_handle_message_plan_execution_failed_marks_failed_and_uploads(
         assert run.result_payload["final_url"] == "https://final/failed"
         assert run.result_payload["executed_steps"] == ["step1"]
         assert run.result_payload["executed_assertions"] == ["assert1"]
+
+
+def test_handle_message_uses_stored_compiled_plan(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    stored_plan = {
+        "steps": ["await page.goto('/login')", "await page.fill('#email', '<email>')"],
+        "assertions": ["await expect(page).toHaveURL('/login')"],
+    }
+    tc, proposal = make_test_case_revision_proposal(
+        db_session,
+        TEST_CASE_REQUEST_1,
+        {**PROPOSAL_DATA_SUCCESS_READY_1, "compiled_plan": precompile_plan(stored_plan)},
+    )
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                        site_domain="https://example.com")
+    run_id = run.id
+
+    plans = []
+
+    def execute_plan_fn(run_params, plan, base_url, run_id_arg, artifacts_root):
+        plans.append(plan)
+        return RunTestOutput(
+            status=TestRunStatus.passed,
+            final_url="https://final/success",
+            executed_steps=plan.steps,
+            executed_assertions=plan.assertions,
+            timeout_ms=float(run_params["playwright_timeout_ms"]),
+            browser=str(run_params["playwright_browser"]),
+            headless=bool(run_params["playwright_headless"]),
+        )
+
+    handle_message(
+        _msg(run_id, placeholders='{"<email>": "a@b.c"}'),
+        run_uow_factory=runner_uow_factory,
+        artifacts_service_factory=artifacts_service_factory,
+        execute_plan_fn=execute_plan_fn,
+    )
+
+    # ops come from compiled_plan, result_payload is not parsed again
+    assert len(plans) == 1
+    assert plans[0].steps == ["await page.goto('/login')", "await page.fill('#email', 'a@b.c')"]
+    assert plans[0].ops.steps[1].args == ("#email", "a@b.c")
+
+    with runner_uow_factory() as uow:
+        assert uow.test_runs_repo.get_item(run_id).status == TestRunStatus.passed
+
+
+def test_handle_message_plan_without_compiled_plan_fails_invalid_payload(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    # a plan that does not compile is stored without compiled_plan and can still be marked ready
+    tc, proposal = make_test_case_revision_proposal(
+        db_session,
+        TEST_CASE_REQUEST_1,
+        {
+            **PROPOSAL_DATA_SUCCESS_READY_1,
+            "result_payload": {"steps": ["await page.click('#a')"], "assertions": []},
+            "compiled_plan": None,
+        },
+    )
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                        site_domain="https://example.com")
+    run_id = run.id
+
+    def execute_plan_fn(*args):
+        raise AssertionError("must not execute")
+
+    handle_message(
+        _msg(run_id, placeholders="{}"),
+        run_uow_factory=runner_uow_factory,
+        artifacts_service_factory=artifacts_service_factory,
+        execute_plan_fn=execute_plan_fn,
+    )
+
+    with runner_uow_factory() as uow:
+        run = uow.test_runs_repo.get_item(run_id)
+        assert run.status == TestRunStatus.failed
+        assert run.error.startswith("invalid_plan_payload:")
+
+
+def test_handle_message_failed_run_stores_trace(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                        site_domain="https://example.com")
+    run_id = run.id
+
+    def execute_plan_fn(run_params, plan, base_url, run_id_arg, artifacts_root):
+        result = RunTestOutput(
+            status=TestRunStatus.failed,
+            final_url="https://final/failed",
+            executed_steps=[],
+            executed_assertions=[],
+            timeout_ms=float(run_params["playwright_timeout_ms"]),
+            browser=str(run_params["playwright_browser"]),
+            headless=bool(run_params["playwright_headless"]),
+            trace_name="trace.zip",
+        )
+        raise PlanExecutionFailed(result=result, original_exc=Exception("boom"))
+
+    svc = artifacts_service_factory()
+
+    handle_message(
+        _msg(run_id),
+        run_uow_factory=runner_uow_factory,
+        artifacts_service_factory=lambda: svc,
+        execute_plan_fn=execute_plan_fn,
+    )
+
+    assert svc.trace_calls == [(run_id, "trace.zip")]
+
+    with runner_uow_factory() as uow:
+        run = uow.test_runs_repo.get_item(run_id)
+        assert run.status == TestRunStatus.failed
+        assert run.trace_name == "trace.zip"
+        assert run.trace_object_key == "obj/trace.zip"
+
+
+def test_handle_message_reuses_cached_plan(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run_ids = [
+        make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                      site_domain="https://example.com").id
+        for _ in range(3)
+    ]
+
+    plans = []
+
+    def execute_plan_fn(run_params, plan, base_url, run_id_arg, artifacts_root):
+        plans.append(plan)
+        return RunTestOutput(
+            status=TestRunStatus.passed,
+            final_url="https://final/success",
+            executed_steps=plan.steps,
+            executed_assertions=plan.assertions,
+            timeout_ms=float(run_params["playwright_timeout_ms"]),
+            browser=str(run_params["playwright_browser"]),
+            headless=bool(run_params["playwright_headless"]),
+        )
+
+    cache = RenderedPlanCache(16)
+    for run_id in run_ids:
+        handle_message(
+            _msg(run_id, placeholders="{}"),
+            run_uow_factory=runner_uow_factory,
+            artifacts_service_factory=artifacts_service_factory,
+            execute_plan_fn=execute_plan_fn,
+            plan_cache=cache,
+        )
+
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert plans[0] is plans[1] is plans[2]
+
+    with runner_uow_factory() as uow:
+        assert all(uow.test_runs_repo.get_item(i).status == TestRunStatus.passed for i in run_ids)
+
+
+@pytest.mark.asyncio
+async def test_handle_message_async_success_marks_passed_and_uploads(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                        site_domain="https://example.com")
+    run_id = run.id
+
+    calls = []
+
+    async def execute_plan_fn(run_params, plan, base_url, run_id_arg, artifacts_root):
+        calls.append((base_url, run_id_arg, plan.steps))
+        return RunTestOutput(
+            status=TestRunStatus.passed,
+            final_url="https://final/success",
+            executed_steps=["step1"],
+            executed_assertions=["assert1"],
+            timeout_ms=float(run_params["playwright_timeout_ms"]),
+            browser=str(run_params["playwright_browser"]),
+            headless=bool(run_params["playwright_headless"]),
+            video_name="vid.webm",
+        )
+
+    svc = artifacts_service_factory()
+
+    await handle_message_async(
+        _msg(run_id, placeholders="{}"),
+        run_uow_factory=runner_uow_factory,
+        artifacts_service_factory=lambda: svc,
+        execute_plan_fn=execute_plan_fn,
+    )
+
+    assert calls == [("https://example.com", run_id, ["await page.goto('/login')"])]
+    assert svc.upload_calls == [(run_id, "vid.webm", None)]
+
+    with runner_uow_factory() as uow:
+        run = uow.test_runs_repo.get_item(run_id)
+        assert run.status == TestRunStatus.passed
+        assert run.started_at is not None
+        assert run.result_payload["final_url"] == "https://final/success"
+
+
+@pytest.mark.asyncio
+async def test_handle_message_async_plan_execution_failed_marks_failed(
+        db_session,
+        runner_uow_factory,
+        artifacts_service_factory,
+):
+    tc, proposal = make_test_case_revision_proposal(db_session, TEST_CASE_REQUEST_1, PROPOSAL_DATA_SUCCESS_READY_1)
+    run = make_test_run(db_session, plan_proposal_id=proposal.id, run_params=TEST_RUN_PARAMS,
+                        site_domain="https://example.com")
+    run_id = run.id
+
+    async def execute_plan_fn(run_params, plan, base_url, run_id_arg, artifacts_root):
+        result = RunTestOutput(
+            status=TestRunStatus.failed,
+            final_url="https://final/failed",
+            executed_steps=[],
+            executed_assertions=[],
+            timeout_ms=float(run_params["playwright_timeout_ms"]),
+            browser=str(run_params["playwright_browser"]),
+            headless=bool(run_params["playwright_headless"]),
+            screenshot_name="shot.png",
+        )
+        raise PlanExecutionFailed(result=result, original_exc=Exception("boom"))
+
+    svc = artifacts_service_factory()
+
+    await handle_message_async(
+        _msg(run_id),
+        run_uow_factory=runner_uow_factory,
+        artifacts_service_factory=lambda: svc,
+        execute_plan_fn=execute_plan_fn,
+    )
+
+    assert svc.upload_calls == [(run_id, None, "shot.png")]
+
+    with runner_uow_factory() as uow:
+        run = uow.test_runs_repo.get_item(run_id)
+        assert run.status == TestRunStatus.failed
+        assert "execution_failed: boom" == run.error
@@ -0,0 +1,200 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from app.core.config import settings
+from app.workers.run_test_worker import _runner_config
+from app.workers.test_runner.dto import PlanExecutionFailed, PlanPayload, PlaywrightRunnerConfig
+from app.workers.test_runner.playwright_run import (
+    BrowserPool,
+    PlaywrightRunner,
+    PlaywrightSessionFactory,
+)
+from app.workers.test_runner.video import keeps_video, records_video
+from tests.data.data_test_run import TEST_RUN_PARAMS
+
+
+class FakeVideo:
+    def __init__(self, video_dir):
+        self.file = video_dir / "rec.webm"
+        self.file.write_bytes(b"webm")
+        self.deleted = False
+
+    async def path(self):
+        return str(self.file)
+
+    async def delete(self):
+        self.file.unlink()
+        self.deleted = True
+
+
+class FakeBrowser:
+    def __init__(self, fail_click: bool = False):
+        self.fail_click = fail_click
+        self.contexts = []
+        self.context_objs = []
+        self.pages = []
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+    async def new_context(self, **kwargs):
+        page = AsyncMock()
+        page.url = "https://example.com/done"
+        page.set_default_timeout = Mock()
+        if self.fail_click:
+            page.click.side_effect = RuntimeError("click failed")
+        page.video = (
+            FakeVideo(Path(kwargs["record_video_dir"])) if "record_video_dir" in kwargs else None
+        )
+        context = AsyncMock()
+        context.new_page.return_value = page
+        self.contexts.append(kwargs)
+        self.context_objs.append(context)
+        self.pages.append(page)
+        return context
+
+
+class FakePlaywright:
+    def __init__(self, browser: FakeBrowser):
+        self.chromium = Mock()
+        self.browser = browser
+        self.chromium.launch = AsyncMock(return_value=self.browser)
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+PLAN = PlanPayload(
+    steps=["await page.goto('/login')", "await page.click('#submit')"], assertions=[]
+)
+
+
+def make_runner(tmp_path, fail_click=False, **video) -> tuple[PlaywrightRunner, FakeBrowser]:
+    fake = FakePlaywright(FakeBrowser(fail_click=fail_click))
+    cfg = PlaywrightRunnerConfig(
+        headless=True, timeout_ms=1000, browser_name="chromium", artifacts_root=tmp_path, **video
+    )
+    pool = BrowserPool(playwright_factory=lambda: fake)
+    return PlaywrightRunner(PlaywrightSessionFactory(cfg, pool=pool)), fake.browser
+
+
+def test_records_video():
+    assert not records_video("off", sample_percent=100, run_id=1)
+    assert records_video("on_failure", sample_percent=0, run_id=1)
+    assert records_video("always", sample_percent=0, run_id=1)
+
+    sampled = [records_video("sampled", sample_percent=25, run_id=i) for i in range(4000)]
+    assert 800 < sum(sampled) < 1200
+    assert sampled == [records_video("sampled", sample_percent=25, run_id=i) for i in range(4000)]
+
+
+def test_keeps_video():
+    assert not keeps_video("on_failure", failed=False)
+    assert keeps_video("on_failure", failed=True)
+    assert keeps_video("always", failed=False)
+    assert keeps_video("sampled", failed=False)
+
+
+@pytest.mark.asyncio
+async def test_on_failure_drops_video_of_passing_run(tmp_path):
+    runner, browser = make_runner(tmp_path, video_mode="on_failure", video_size=(640, 360))
+
+    out = await runner.execute_plan(PLAN, base_url="https://example.com", run_id=5)
+
+    assert out.video_name is None
+    assert browser.contexts[0]["record_video_size"] == {"width": 640, "height": 360}
+    assert browser.pages[0].video.deleted
+    assert not (tmp_path / "videos" / "5").exists()
+
+
+@pytest.mark.asyncio
+async def test_on_failure_keeps_video_of_failed_run(tmp_path):
+    runner, browser = make_runner(tmp_path, fail_click=True, video_mode="on_failure")
+
+    with pytest.raises(PlanExecutionFailed) as ei:
+        await runner.execute_plan(PLAN, base_url="https://example.com", run_id=6)
+
+    assert ei.value.result.video_name == "rec.webm"
+    assert not browser.pages[0].video.deleted
+    assert (tmp_path / "videos" / "6" / "rec.webm").exists()
+
+
+@pytest.mark.asyncio
+async def test_off_does_not_record(tmp_path):
+    runner, browser = make_runner(tmp_path, video_mode="off")
+
+    out = await runner.execute_plan(PLAN, base_url="https://example.com", run_id=7)
+
+    assert out.video_name is None
+    assert "record_video_dir" not in browser.contexts[0]
+
+
+@pytest.mark.asyncio
+async def test_always_keeps_video_of_passing_run(tmp_path):
+    runner, browser = make_runner(tmp_path, video_mode="always")
+
+    out = await runner.execute_plan(PLAN, base_url="https://example.com", run_id=8)
+
+    assert out.video_name == "rec.webm"
+
+
+def test_runner_config_uses_run_params_then_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "runner_video_mode", "sampled")
+    monkeypatch.setattr(settings, "runner_video_sample_percent", 5)
+
+    cfg = _runner_config(
+        {**TEST_RUN_PARAMS, "playwright_video_width": 960, "playwright_video_height": 540}, tmp_path
+    )
+    assert (cfg.video_mode, cfg.video_sample_percent, cfg.video_size) == ("sampled", 5, (960, 540))
+
+    cfg = _runner_config(
+        {**TEST_RUN_PARAMS, "playwright_video": "off", "playwright_video_sample_percent": None},
+        tmp_path,
+    )
+    assert (cfg.video_mode, cfg.video_sample_percent) == ("off", 5)
+
+
+@pytest.mark.asyncio
+async def test_trace_on_failure_written_for_failed_run(tmp_path):
+    runner, browser = make_runner(
+        tmp_path, fail_click=True, video_mode="off", trace_mode="on_failure"
+    )
+
+    with pytest.raises(PlanExecutionFailed) as ei:
+        await runner.execute_plan(PLAN, base_url="https://example.com", run_id=9)
+
+    trace_name = ei.value.result.trace_name
+    assert trace_name is not None and trace_name.endswith(".zip")
+    tracing = browser.context_objs[0].tracing
+    tracing.start.assert_awaited_once_with(screenshots=True, snapshots=True)
+    tracing.stop.assert_awaited_once_with(path=str(tmp_path / "traces" / "9" / trace_name))
+
+
+@pytest.mark.asyncio
+async def test_trace_on_failure_discarded_for_passing_run(tmp_path):
+    runner, browser = make_runner(tmp_path, trace_mode="on_failure")
+
+    out = await runner.execute_plan(PLAN, base_url="https://example.com", run_id=10)
+
+    assert out.trace_name is None
+    browser.context_objs[0].tracing.stop.assert_awaited_once_with()
+    assert not (tmp_path / "traces" / "10").exists()
+
+
+@pytest.mark.asyncio
+async def test_trace_off_does_not_start_tracing(tmp_path):
+    runner, browser = make_runner(tmp_path, fail_click=True)
+
+    with pytest.raises(PlanExecutionFailed) as ei:
+        await runner.execute_plan(PLAN, base_url="https://example.com", run_id=11)
+
+    assert ei.value.result.trace_name is None
+    browser.context_objs[0].tracing.start.assert_not_awaited()